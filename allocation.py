@@ -0,0 +1,149 @@
+import time
+from collections import namedtuple
+from datetime import date
+
+# Pending demands are served most urgent first, oldest first within a priority
+PRIORITY_RANK = {'Critical': 1, 'High': 2, 'Medium': 3, 'Low': 4}
+
+Demand = namedtuple("Demand", ["demand_id", "center_id", "item_id", "quantity", "priority", "request_date"])
+Lot = namedtuple("Lot", ["inventory_id", "ngo_id", "item_id", "quantity", "expiry_date"])
+Allocation = namedtuple("Allocation", ["demand_id", "center_id", "item_id", "inventory_id", "ngo_id", "quantity"])
+
+
+def demand_order(demand):
+    return (PRIORITY_RANK.get(demand.priority, 5), demand.request_date, demand.demand_id)
+
+
+def expiry_order(lot):
+    # First expiry first; lots without an expiry date go last
+    return (lot.expiry_date is None, lot.expiry_date or date.max, lot.inventory_id)
+
+
+class LotQueue:
+    """Lots of one item in expiry order, with a cursor that moves past empty lots.
+
+    Stock is kept in a dict shared by every queue the lot is in, so a lot
+    drawn down through one queue is seen as empty by the others.
+    """
+
+    def __init__(self, lots):
+        self.lots = lots
+        self.pos = 0
+
+    def take(self, stock, wanted, taken):
+        """Draw up to `wanted` units, appending (lot, quantity) to `taken`;
+        returns the units still wanted."""
+        lots = self.lots
+        while wanted and self.pos < len(lots):
+            lot = lots[self.pos]
+            left = stock[lot.inventory_id]
+            if not left:
+                self.pos += 1
+                continue
+            quantity = min(left, wanted)
+            stock[lot.inventory_id] = left - quantity
+            wanted -= quantity
+            taken.append((lot, quantity))
+        return wanted
+
+
+class AllocationPlan:
+    """Result of allocate(): allocation lines plus what could not be covered."""
+
+    def __init__(self, lines, shortfall, demands, elapsed):
+        self.lines = lines
+        self.shortfall = shortfall  # demand_id -> units still missing
+        self.demands = demands  # demand_id -> Demand, for every demand considered
+        self.elapsed = elapsed
+
+    def fulfilled(self):
+        """Ids of demands covered in full."""
+        covered = {line.demand_id for line in self.lines}
+        return sorted(covered - set(self.shortfall))
+
+    def boxes(self):
+        """Group the lines into boxes for Database.create_boxes: one per NGO and
+        center, at the priority of its most urgent demand.
+
+        Returns [(items, destination, priority, demands), ...] where items are
+        (inventory_id, quantity) pairs and demands maps each demand id to the
+        units packed for it.
+        """
+        groups = {}
+        for line in self.lines:
+            items, demands = groups.setdefault((line.ngo_id, line.center_id), ({}, {}))
+            items[line.inventory_id] = items.get(line.inventory_id, 0) + line.quantity
+            demands[line.demand_id] = demands.get(line.demand_id, 0) + line.quantity
+        boxes = []
+        for (_, center_id), (items, demands) in groups.items():
+            priority = min((self.demands[demand_id].priority for demand_id in demands),
+                           key=lambda name: PRIORITY_RANK.get(name, 5))
+            boxes.append((sorted(items.items()), center_id, priority, demands))
+        boxes.sort(key=lambda box: (PRIORITY_RANK.get(box[2], 5), box[1]))
+        return boxes
+
+    def stats(self):
+        partial = sum(1 for demand_id in self.shortfall
+                      if self.shortfall[demand_id] < self.demands[demand_id].quantity)
+        return {
+            "demands": len(self.demands),
+            "fulfilled": len(self.demands) - len(self.shortfall),
+            "partial": partial,
+            "unfilled": len(self.shortfall) - partial,
+            "units": sum(line.quantity for line in self.lines),
+            "lines": len(self.lines),
+            "elapsed_ms": self.elapsed * 1000,
+        }
+
+
+def allocate(demands, lots, nearby=None, usable_from=None, allow_partial=True):
+    """Plan which inventory lots serve which pending demands.
+
+    Demands (Demand tuples) are served in priority order, then oldest first.
+    Each draws from the lots of its item, first from the NGOs listed for its
+    center in `nearby` ({center_id: [ngo_id, ...]}, closest first), then from
+    any NGO; within an NGO the lot that expires first is used first. Lots that
+    expire before `usable_from` are left alone. Without `allow_partial` a
+    demand is only served if it can be covered in full.
+
+    Every lot and demand is touched a constant number of times after one sort
+    of each, so the plan scales with the size of the input.
+    """
+    started = time.perf_counter()
+    nearby = nearby or {}
+    stock, by_item, by_ngo = {}, {}, {}
+    for lot in sorted(lots, key=expiry_order):
+        if lot.quantity <= 0 or (usable_from is not None and lot.expiry_date is not None
+                                 and lot.expiry_date < usable_from):
+            continue
+        stock[lot.inventory_id] = lot.quantity
+        by_item.setdefault(lot.item_id, []).append(lot)
+        by_ngo.setdefault((lot.item_id, lot.ngo_id), []).append(lot)
+    available = {}
+    for item_id, item_lots in by_item.items():
+        available[item_id] = sum(lot.quantity for lot in item_lots)
+    by_item = {key: LotQueue(item_lots) for key, item_lots in by_item.items()}
+    by_ngo = {key: LotQueue(ngo_lots) for key, ngo_lots in by_ngo.items()}
+
+    lines, shortfall, considered = [], {}, {}
+    for demand in sorted(demands, key=demand_order):
+        considered[demand.demand_id] = demand
+        left = available.get(demand.item_id, 0)
+        if not left or (not allow_partial and left < demand.quantity):
+            shortfall[demand.demand_id] = demand.quantity
+            continue
+        wanted = demand.quantity
+        taken = []
+        for ngo_id in nearby.get(demand.center_id, ()):
+            queue = by_ngo.get((demand.item_id, ngo_id))
+            if queue is not None and wanted:
+                wanted = queue.take(stock, wanted, taken)
+        if wanted:
+            wanted = by_item[demand.item_id].take(stock, wanted, taken)
+        available[demand.item_id] = left - (demand.quantity - wanted)
+        if wanted:
+            shortfall[demand.demand_id] = wanted
+        for lot, quantity in taken:
+            lines.append(Allocation(demand.demand_id, demand.center_id, demand.item_id,
+                                    lot.inventory_id, lot.ngo_id, quantity))
+    return AllocationPlan(lines, shortfall, considered, time.perf_counter() - started)
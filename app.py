@@ -13,8 +13,12 @@ from database import Database
 import pandas as pd
 from pages import adminscanqr, addintoinventory, inventory_dashboard, dashboard, donations, donationtrack, alerts, qr_manager, ngo_supplies, center_demands
 
-# Initialize database
-db = Database()
+# Initialize database once per server process; it is shared across reruns and sessions
+@st.cache_resource
+def get_database():
+    return Database()
+
+db = get_database()
 
 # Title
 st.title("BantuanNow: A Centralized Real-Time Monitoring and Aid Distribution Platform for Malaysian Flood Shelters")
@@ -0,0 +1,71 @@
+"""Decodes/sec and hit rate of plain pyzbar vs. SmartDecoder over recorded frames.
+
+Point it at a folder of frames saved from the loading-dock camera (PNG/JPEG),
+or leave --frames out to generate a synthetic clip of a box moving past:
+
+    python benchmarks/bench_decode.py --frames recordings/dock1
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import qrcode
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scan_pipeline import SmartDecoder, pyzbar_decoder  # noqa: E402
+
+
+def load_frames(folder):
+    frames = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg")):
+            rgb = np.asarray(Image.open(os.path.join(folder, name)).convert("RGB"))
+            frames.append(np.ascontiguousarray(rgb[..., ::-1]))  # BGR, as cv2 delivers it
+    return frames
+
+
+def synthetic_frames(count, width=640, height=480):
+    # The same box held still for a while, sliding in and out of view, on a noisy background
+    code = np.asarray(qrcode.make("Box ID: 7\nDemand ID: 12").convert("L").resize((160, 160)))
+    rng = np.random.default_rng(0)
+    frames = []
+    for n in range(count):
+        frame = np.full((height, width), 90, dtype=np.uint8)
+        frame += rng.integers(0, 3, size=frame.shape, dtype=np.uint8)
+        phase = n % 100
+        if phase < 70:
+            left = 60 + min(phase, 40) * 8
+            frame[160:320, left:left + 160] = code
+        frames.append(np.dstack([frame] * 3))
+    return frames
+
+
+def run(label, decoder, frames):
+    start = time.perf_counter()
+    hits = sum(1 for frame in frames if decoder(frame))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>13}: {len(frames) / elapsed:8.1f} frames/s  "
+          f"{hits:5d}/{len(frames)} frames with a code")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", help="folder of recorded frames")
+    parser.add_argument("--count", type=int, default=300, help="synthetic frames when no folder is given")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames) if args.frames else synthetic_frames(args.count)
+    run("pyzbar", pyzbar_decoder, frames)
+    smart = SmartDecoder()
+    run("SmartDecoder", smart, frames)
+    stats = smart.stats()
+    print(f"SmartDecoder: {stats['skipped']} skipped, {stats['roi_hits']}/{stats['roi_decodes']} ROI hits, "
+          f"{stats['full_decodes']} full-frame decodes, hit rate {stats['hit_rate']:.0%} of decoded frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Label throughput: one-at-a-time rendering vs. render_labels (process pool + cache).
+
+No database needed; box ids are synthetic:
+
+    python benchmarks/bench_labels.py --labels 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from labels import LABEL_WORKERS, LabelCache, label_sheet, render_labels, render_qr_png  # noqa: E402
+from qr_payload import encode_box_payload  # noqa: E402
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22}: {count / elapsed:8.1f} labels/s  ({elapsed:.2f} s)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=LABEL_WORKERS)
+    args = parser.parse_args()
+
+    # Synthetic labels, so any key will do
+    payloads = [encode_box_payload(100000 + n, key=b"bench-key") for n in range(args.labels)]
+    cache = LabelCache(max_size=args.labels)
+
+    timed("serial (old path)", args.labels, lambda: [render_qr_png(payload) for payload in payloads])
+    pngs = timed(f"pool x{args.workers}, cold cache", args.labels,
+                 lambda: render_labels(payloads, workers=args.workers, cache=cache))
+    timed("warm cache", args.labels, lambda: render_labels(payloads, workers=args.workers, cache=cache))
+    sheet = timed("PDF sheet", args.labels,
+                  lambda: label_sheet([(png, f"Box ID: {100000 + n}") for n, png in enumerate(pngs)]))
+    print(f"sheet: {len(sheet) / 1024 / 1024:.1f} MiB for {args.labels} labels")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare simulated page-rerun latency with per-call connects vs. the shared pool.
+
+Needs a reachable MySQL with the bantuannow schema (same MYSQL_* environment
+variables as the app). Run from the repository root:
+
+    python benchmarks/bench_pool.py --reruns 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import DB_CONFIG, get_connection, get_pool_stats  # noqa: E402
+
+# Roughly what one rerun of the alerts/center_demands pages reads
+RERUN_QUERIES = [
+    "SELECT * FROM flood_centers2",
+    "SELECT * FROM supply_items",
+    "SELECT email FROM email_list_for_alerts",
+]
+
+
+def rerun_direct():
+    # Old behaviour: a fresh connection (TCP + auth handshake) per query
+    for query in RERUN_QUERIES:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute(query)
+        cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+
+def rerun_pooled():
+    for query in RERUN_QUERIES:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            cursor.fetchall()
+            cursor.close()
+
+
+def measure(fn, reruns):
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=100)
+    args = parser.parse_args()
+
+    # Warm the pool so the first checkout does not count the pool creation
+    rerun_pooled()
+
+    for label, fn in (("direct connect", rerun_direct), ("pooled", rerun_pooled)):
+        result = measure(fn, args.reruns)
+        print(f"{label:>15}: mean {result['mean_ms']:.2f} ms  "
+              f"p50 {result['p50_ms']:.2f} ms  p95 {result['p95_ms']:.2f} ms")
+
+    stats = get_pool_stats()
+    print(f"pool checkouts: {stats['checkouts']}  avg checkout {stats['checkout_time_avg'] * 1000:.3f} ms  "
+          f"max {stats['checkout_time_max'] * 1000:.3f} ms  reconnects {stats['reconnects']}")
+
+
+if __name__ == "__main__":
+    main()
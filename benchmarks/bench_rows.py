@@ -0,0 +1,67 @@
+"""Memory and latency of DataFrame vs. RowSet for typical read result sizes.
+
+Simulates what Database reads do with a fetchall() result (no MySQL needed):
+
+    python benchmarks/bench_rows.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import RowSet  # noqa: E402
+
+COLUMNS = ["demand_id", "center_name", "item_name", "quantity", "priority", "request_date"]
+
+
+def fetchall_result(size):
+    start = datetime(2025, 1, 1)
+    return [(n, f"Centre {n % 500}", f"Item {n % 300}", n % 50, "High", start + timedelta(seconds=n))
+            for n in range(size)]
+
+
+def as_dataframe(rows):
+    # What the selectbox pages did: build a frame, then pull ids and names out of it
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    return dict(zip(df['demand_id'].tolist(), df['item_name'].tolist()))
+
+
+def as_rowset(rows):
+    return RowSet(COLUMNS, rows).mapping('demand_id', 'item_name')
+
+
+def measure(fn, rows, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    import pandas  # noqa: F401
+    print(f"pandas import: {(time.perf_counter() - start) * 1000:.1f} ms (paid once per process)")
+
+    for size in args.sizes:
+        rows = fetchall_result(size)
+        for label, fn in (("DataFrame", as_dataframe), ("RowSet", as_rowset)):
+            elapsed, peak = measure(fn, rows)
+            print(f"{size:>7} rows  {label:>9}: {elapsed:8.2f} ms  peak {peak:7.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
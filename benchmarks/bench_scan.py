@@ -0,0 +1,139 @@
+"""Count round trips and time per box scan: legacy per-item loop vs. fulfil_box.
+
+Runs against an in-memory SQLite stand-in of the tables scan_qr_code touches,
+so no MySQL server is needed:
+
+    python benchmarks/bench_scan.py --items 30 --scans 200
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import fulfil_box  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE supply_items (item_id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE supply_boxes (box_id INTEGER PRIMARY KEY, qr_code TEXT UNIQUE, created_date TEXT);
+CREATE TABLE box_contents (content_id INTEGER PRIMARY KEY, box_id INTEGER, item_id INTEGER, quantity INTEGER);
+CREATE TABLE supply_demands (demand_id INTEGER PRIMARY KEY, center_id INTEGER, item_id INTEGER,
+                             quantity INTEGER, outstanding_quantity INTEGER, priority TEXT, request_date TEXT,
+                             status TEXT);
+CREATE TABLE supply_deliveries (delivery_id INTEGER PRIMARY KEY, box_id INTEGER, demand_id INTEGER,
+                                center_id INTEGER, delivery_date TEXT, received_by TEXT, quantity INTEGER);
+CREATE TABLE box_ngo_info (box_id INTEGER PRIMARY KEY, delivered_at TEXT);
+CREATE INDEX idx_demands_match ON supply_demands (center_id, item_id, status, request_date);
+CREATE INDEX idx_contents_box ON box_contents (box_id);
+CREATE INDEX idx_deliveries_box ON supply_deliveries (box_id);
+"""
+
+
+class CountingCursor:
+    """sqlite3 cursor that accepts mysql.connector %s placeholders and counts statements.
+
+    SQLite has no row locks, so FOR UPDATE is dropped."""
+
+    def __init__(self, conn, stats):
+        self._cursor = conn.cursor()
+        self._stats = stats
+
+    def execute(self, query, params=()):
+        self._stats["round_trips"] += 1
+        return self._cursor.execute(query.replace("%s", "?").replace(" FOR UPDATE", ""), tuple(params))
+
+    def executemany(self, query, seq):
+        self._stats["round_trips"] += 1
+        return self._cursor.executemany(query.replace("%s", "?"), seq)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+def legacy_scan(conn, cursor, stats, qr_code, center_id, received_by):
+    # The pre-batching implementation: per-item lookup, insert and commit
+    cursor.execute("SELECT box_id FROM supply_boxes WHERE qr_code = %s", (qr_code,))
+    box_id = cursor.fetchone()[0]
+    cursor.execute(
+        """SELECT bc.item_id, si.name, bc.quantity FROM box_contents bc
+           JOIN supply_items si ON bc.item_id = si.item_id WHERE bc.box_id = %s""",
+        (box_id,)
+    )
+    for item_id, _, _ in cursor.fetchall():
+        cursor.execute(
+            """SELECT demand_id FROM supply_demands
+               WHERE center_id = %s AND item_id = %s AND status = 'Pending'
+               ORDER BY request_date ASC LIMIT 1""",
+            (center_id, item_id)
+        )
+        demand = cursor.fetchone()
+        if demand:
+            cursor.execute(
+                """INSERT INTO supply_deliveries (box_id, demand_id, center_id, delivery_date, received_by)
+                   VALUES (%s, %s, %s, %s, %s)""",
+                (box_id, demand[0], center_id, datetime.now(), received_by)
+            )
+            cursor.execute("UPDATE supply_demands SET status = 'Fulfilled' WHERE demand_id = %s", (demand[0],))
+            conn.commit()
+            stats["commits"] += 1
+    conn.commit()
+    stats["commits"] += 1
+
+
+def batched_scan(conn, cursor, stats, qr_code, center_id, received_by):
+    fulfil_box(cursor, qr_code, center_id, received_by)
+    conn.commit()
+    stats["commits"] += 1
+
+
+def build_fixture(items, scans):
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO supply_items VALUES (?, ?)",
+                     [(i, f"item {i}") for i in range(1, items + 1)])
+    start = datetime(2025, 1, 1)
+    demands = []
+    for box in range(1, scans + 1):
+        conn.execute("INSERT INTO supply_boxes VALUES (?, ?, ?)", (box, f"QR-{box}", start.isoformat()))
+        conn.executemany("INSERT INTO box_contents (box_id, item_id, quantity) VALUES (?, ?, ?)",
+                         [(box, i, 5) for i in range(1, items + 1)])
+        demands.extend((1, i, 5, 5, "High", (start + timedelta(minutes=box)).isoformat(), "Pending")
+                       for i in range(1, items + 1))
+    conn.executemany(
+        "INSERT INTO supply_demands (center_id, item_id, quantity, outstanding_quantity, priority, request_date, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", demands
+    )
+    conn.commit()
+    return conn
+
+
+def run(label, scan, items, scans):
+    conn = build_fixture(items, scans)
+    stats = {"round_trips": 0, "commits": 0}
+    cursor = CountingCursor(conn, stats)
+    start = time.perf_counter()
+    for box in range(1, scans + 1):
+        scan(conn, cursor, stats, f"QR-{box}", 1, "bench")
+    elapsed = time.perf_counter() - start
+    delivered = conn.execute("SELECT COUNT(*) FROM supply_deliveries").fetchone()[0]
+    print(f"{label:>8}: {stats['round_trips'] / scans:6.1f} statements/scan  "
+          f"{stats['commits'] / scans:5.1f} commits/scan  "
+          f"{elapsed / scans * 1000:7.3f} ms/scan  ({delivered} deliveries)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=30, help="items per box")
+    parser.add_argument("--scans", type=int, default=100)
+    args = parser.parse_args()
+    run("legacy", legacy_scan, args.items, args.scans)
+    run("batched", batched_scan, args.items, args.scans)
+
+
+if __name__ == "__main__":
+    main()
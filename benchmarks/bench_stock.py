@@ -0,0 +1,86 @@
+"""Concurrent packing stress test: many threads drawing from a few hot lots.
+
+Needs a reachable MySQL with the bantuannow schema (same MYSQL_* environment
+variables as the app). The lots are created for a separate NGO id and drained
+to below one take, so only near-empty rows are left behind. Give the pool at
+least one connection per thread so threads contend on rows, not connections:
+
+    MYSQL_POOL_SIZE=8 python benchmarks/bench_stock.py --threads 8 --lots 4 --units 2000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database, InsufficientStock, StockConflict, get_stock_stats, read_rows  # noqa: E402
+
+
+def worker(db, lots, per_take, results, lock):
+    rng = random.Random()
+    open_lots = list(lots)
+    taken = failed = gave_up = 0
+    while open_lots:
+        inventory_id = rng.choice(open_lots)
+        try:
+            db.take_stock({inventory_id: per_take})
+            taken += 1
+        except InsufficientStock:
+            open_lots.remove(inventory_id)
+            failed += 1
+        except StockConflict:
+            gave_up += 1
+    with lock:
+        results["taken"] += taken
+        results["insufficient"] += failed
+        results["gave_up"] += gave_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--lots", type=int, default=4, help="fewer lots means more contention")
+    parser.add_argument("--units", type=int, default=2000, help="starting stock per lot")
+    parser.add_argument("--per-take", type=int, default=3)
+    parser.add_argument("--ngo-id", type=int, default=999999)
+    parser.add_argument("--item-id", type=int, default=1)
+    args = parser.parse_args()
+
+    db = Database()
+    lots = [db.insert_ngoinventory(args.ngo_id, args.item_id, args.units, date(2099, 1, 1),
+                                   f"bench-{n}", "bench_stock.py", "stress test lot")
+            for n in range(args.lots)]
+    before = get_stock_stats()
+    results = {"taken": 0, "insufficient": 0, "gave_up": 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker, args=(db, lots, args.per_take, results, lock))
+               for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = get_stock_stats()
+
+    left = read_rows(
+        "SELECT SUM(quantity) AS left_over, MIN(quantity) AS lowest FROM ngo_inventory WHERE inventory_id IN (%s)"
+        % ','.join(['%s'] * len(lots)), lots
+    ).rows[0]
+    conflicts = after["conflicts"] - before["conflicts"]
+    commits = after["commits"] - before["commits"]
+    print(f"{args.threads} threads, {args.lots} lots x {args.units} units, {args.per_take} per take")
+    print(f"  throughput:    {results['taken'] / elapsed:8.1f} takes/s ({results['taken']} in {elapsed:.2f} s)")
+    print(f"  conflict rate: {conflicts / max(commits + conflicts, 1):8.1%} ({conflicts} retried, "
+          f"{results['gave_up']} gave up)")
+    print(f"  stock check:   {args.lots * args.units - int(left[0])} units taken, "
+          f"{results['taken'] * args.per_take} recorded, lowest lot {left[1]}")
+    assert args.lots * args.units - int(left[0]) == results["taken"] * args.per_take, "stock oversold"
+    assert left[1] >= 0
+
+
+if __name__ == "__main__":
+    main()
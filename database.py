@@ -1,96 +1,1643 @@
 import mysql.connector
-import pandas as pd
-from datetime import datetime
+from mysql.connector import pooling
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+import json
+from datetime import datetime, timedelta
 import os
-import qrcode
+import random
+import threading
+import time
+from qr_payload import decode_box_payload, is_box_payload, payload_key
+from allocation import PRIORITY_RANK, Demand, Lot, allocate
+from notifications import SubscriptionIndex, queue_demand_alert, queue_fulfilment_digest
+
+# Connection pool settings (override through environment variables)
+DB_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),  # Change if different in DBeaver
+    "user": os.getenv("MYSQL_USER"),
+    "password": os.getenv("MYSQL_PASSWORD"),
+    "database": os.getenv("MYSQL_DB", "bantuannow"),
+    "port": os.getenv("MYSQL_PORT", "3306"),  # MySQL default port
+}
+POOL_NAME = "bantuannow_pool"
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))  # mysql.connector allows at most 32
+POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+POOL_PRE_PING = os.getenv("MYSQL_POOL_PRE_PING", "1") != "0"
+
+# Read cache settings: reference tables change rarely, demand lists often
+CACHE_TTL = float(os.getenv("BANTUANNOW_CACHE_TTL", "300"))
+DEMAND_CACHE_TTL = float(os.getenv("BANTUANNOW_DEMAND_CACHE_TTL", "5"))
+# Past this many entries the cache drops expired results, then the oldest
+CACHE_MAX_ENTRIES = int(os.getenv("BANTUANNOW_CACHE_MAX_ENTRIES", "1024"))
+# Seconds of demand changes re-read on every poll, for transactions that commit late
+DEMAND_POLL_OVERLAP = float(os.getenv("BANTUANNOW_DEMAND_POLL_OVERLAP", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_stats = {
+    "checkouts": 0,
+    "checkout_time_total": 0.0,
+    "checkout_time_max": 0.0,
+    "waits": 0,
+    "reconnects": 0,
+    "timeouts": 0,
+}
 
-class Database:
-    def __init__(self):
-        # Get database credentials from environment variables
-        mysql_user = os.getenv("MYSQL_USER")
-        mysql_password = os.getenv("MYSQL_PASSWORD")
 
-        # Database connection using mysql.connector
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=POOL_NAME,
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """Check out a pooled connection and hand it back to the pool afterwards."""
+    pool = get_pool()
+    start = time.perf_counter()
+    waited = False
+    while True:
         try:
-            self.conn = mysql.connector.connect(
-                host="localhost",  # Change if different in DBeaver
-                user=mysql_user,
-                password=mysql_password,
-                database="bantuannow",
-                port="3306"  # MySQL default port
+            conn = pool.get_connection()
+            break
+        except pooling.PoolError:
+            # Pool exhausted, wait for another thread to return a connection
+            if time.perf_counter() - start > POOL_TIMEOUT:
+                with _pool_lock:
+                    _pool_stats["timeouts"] += 1
+                raise Exception(f"Database connection error: no free connection after {POOL_TIMEOUT}s")
+            waited = True
+            time.sleep(0.01)
+
+    try:
+        # Health check: revive connections the server dropped while idle in the pool
+        if POOL_PRE_PING and not conn.is_connected():
+            conn.reconnect(attempts=2, delay=0)
+            with _pool_lock:
+                _pool_stats["reconnects"] += 1
+    except Exception:
+        conn.close()
+        raise
+
+    elapsed = time.perf_counter() - start
+    with _pool_lock:
+        _pool_stats["checkouts"] += 1
+        _pool_stats["checkout_time_total"] += elapsed
+        _pool_stats["checkout_time_max"] = max(_pool_stats["checkout_time_max"], elapsed)
+        if waited:
+            _pool_stats["waits"] += 1
+
+    try:
+        yield conn
+    finally:
+        # close() on a pooled connection returns it to the pool
+        conn.close()
+
+
+# MySQL errors caused by the values written, which retrying cannot fix:
+# duplicate key, NULL in a NOT NULL column, value out of range, bad date or
+# string value, data too long, missing parent or child row
+DATA_ERRNOS = {1048, 1062, 1264, 1292, 1366, 1406, 1451, 1452}
+
+
+def is_data_error(e):
+    """True for errors caused by the statement's data, e.g. a constraint violation
+    or a value that does not fit. Anything else (lost connections, pool
+    timeouts, deadlocks, missing tables or columns, access denied, missing
+    grants) is an outage to retry once it is fixed."""
+    if isinstance(e, (mysql.connector.errors.IntegrityError, mysql.connector.errors.DataError)):
+        return True
+    return isinstance(e, mysql.connector.errors.Error) and e.errno in DATA_ERRNOS
+
+
+def get_pool_stats():
+    """Return a snapshot of the pool checkout metrics."""
+    with _pool_lock:
+        stats = dict(_pool_stats)
+    stats["pool_size"] = POOL_SIZE
+    stats["checkout_time_avg"] = (
+        stats["checkout_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    )
+    return stats
+
+
+class QueryCache:
+    """Process-wide TTL cache of read results, tagged with the tables they read."""
+
+    def __init__(self, ttl, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, tables, loader, ttl=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._prune(now)
+            self._entries[key] = (now + (self.ttl if ttl is None else ttl), frozenset(tables), value)
+        return value
+
+    def _prune(self, now):
+        # Expired results first; if that is not enough, the ones expiring soonest
+        stale = [key for key, entry in self._entries.items() if entry[0] <= now]
+        if len(self._entries) - len(stale) >= self.max_entries:
+            live = sorted((entry[0], key) for key, entry in self._entries.items() if entry[0] > now)
+            stale += [key for _, key in live[:len(live) - self.max_entries + 1]]
+        for key in stale:
+            del self._entries[key]
+        self.evictions += len(stale)
+
+    def invalidate(self, *tables):
+        """Drop every cached result that read from any of the given tables."""
+        tables = set(tables)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[1] & tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+_cache = QueryCache(CACHE_TTL)
+
+
+def get_cache_stats():
+    """Return hit/miss counters of the shared read cache."""
+    return _cache.stats()
+
+
+def invalidate_tables(*tables):
+    """Invalidate cached reads of the given tables after writing to them."""
+    _cache.invalidate(*tables)
+
+
+@lru_cache(maxsize=256)
+def _row_type(columns):
+    return namedtuple("Row", columns, rename=True)
+
+
+class RowSet:
+    """Read result kept as the plain tuples fetchall() returned.
+
+    Iterating yields named-tuple rows, column() and mapping() cover the
+    selectbox use cases, and to_frame() builds a pandas DataFrame only for
+    callers that actually need one.
+    """
+
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        make = _row_type(self.columns)._make
+        return (make(row) for row in self.rows)
+
+    @property
+    def empty(self):
+        return not self.rows
+
+    def column(self, name):
+        index = self.columns.index(name)
+        return [row[index] for row in self.rows]
+
+    def mapping(self, key, value):
+        """{key column: value column}, e.g. mapping('center_id', 'name')."""
+        k, v = self.columns.index(key), self.columns.index(value)
+        return {row[k]: row[v] for row in self.rows}
+
+    def dicts(self):
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.rows, columns=list(self.columns))
+
+
+def read_rows(query, params=None):
+    """Run a SELECT on a pooled connection and return the rows as a RowSet."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params or ())
+        rows = RowSet([desc[0] for desc in cursor.description], cursor.fetchall())
+        cursor.close()
+    return rows
+
+
+def cached_read_rows(query, params=None, tables=(), ttl=None):
+    """Like read_rows, but served from the shared cache until it expires or one
+    of `tables` is written to. RowSets hold tuples, so they are shared as is."""
+    key = (query, tuple(params or ()))
+    return _cache.get_or_load(key, tables, lambda: read_rows(query, params), ttl)
+
+
+def read_sql(query, params=None):
+    """Run a SELECT on a pooled connection and return the rows as a DataFrame."""
+    return read_rows(query, params).to_frame()
+
+
+def cached_read_sql(query, params=None, tables=(), ttl=None):
+    """DataFrame form of cached_read_rows; every call gets its own frame."""
+    return cached_read_rows(query, params, tables, ttl).to_frame()
+
+
+def cached_lookup(query, key, value=None, params=None, tables=(), ttl=None):
+    """Cached {key column: value column} dict of a query's rows (whole rows when
+    value is None). Pages use these for selectbox labels instead of filtering a
+    DataFrame once per option. The dict is shared, so treat it as read-only."""
+    def load():
+        rows = read_rows(query, params)
+        if value is not None:
+            return rows.mapping(key, value)
+        index = rows.columns.index(key)
+        return {row[index]: row for row in rows}
+    cache_key = ("lookup", query, tuple(params or ()), key, value)
+    return _cache.get_or_load(cache_key, tables, load, ttl)
+
+
+def execute_write(query, params=None, invalidates=()):
+    """Run an INSERT/UPDATE/DELETE on a pooled connection, commit and return the last row id.
+
+    `invalidates` lists the tables the statement modifies so their cached reads are dropped."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params or ())
+        conn.commit()
+        lastrowid = cursor.lastrowid
+        cursor.close()
+    if invalidates:
+        invalidate_tables(*invalidates)
+    return lastrowid
+
+
+@contextmanager
+def transaction(invalidates=()):
+    """Cursor on a pooled connection whose statements commit together, or roll
+    back together on error; `invalidates` as for execute_write."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    if invalidates:
+        invalidate_tables(*invalidates)
+
+
+# Summary tables, kept up to date incrementally by the Database write paths.
+# Each entry is (table, key columns, counter columns, SELECT computing the rows
+# from the base tables); rebuild_summaries() and check_summaries() use them.
+SUMMARY_SOURCES = [
+    ("ngo_centers_served", ("ngo_id", "center_id"), (),
+     """SELECT DISTINCT ngo_id, delivered_center_id FROM box_ngo_info
+        WHERE ngo_id IS NOT NULL AND delivered_center_id IS NOT NULL"""),
+    ("ngo_summary", ("ngo_id",), ("total_items", "boxes_sent", "boxes_delivered", "centers_served"),
+     """SELECT n.ngo_id,
+               COALESCE((SELECT SUM(i.quantity) FROM ngo_inventory i
+                         WHERE i.ngo_id = n.ngo_id AND i.expired_at IS NULL), 0),
+               (SELECT COUNT(*) FROM box_ngo_info b WHERE b.ngo_id = n.ngo_id),
+               (SELECT COUNT(*) FROM box_ngo_info b WHERE b.ngo_id = n.ngo_id AND b.delivered_at IS NOT NULL),
+               (SELECT COUNT(*) FROM ngo_centers_served s WHERE s.ngo_id = n.ngo_id)
+        FROM (SELECT ngo_id FROM ngo_inventory
+              UNION SELECT ngo_id FROM box_ngo_info WHERE ngo_id IS NOT NULL) n"""),
+    ("center_summary", ("center_id",), ("pending_demands", "pending_quantity", "fulfilled_demands", "boxes_received"),
+     """SELECT c.center_id,
+               (SELECT COUNT(*) FROM supply_demands d WHERE d.center_id = c.center_id AND d.status = 'Pending'),
+               COALESCE((SELECT SUM(d.outstanding_quantity) FROM supply_demands d
+                         WHERE d.center_id = c.center_id AND d.status = 'Pending'), 0),
+               (SELECT COUNT(*) FROM supply_demands d WHERE d.center_id = c.center_id AND d.status = 'Fulfilled'),
+               (SELECT COUNT(*) FROM box_ngo_info b WHERE b.delivered_center_id = c.center_id)
+        FROM (SELECT center_id FROM supply_demands
+              UNION SELECT delivered_center_id FROM box_ngo_info WHERE delivered_center_id IS NOT NULL) c"""),
+    ("item_summary", ("item_id",), ("inventory_quantity", "pending_demands", "pending_quantity"),
+     """SELECT t.item_id,
+               COALESCE((SELECT SUM(i.quantity) FROM ngo_inventory i
+                         WHERE i.item_id = t.item_id AND i.expired_at IS NULL), 0),
+               (SELECT COUNT(*) FROM supply_demands d WHERE d.item_id = t.item_id AND d.status = 'Pending'),
+               COALESCE((SELECT SUM(d.outstanding_quantity) FROM supply_demands d
+                         WHERE d.item_id = t.item_id AND d.status = 'Pending'), 0)
+        FROM (SELECT item_id FROM ngo_inventory UNION SELECT item_id FROM supply_demands) t"""),
+]
+SUMMARY_TABLES = tuple(table for table, _, _, _ in SUMMARY_SOURCES)
+SUMMARY_MIGRATION = 6
+
+# Supply history: every inventory movement is appended to supply_history and
+# folded into per-hour and per-day rollups at write time. Trend queries read
+# the coarsest table that still resolves the requested range.
+HISTORY_EVENTS = ('stocked', 'packed', 'delivered')
+HISTORY_TABLES = ("supply_history", "supply_history_hourly", "supply_history_daily")
+HISTORY_RESOLUTIONS = [  # (longest range, table, time column)
+    (timedelta(days=2), "supply_history", "recorded_at"),
+    (timedelta(days=62), "supply_history_hourly", "period"),
+    (None, "supply_history_daily", "period"),
+]
+# Period of one row in each history table
+HISTORY_STEPS = {
+    "supply_history": timedelta(minutes=1),
+    "supply_history_hourly": timedelta(hours=1),
+    "supply_history_daily": timedelta(days=1),
+}
+
+# Donation tracking: one row per donation with its allocation lines as a JSON
+# array, plus per-donor totals by NGO, so a donor's page is one index range read
+# instead of a join that repeats the donation once per allocation.
+DONATION_TABLES = ("donations", "donation_allocations", "donation_tracking", "donor_summary")
+DONATION_MIGRATION = 11
+DONATION_PAGE_SIZE = int(os.getenv("BANTUANNOW_DONATION_PAGE_SIZE", "20"))
+
+# Schema migrations: (version, description, statements). Applied versions are
+# recorded in schema_migrations; never edit a released migration, add a new one.
+MIGRATIONS = [
+    (1, "base tables", [
+        """CREATE TABLE IF NOT EXISTS flood_centers2 (
+            center_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            location VARCHAR(255),
+            contact_person VARCHAR(255),
+            phone VARCHAR(50),
+            email VARCHAR(255)
+        )""",
+        """CREATE TABLE IF NOT EXISTS supply_items (
+            item_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            category VARCHAR(100),
+            unit VARCHAR(50)
+        )""",
+        """CREATE TABLE IF NOT EXISTS ngos2 (
+            ngo_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            website VARCHAR(255),
+            password_hash VARCHAR(255),
+            verification_status VARCHAR(20) DEFAULT 'Pending'
+        )""",
+        """CREATE TABLE IF NOT EXISTS supply_demands (
+            demand_id INT AUTO_INCREMENT PRIMARY KEY,
+            center_id INT NOT NULL,
+            item_id INT NOT NULL,
+            quantity INT NOT NULL,
+            priority VARCHAR(20) NOT NULL,
+            request_date DATETIME NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'Pending'
+        )""",
+        """CREATE TABLE IF NOT EXISTS supply_boxes (
+            box_id INT AUTO_INCREMENT PRIMARY KEY,
+            qr_code VARCHAR(64),
+            created_date DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS box_contents (
+            content_id INT AUTO_INCREMENT PRIMARY KEY,
+            box_id INT NOT NULL,
+            item_id INT NOT NULL,
+            quantity INT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS box_ngo_info (
+            box_id INT PRIMARY KEY,
+            destination_center_id INT,
+            priority VARCHAR(20)
+        )""",
+        """CREATE TABLE IF NOT EXISTS supply_deliveries (
+            delivery_id INT AUTO_INCREMENT PRIMARY KEY,
+            box_id INT NOT NULL,
+            demand_id INT NOT NULL,
+            center_id INT NOT NULL,
+            delivery_date DATETIME,
+            received_by VARCHAR(255)
+        )""",
+        """CREATE TABLE IF NOT EXISTS ngo_inventory (
+            inventory_id INT AUTO_INCREMENT PRIMARY KEY,
+            ngo_id INT NOT NULL,
+            item_id INT NOT NULL,
+            name VARCHAR(255),
+            quantity INT NOT NULL DEFAULT 0,
+            expiry_date DATE,
+            batch_id VARCHAR(100),
+            source VARCHAR(255),
+            notes TEXT,
+            last_updated DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS donations (
+            donation_id INT AUTO_INCREMENT PRIMARY KEY,
+            ngo_id INT NOT NULL,
+            donor_name VARCHAR(255),
+            donor_email VARCHAR(255),
+            amount DECIMAL(12, 2) NOT NULL,
+            donation_date DATETIME,
+            payment_method VARCHAR(50)
+        )""",
+        """CREATE TABLE IF NOT EXISTS donation_allocations (
+            allocation_id INT AUTO_INCREMENT PRIMARY KEY,
+            donation_id INT NOT NULL,
+            purpose VARCHAR(255),
+            amount DECIMAL(12, 2),
+            allocation_date DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS email_list_for_alerts (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            email VARCHAR(255) NOT NULL,
+            created_at DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS qr_codes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            qr_type VARCHAR(50),
+            qr_data TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS supply_centers (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            center_id INT NOT NULL,
+            item_id INT NOT NULL,
+            quantity INT,
+            date DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS flood_centres (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            centre_name VARCHAR(255),
+            state VARCHAR(100),
+            clothes INT DEFAULT 0,
+            food INT DEFAULT 0,
+            medicine_kit INT DEFAULT 0,
+            mineral_water INT DEFAULT 0
+        )""",
+    ]),
+    (2, "demand change tracking and alert subscriptions", [
+        """ALTER TABLE supply_demands
+            ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+            DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)""",
+        """CREATE TABLE IF NOT EXISTS alert_subscriptions (
+            subscription_id INT AUTO_INCREMENT PRIMARY KEY,
+            email VARCHAR(255) NOT NULL,
+            center_id INT NULL,
+            priority VARCHAR(20) NOT NULL,
+            created_at DATETIME
+        )""",
+    ]),
+    (3, "indexes for hot query predicates", [
+        "CREATE INDEX idx_demands_center_item_status ON supply_demands (center_id, item_id, status, request_date)",
+        "CREATE INDEX idx_demands_status_priority ON supply_demands (status, priority, request_date)",
+        "CREATE INDEX idx_demands_updated ON supply_demands (updated_at, demand_id)",
+        "CREATE INDEX idx_donations_donor_email ON donations (donor_email, donation_date)",
+        "CREATE INDEX idx_allocations_donation ON donation_allocations (donation_id)",
+        "CREATE UNIQUE INDEX idx_boxes_qr_code ON supply_boxes (qr_code)",
+        "CREATE INDEX idx_box_contents_box ON box_contents (box_id)",
+        "CREATE INDEX idx_inventory_ngo ON ngo_inventory (ngo_id, item_id)",
+        "CREATE INDEX idx_subscriptions_match ON alert_subscriptions (center_id, priority)",
+        "CREATE INDEX idx_subscriptions_email ON alert_subscriptions (email)",
+    ]),
+    (4, "applied scan journal entries", [
+        """CREATE TABLE IF NOT EXISTS applied_scans (
+            scan_id CHAR(36) PRIMARY KEY,
+            recorded_at DATETIME,
+            applied_at DATETIME
+        )""",
+    ]),
+    (5, "index for dashboard state filter", [
+        "CREATE INDEX idx_centres_state ON flood_centres (state)",
+    ]),
+    (SUMMARY_MIGRATION, "summary tables", [
+        """ALTER TABLE box_ngo_info
+            ADD COLUMN ngo_id INT NULL,
+            ADD COLUMN delivered_at DATETIME NULL,
+            ADD COLUMN delivered_center_id INT NULL""",
+        "CREATE INDEX idx_box_info_ngo ON box_ngo_info (ngo_id, delivered_at)",
+        """CREATE TABLE IF NOT EXISTS ngo_centers_served (
+            ngo_id INT NOT NULL,
+            center_id INT NOT NULL,
+            PRIMARY KEY (ngo_id, center_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS ngo_summary (
+            ngo_id INT PRIMARY KEY,
+            total_items BIGINT NOT NULL DEFAULT 0,
+            boxes_sent INT NOT NULL DEFAULT 0,
+            boxes_delivered INT NOT NULL DEFAULT 0,
+            centers_served INT NOT NULL DEFAULT 0
+        )""",
+        """CREATE TABLE IF NOT EXISTS center_summary (
+            center_id INT PRIMARY KEY,
+            pending_demands INT NOT NULL DEFAULT 0,
+            pending_quantity BIGINT NOT NULL DEFAULT 0,
+            fulfilled_demands INT NOT NULL DEFAULT 0,
+            boxes_received INT NOT NULL DEFAULT 0
+        )""",
+        """CREATE TABLE IF NOT EXISTS item_summary (
+            item_id INT PRIMARY KEY,
+            inventory_quantity BIGINT NOT NULL DEFAULT 0,
+            pending_demands INT NOT NULL DEFAULT 0,
+            pending_quantity BIGINT NOT NULL DEFAULT 0
+        )""",
+    ]),
+    (7, "supply history with hourly and daily rollups", [
+        """CREATE TABLE IF NOT EXISTS supply_history (
+            history_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            recorded_at DATETIME NOT NULL,
+            item_id INT NOT NULL,
+            event VARCHAR(20) NOT NULL,
+            quantity INT NOT NULL,
+            level BIGINT NOT NULL,
+            INDEX idx_history_time (recorded_at, item_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS supply_history_hourly (
+            period DATETIME NOT NULL,
+            item_id INT NOT NULL,
+            stocked BIGINT NOT NULL DEFAULT 0,
+            packed BIGINT NOT NULL DEFAULT 0,
+            delivered BIGINT NOT NULL DEFAULT 0,
+            level BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, item_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS supply_history_daily (
+            period DATETIME NOT NULL,
+            item_id INT NOT NULL,
+            stocked BIGINT NOT NULL DEFAULT 0,
+            packed BIGINT NOT NULL DEFAULT 0,
+            delivered BIGINT NOT NULL DEFAULT 0,
+            level BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, item_id)
+        )""",
+        # Starting level of every item, so charts have a first point
+        """INSERT INTO supply_history (recorded_at, item_id, event, quantity, level)
+           SELECT NOW(), item_id, 'baseline', 0, SUM(quantity) FROM ngo_inventory GROUP BY item_id""",
+        """INSERT INTO supply_history_hourly (period, item_id, level)
+           SELECT DATE_FORMAT(NOW(), '%Y-%m-%d %H:00:00'), item_id, SUM(quantity) FROM ngo_inventory GROUP BY item_id""",
+        """INSERT INTO supply_history_daily (period, item_id, level)
+           SELECT CURDATE(), item_id, SUM(quantity) FROM ngo_inventory GROUP BY item_id""",
+    ]),
+    (8, "outstanding quantity per demand and units per delivery", [
+        "ALTER TABLE supply_demands ADD COLUMN outstanding_quantity INT NOT NULL DEFAULT 0",
+        # Keep updated_at so polling pages do not see every demand as changed
+        """UPDATE supply_demands
+           SET outstanding_quantity = CASE WHEN status = 'Fulfilled' THEN 0 ELSE quantity END,
+               updated_at = updated_at""",
+        "ALTER TABLE supply_deliveries ADD COLUMN quantity INT NULL",
+    ]),
+    (9, "expiry-ordered inventory indexes and expired stock flag", [
+        "ALTER TABLE ngo_inventory ADD COLUMN expired_at DATETIME NULL",
+        # FEFO picking walks one (ngo, item) range in expiry order
+        "CREATE INDEX idx_inventory_fefo ON ngo_inventory (ngo_id, item_id, expiry_date, inventory_id)",
+        # Expiring-soon report and the expiry sweep scan an expiry date range
+        "CREATE INDEX idx_inventory_expiry ON ngo_inventory (expiry_date)",
+    ]),
+    (10, "row version for optimistic stock decrements", [
+        "ALTER TABLE ngo_inventory ADD COLUMN version INT NOT NULL DEFAULT 0",
+    ]),
+    (DONATION_MIGRATION, "donation tracking read model", [
+        """CREATE TABLE IF NOT EXISTS donation_tracking (
+            donation_id INT PRIMARY KEY,
+            donor_email VARCHAR(255),
+            ngo_id INT NOT NULL,
+            ngo_name VARCHAR(255),
+            amount DECIMAL(12, 2) NOT NULL,
+            donation_date DATETIME,
+            allocated_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            allocations JSON NOT NULL,
+            INDEX idx_tracking_donor (donor_email, donation_date, donation_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS donor_summary (
+            donor_email VARCHAR(255) NOT NULL,
+            ngo_id INT NOT NULL,
+            donations INT NOT NULL DEFAULT 0,
+            total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            allocated_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (donor_email, ngo_id)
+        )""",
+    ]),
+    (12, "deliveries by box", [
+        # fulfil_box checks whether a scanned box was counted before
+        "CREATE INDEX idx_deliveries_box ON supply_deliveries (box_id)",
+    ]),
+    (13, "alert subscriptions for existing alert emails", [
+        # Addresses on the old alert list got every demand; keep it that way
+        # (any center, every priority) until they narrow their filters
+        """INSERT INTO alert_subscriptions (email, center_id, priority, created_at)
+           SELECT e.email, NULL, p.priority, NOW()
+           FROM (SELECT DISTINCT email FROM email_list_for_alerts) e
+           CROSS JOIN (SELECT 'Critical' AS priority UNION ALL SELECT 'High'
+                       UNION ALL SELECT 'Medium' UNION ALL SELECT 'Low') p
+           WHERE NOT EXISTS (SELECT 1 FROM alert_subscriptions s WHERE s.email = e.email)""",
+    ]),
+    (14, "demand units packed per box", [
+        # plan_allocation leaves units packed in undelivered boxes out of a demand
+        """CREATE TABLE IF NOT EXISTS box_demands (
+            box_id INT NOT NULL,
+            demand_id INT NOT NULL,
+            quantity INT NOT NULL,
+            PRIMARY KEY (box_id, demand_id),
+            INDEX idx_box_demands_demand (demand_id)
+        )""",
+    ]),
+    (15, "stock totals without expired lots", [
+        # sweep_expired_stock now takes flagged lots out of the totals; take out
+        # the ones flagged before
+        """UPDATE ngo_summary s
+           JOIN (SELECT ngo_id, SUM(quantity) AS units FROM ngo_inventory
+                 WHERE expired_at IS NOT NULL GROUP BY ngo_id) e ON e.ngo_id = s.ngo_id
+           SET s.total_items = s.total_items - e.units""",
+        """UPDATE item_summary s
+           JOIN (SELECT item_id, SUM(quantity) AS units FROM ngo_inventory
+                 WHERE expired_at IS NOT NULL GROUP BY item_id) e ON e.item_id = s.item_id
+           SET s.inventory_quantity = s.inventory_quantity - e.units""",
+    ]),
+]
+
+
+def run_migrations(target=None):
+    """Apply pending migrations in order and return the versions applied.
+
+    MySQL commits DDL implicitly, so each version is recorded right after its
+    statements succeed; a failing statement stops the run at that version.
+    """
+    applied_now = []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(255),
+                applied_at DATETIME
+            )"""
+        )
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+        for version, description, statements in MIGRATIONS:
+            if version in applied or (target is not None and version > target):
+                continue
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+                (version, description, datetime.now())
+            )
+            conn.commit()
+            applied_now.append(version)
+        cursor.close()
+    _cache.clear()
+    if SUMMARY_MIGRATION in applied_now:
+        # Fill the new summary tables from the data already there
+        rebuild_summaries()
+    if DONATION_MIGRATION in applied_now:
+        rebuild_donation_tracking()
+    return applied_now
+
+
+def rebuild_summaries():
+    """Recompute every summary table from the base tables in one transaction."""
+    with transaction(invalidates=SUMMARY_TABLES) as cursor:
+        for table, keys, columns, select in SUMMARY_SOURCES:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"INSERT INTO {table} ({', '.join(keys + columns)}) {select}")
+
+
+def rebuild_donation_tracking():
+    """Recompute donation_tracking and donor_summary from donations and
+    donation_allocations, e.g. after allocations were written by hand."""
+    with transaction(invalidates=DONATION_TABLES) as cursor:
+        cursor.execute("DELETE FROM donation_tracking")
+        cursor.execute(
+            """INSERT INTO donation_tracking (donation_id, donor_email, ngo_id, ngo_name, amount, donation_date,
+                                              allocated_amount, allocations)
+               SELECT d.donation_id, d.donor_email, d.ngo_id, n.name, d.amount, d.donation_date,
+                      COALESCE((SELECT SUM(da.amount) FROM donation_allocations da
+                                WHERE da.donation_id = d.donation_id), 0),
+                      COALESCE((SELECT JSON_ARRAYAGG(JSON_OBJECT('allocation_id', da.allocation_id,
+                                                                 'purpose', da.purpose, 'amount', da.amount,
+                                                                 'allocation_date', da.allocation_date))
+                                FROM donation_allocations da WHERE da.donation_id = d.donation_id), JSON_ARRAY())
+               FROM donations d
+               JOIN ngos2 n ON d.ngo_id = n.ngo_id"""
+        )
+        cursor.execute("DELETE FROM donor_summary")
+        cursor.execute(
+            """INSERT INTO donor_summary (donor_email, ngo_id, donations, total_amount, allocated_amount)
+               SELECT donor_email, ngo_id, COUNT(*), SUM(amount), SUM(allocated_amount)
+               FROM donation_tracking WHERE donor_email IS NOT NULL
+               GROUP BY donor_email, ngo_id"""
+        )
+
+
+SWEEP_BATCH = 5000  # lots flagged per transaction by sweep_expired_stock
+
+
+def sweep_expired_stock(as_of=None):
+    """Flag lots whose expiry date is before `as_of` (default today) and that still
+    hold stock, so picking and allocation skip them; returns how many were flagged.
+    Their units leave the NGO and item stock totals in the summary tables.
+    Meant to run daily, e.g. from cron with 'python database.py sweep-expired'."""
+    flagged = 0
+    now = datetime.now()
+    while True:
+        # Bounded batches keep row locks short on a large inventory
+        with transaction(invalidates=("ngo_inventory", "ngo_summary", "item_summary")) as cursor:
+            cursor.execute(
+                """SELECT inventory_id, ngo_id, item_id, quantity FROM ngo_inventory
+                   WHERE expiry_date < %s AND expired_at IS NULL AND quantity > 0
+                   LIMIT %s FOR UPDATE""",
+                (as_of or now.date(), SWEEP_BATCH)
             )
-            self.cursor = self.conn.cursor()
+            lots = cursor.fetchall()
+            if lots:
+                cursor.execute(
+                    "UPDATE ngo_inventory SET expired_at = %%s WHERE inventory_id IN (%s)"
+                    % ','.join(['%s'] * len(lots)),
+                    [now] + [inventory_id for inventory_id, _, _, _ in lots]
+                )
+                ngos, items = {}, {}
+                for _, ngo_id, item_id, quantity in lots:
+                    _add(ngos, ngo_id, 'total_items', -quantity)
+                    _add(items, item_id, 'inventory_quantity', -quantity)
+                bump_summary(cursor, "ngo_summary", "ngo_id", ngos)
+                bump_summary(cursor, "item_summary", "item_id", items)
+            flagged += len(lots)
+        if len(lots) < SWEEP_BATCH:
+            return flagged
+
+
+def check_summaries():
+    """Compare the summary tables with the base tables; returns the mismatches as
+    (table, key, column, stored, actual), empty when they agree."""
+    problems = []
+    with transaction() as cursor:
+        for table, keys, columns, select in SUMMARY_SOURCES:
+            cursor.execute(select)
+            actual = {row[:len(keys)]: row[len(keys):] for row in cursor.fetchall()}
+            cursor.execute(f"SELECT {', '.join(keys + columns)} FROM {table}")
+            stored = {row[:len(keys)]: row[len(keys):] for row in cursor.fetchall()}
+            for key in sorted(set(actual) | set(stored)):
+                if not columns:
+                    # Membership table: a row is either there or not
+                    if (key in actual) != (key in stored):
+                        problems.append((table, key, None, key in stored, key in actual))
+                    continue
+                have = stored.get(key, (0,) * len(columns))
+                want = actual.get(key, (0,) * len(columns))
+                for column, have_value, want_value in zip(columns, have, want):
+                    if int(have_value or 0) != int(want_value or 0):
+                        problems.append((table, key, column, have_value, want_value))
+    return problems
+
+
+# Hot queries and the tables that must be reached through an index, for the
+# EXPLAIN-based regression check
+HOT_QUERIES = [
+    ("scan: pending demand per item",
+     """SELECT demand_id FROM supply_demands
+        WHERE center_id = %s AND item_id = %s AND status = 'Pending'
+        ORDER BY request_date ASC LIMIT 1""",
+     (1, 1), "supply_demands"),
+    ("alerts: pending demands",
+     "SELECT demand_id, priority, request_date FROM supply_demands WHERE status = 'Pending'",
+     (), "supply_demands"),
+    ("alerts: demands since cursor",
+     """SELECT demand_id FROM supply_demands
+        WHERE (updated_at, demand_id) > (%s, %s) ORDER BY updated_at, demand_id LIMIT 1000""",
+     (datetime(1970, 1, 1), 0), "supply_demands"),
+    ("tracking: donations by donor",
+     "SELECT donation_id FROM donations WHERE donor_email = %s", ("donor@example.com",), "donations"),
+    ("tracking: donor page",
+     """SELECT donation_id, allocations FROM donation_tracking
+        WHERE donor_email = %s AND ((donation_date, donation_id) < (%s, %s) OR donation_date IS NULL)
+        ORDER BY donation_date DESC, donation_id DESC LIMIT 21""",
+     ("donor@example.com", datetime(2100, 1, 1), 0), "donation_tracking"),
+    ("tracking: donor totals",
+     "SELECT ngo_id, total_amount FROM donor_summary WHERE donor_email = %s", ("donor@example.com",),
+     "donor_summary"),
+    ("scan: box by QR code",
+     "SELECT box_id FROM supply_boxes WHERE qr_code = %s", ("qr",), "supply_boxes"),
+    ("scan: deliveries of a box",
+     "SELECT 1 FROM supply_deliveries WHERE box_id = %s", (1,), "supply_deliveries"),
+    ("scan: box contents",
+     "SELECT item_id, quantity FROM box_contents WHERE box_id = %s", (1,), "box_contents"),
+    ("packing: NGO inventory",
+     "SELECT inventory_id FROM ngo_inventory WHERE ngo_id = %s", (1,), "ngo_inventory"),
+    ("dashboard: supply totals for a state",
+     "SELECT COUNT(*), SUM(food) FROM flood_centres WHERE state = %s", ("Kelantan",), "flood_centres"),
+    ("packing: FEFO lots for an item",
+     """SELECT inventory_id, quantity FROM ngo_inventory
+        WHERE ngo_id = %s AND item_id = %s AND quantity > 0 AND expired_at IS NULL
+        ORDER BY expiry_date, inventory_id""",
+     (1, 1), "ngo_inventory"),
+    ("inventory: expiring soon",
+     """SELECT inventory_id FROM ngo_inventory
+        WHERE expiry_date >= %s AND expiry_date < %s AND quantity > 0 AND expired_at IS NULL""",
+     (datetime(2024, 1, 1), datetime(2024, 2, 1)), "ngo_inventory"),
+    ("dashboard: daily supply history",
+     "SELECT item_id, level FROM supply_history_daily WHERE period >= %s AND period < %s",
+     (datetime(2024, 1, 1), datetime(2024, 4, 1)), "supply_history_daily"),
+]
+
+
+def check_query_plans():
+    """EXPLAIN every hot query; return (name, plan row) for each full scan that no index could serve."""
+    problems = []
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        for name, query, params, table in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + query, params)
+            for row in cursor.fetchall():
+                # The optimizer may still scan a tiny table, so only a full scan
+                # without any candidate index counts as a regression
+                if row.get("table") == table and row.get("type") == "ALL" and not row.get("possible_keys"):
+                    problems.append((name, row))
+        cursor.close()
+    return problems
+
+
+def fulfil_box(cursor, qr_code, center_id, received_by, demand_ids=()):
+    """Record delivery of a scanned box at a center and count its contents
+    against the demands still open there.
+
+    Units of each item go to the demands at this center named on the label
+    (`demand_ids`) first, then to the oldest pending demands there; a box line
+    can serve several demands and a demand can be served by several boxes. A
+    demand is Fulfilled once its outstanding quantity reaches 0. A box that was
+    received before is not counted again.
+
+    Uses a fixed number of statements whatever the box size: one lookup of the
+    box, one of its contents, one of the open demands, one batched insert and
+    one batched update. The box and the demands read are locked until the
+    caller, who owns the transaction, commits or rolls back, so concurrent
+    scans cannot count the same box or units twice.
+    Returns (box_id, contents, deliveries) where deliveries are
+    (demand_id, center_id, item_id, units, outstanding_after); box_id is None
+    for an unknown QR code and deliveries None for a box received before.
+    """
+    cursor.execute(
+        """
+        SELECT sb.box_id,
+               EXISTS (SELECT 1 FROM supply_deliveries sd WHERE sd.box_id = sb.box_id)
+               OR EXISTS (SELECT 1 FROM box_ngo_info bi WHERE bi.box_id = sb.box_id AND bi.delivered_at IS NOT NULL)
+        FROM supply_boxes sb
+        WHERE sb.qr_code = %s FOR UPDATE
+        """,
+        (qr_code,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None, [], []
+    box_id, received = row
+    if received:
+        return box_id, [], None
+
+    cursor.execute(
+        """
+        SELECT bc.item_id, si.name, bc.quantity
+        FROM box_contents bc
+        LEFT JOIN supply_items si ON bc.item_id = si.item_id
+        WHERE bc.box_id = %s
+        """,
+        (box_id,)
+    )
+    contents = cursor.fetchall()
+    if not contents:
+        return box_id, contents, []
+
+    units = {}
+    for item_id, _, quantity in contents:
+        units[item_id] = units.get(item_id, 0) + (quantity or 0)
+    # The demands named on the label plus, per item, the oldest pending demands
+    # at this center, as one statement of index probes. Every served demand
+    # takes at least one unit, so an item never needs more demands than units.
+    # The rows are locked, so the outstanding quantities written back below
+    # cannot overwrite those of a concurrent scan.
+    columns = "demand_id, center_id, item_id, outstanding_quantity, request_date"
+    probe = f"""
+        SELECT * FROM (
+            SELECT {columns} FROM supply_demands
+            WHERE center_id = %s AND item_id = %s AND status = 'Pending'
+            ORDER BY request_date ASC, demand_id ASC LIMIT {{0}} FOR UPDATE
+        ) AS d{{1}}"""
+    probes = [probe.format(max(count, 1), n) for n, count in enumerate(units.values())]
+    params = []
+    for item_id in units:
+        params.extend((center_id, item_id))
+    if demand_ids:
+        probes.append(f"""
+        SELECT * FROM (
+            SELECT {columns} FROM supply_demands
+            WHERE demand_id IN ({','.join(['%s'] * len(demand_ids))}) AND center_id = %s AND status = 'Pending'
+            FOR UPDATE
+        ) AS labelled""")
+        params.extend(demand_ids)
+        params.append(center_id)
+    cursor.execute(" UNION ALL ".join(probes), params)
+    labelled = set(demand_ids)
+    open_demands = {row[0]: row for row in cursor.fetchall() if row[2] in units}
+    open_demands = sorted(open_demands.values(), key=lambda row: (row[0] not in labelled, row[4], row[0]))
+
+    deliveries = []
+    for demand_id, demand_center, item_id, outstanding, _ in open_demands:
+        left = units[item_id]
+        if not left or not outstanding:
+            continue
+        given = min(left, outstanding)
+        units[item_id] = left - given
+        deliveries.append((demand_id, demand_center, item_id, given, outstanding - given))
+    if not deliveries:
+        return box_id, contents, []
+
+    now = datetime.now()
+    cursor.executemany(
+        """INSERT INTO supply_deliveries
+           (box_id, demand_id, center_id, delivery_date, received_by, quantity)
+           VALUES (%s, %s, %s, %s, %s, %s)""",
+        [(box_id, demand_id, center_id, now, received_by, given) for demand_id, _, _, given, _ in deliveries]
+    )
+    # One UPDATE for every demand served (executemany would send one per row)
+    cases = " ".join(["WHEN %s THEN %s"] * len(deliveries))
+    cursor.execute(
+        "UPDATE supply_demands SET outstanding_quantity = CASE demand_id %s END, "
+        "status = CASE demand_id %s END WHERE demand_id IN (%s)"
+        % (cases, cases, ','.join(['%s'] * len(deliveries))),
+        [value for demand_id, _, _, _, after in deliveries for value in (demand_id, after)]
+        + [value for demand_id, _, _, _, after in deliveries
+           for value in (demand_id, 'Pending' if after else 'Fulfilled')]
+        + [demand_id for demand_id, _, _, _, _ in deliveries]
+    )
+    return box_id, contents, deliveries
+
+
+def parse_box_label(qr_data):
+    """(box_id, demand_ids) of a scanned box label; (None, ()) if it is not one.
+
+    Reads the compact signed payload (qr_payload.py) and, for boxes labelled
+    before it, the old "Box ID: ...\nDemand ID: ..." text. A payload label
+    raises PayloadKeyMissing when no signing key is configured: the label may
+    be good, so it must not be counted as unknown."""
+    if is_box_payload(qr_data):
+        try:
+            payload = decode_box_payload(qr_data)
+        except ValueError:
+            return None, ()
+        return payload.box_id, payload.demand_ids
+    fields = {}
+    for line in qr_data.splitlines():
+        name, sep, value = line.partition(":")
+        if sep:
+            fields[name.strip()] = value.strip()
+    ids = []
+    for name in ("Box ID", "Demand ID"):
+        try:
+            ids.append(int(fields[name]))
+        except (KeyError, ValueError):
+            ids.append(None)
+    box_id, demand_id = ids
+    return box_id, (demand_id,) if demand_id is not None else ()
+
+
+def receive_scans(cursor, scans, center_id, received_by):
+    """Log scanned (qr_type, qr_data) labels in qr_codes and count each labelled
+    box at `center_id` (skipped when None) against the open demands, those
+    named on its label first.
+
+    Demands only change by the units of a box received here; those named on a
+    label whose box is not (unknown box, or no center) stay Pending and the
+    label is reported as unknown. A box received before is not counted again.
+    The caller owns the transaction. Returns {"boxes", "fulfilled", "partial",
+    "unknown", "already_received"}: demands completed, demands served in part,
+    labels not received, ids of boxes scanned again.
+    """
+    labels = [(qr_data, parse_box_label(qr_data)) for _, qr_data in scans]
+    labelled = {}
+    for _, (box_id, ids) in labels:
+        if box_id is not None:
+            named = labelled.setdefault(box_id, [])
+            for demand_id in ids:
+                if demand_id not in named:
+                    named.append(demand_id)
+    deliveries, received, repeated = [], set(), []
+    if scans:
+        cursor.executemany("INSERT INTO qr_codes (qr_type, qr_data) VALUES (%s, %s)", list(scans))
+    if labelled and center_id is not None:
+        box_ids = sorted(labelled)
+        cursor.execute(
+            "SELECT box_id, qr_code FROM supply_boxes WHERE box_id IN (%s)" % ','.join(['%s'] * len(box_ids)),
+            box_ids
+        )
+        for box_id, qr_code in cursor.fetchall():
+            _, _, delivered = fulfil_box(cursor, qr_code, center_id, received_by, labelled[box_id])
+            received.add(box_id)
+            if delivered is None:
+                repeated.append(box_id)
+                continue
+            deliveries.extend(delivered)
+        record_demand_deliveries(cursor, deliveries)
+        record_deliveries(cursor, [(box_id, center_id) for box_id in sorted(received - set(repeated))])
+    fulfilled = [demand_id for demand_id, _, _, _, after in deliveries if not after]
+    partial = sorted({demand_id for demand_id, _, _, _, after in deliveries if after} - set(fulfilled))
+    unknown = [qr_data for qr_data, (box_id, _) in labels if box_id not in received]
+    return {"boxes": len(received) - len(repeated), "fulfilled": fulfilled, "partial": partial,
+            "unknown": unknown, "already_received": repeated}
+
+
+# Stock decrements use optimistic locking: lots are read with their version and
+# the UPDATE only applies to rows whose version is unchanged. Concurrent packers
+# never block each other on reads, and a lost race is retried from scratch.
+STOCK_RETRIES = int(os.getenv("BANTUANNOW_STOCK_RETRIES", "5"))
+STOCK_BACKOFF = float(os.getenv("BANTUANNOW_STOCK_BACKOFF", "0.01"))  # seconds, doubled per retry
+
+_stock_stats = {"commits": 0, "conflicts": 0, "insufficient": 0}
+_stock_lock = threading.Lock()
+
+
+class InsufficientStock(Exception):
+    """A lot holds less than was asked of it (or has expired)."""
+
+
+class StockConflict(Exception):
+    """Another session changed a lot between reading and decrementing it."""
+
+
+def _count_stock(event):
+    with _stock_lock:
+        _stock_stats[event] += 1
+
+
+def get_stock_stats():
+    """Return commit/conflict/shortage counters of the stock decrements."""
+    with _stock_lock:
+        stats = dict(_stock_stats)
+    attempts = stats["commits"] + stats["conflicts"]
+    stats["conflict_rate"] = stats["conflicts"] / attempts if attempts else 0.0
+    return stats
+
+
+def take_stock(cursor, taken, now):
+    """Decrement lots by {inventory_id: quantity} if every lot still holds enough
+    and none changed since it was read. The caller owns the transaction.
+
+    Raises InsufficientStock (nothing to retry) or StockConflict (retry the
+    transaction), and ValueError for a quantity that is not positive. Returns
+    {inventory_id: (item_id, ngo_id, quantity, version)} as read before the
+    decrement.
+    """
+    if not taken:
+        return {}
+    bad = [f"lot {inv_id}: {qty}" for inv_id, qty in sorted(taken.items()) if qty <= 0]
+    if bad:
+        # A negative take would add stock through the decrement below
+        raise ValueError("Quantities taken must be positive (" + "; ".join(bad) + ")")
+    ids = sorted(taken)
+    cursor.execute(
+        "SELECT inventory_id, item_id, ngo_id, quantity, version, expired_at FROM ngo_inventory "
+        "WHERE inventory_id IN (%s)" % ','.join(['%s'] * len(ids)),
+        ids
+    )
+    lots = {row[0]: row[1:5] for row in cursor.fetchall() if row[5] is None}
+    short = [f"lot {inv_id}: {lots[inv_id][2] if inv_id in lots else 0} left, {taken[inv_id]} requested"
+             for inv_id in ids if inv_id not in lots or lots[inv_id][2] < taken[inv_id]]
+    if short:
+        _count_stock("insufficient")
+        raise InsufficientStock("Not enough stock (" + "; ".join(short) + ")")
+
+    cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+    cursor.execute(
+        "UPDATE ngo_inventory SET quantity = quantity - CASE inventory_id %s END, version = version + 1, "
+        "last_updated = %%s WHERE inventory_id IN (%s) AND version = CASE inventory_id %s END"
+        % (cases, ','.join(['%s'] * len(ids)), cases),
+        [value for inv_id in ids for value in (inv_id, taken[inv_id])] + [now] + ids
+        + [value for inv_id in ids for value in (inv_id, lots[inv_id][3])]
+    )
+    if cursor.rowcount != len(ids):
+        raise StockConflict(f"{len(ids) - cursor.rowcount} lot(s) changed while being taken")
+    return lots
+
+
+def retry_on_conflict(work, retries=STOCK_RETRIES, backoff=STOCK_BACKOFF):
+    """Run work() (one transaction) up to `retries` times while it raises
+    StockConflict, with jittered exponential backoff; the last conflict is re-raised."""
+    if retries < 1:
+        raise ValueError(f"retries must be at least 1, got {retries}")
+    for attempt in range(retries):
+        try:
+            result = work()
+        except StockConflict:
+            _count_stock("conflicts")
+            if attempt + 1 == retries:
+                raise
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+        else:
+            _count_stock("commits")
+            return result
+
+
+# Incremental summary maintenance (see SUMMARY_SOURCES); the caller owns the
+# transaction, so the counters move together with the rows they describe
+def _add(deltas, key, column, amount):
+    changes = deltas.setdefault(key, {})
+    changes[column] = changes.get(column, 0) + amount
+
+
+def bump_summary(cursor, table, key, deltas):
+    """Add {key_value: {column: delta}} to the counters of a summary table,
+    creating missing rows, with one executemany."""
+    columns = sorted({column for changes in deltas.values() for column in changes})
+    rows = [(key_value,) + tuple(changes.get(column, 0) for column in columns)
+            for key_value, changes in deltas.items() if any(changes.values())]
+    if not rows:
+        return
+    placeholders = ', '.join(['%s'] * (len(columns) + 1))
+    updates = ', '.join(f"{column} = {column} + VALUES({column})" for column in columns)
+    cursor.executemany(
+        f"INSERT INTO {table} ({key}, {', '.join(columns)}) VALUES ({placeholders}) "
+        f"ON DUPLICATE KEY UPDATE {updates}",
+        rows
+    )
+
+
+def track_demand_changes(cursor, changes):
+    """Apply demand status changes, given as (center_id, item_id, outstanding,
+    old_status, new_status) with old_status None for a new demand; outstanding
+    is the quantity still needed as the demand leaves or enters Pending."""
+    centers, items = {}, {}
+    for center_id, item_id, quantity, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        for status, sign in ((old_status, -1), (new_status, 1)):
+            if status == 'Pending':
+                _add(centers, center_id, 'pending_demands', sign)
+                _add(centers, center_id, 'pending_quantity', sign * quantity)
+                _add(items, item_id, 'pending_demands', sign)
+                _add(items, item_id, 'pending_quantity', sign * quantity)
+            elif status == 'Fulfilled':
+                _add(centers, center_id, 'fulfilled_demands', sign)
+    bump_summary(cursor, "center_summary", "center_id", centers)
+    bump_summary(cursor, "item_summary", "item_id", items)
+
+
+def record_demand_deliveries(cursor, deliveries):
+    """Count units that fulfil_box delivered toward demands; a demand left with
+    nothing outstanding moves from Pending to Fulfilled."""
+    centers, items = {}, {}
+    for _, center_id, item_id, units, outstanding in deliveries:
+        _add(centers, center_id, 'pending_quantity', -units)
+        _add(items, item_id, 'pending_quantity', -units)
+        if not outstanding:
+            _add(centers, center_id, 'pending_demands', -1)
+            _add(centers, center_id, 'fulfilled_demands', 1)
+            _add(items, item_id, 'pending_demands', -1)
+    bump_summary(cursor, "center_summary", "center_id", centers)
+    bump_summary(cursor, "item_summary", "item_id", items)
+
+
+def record_deliveries(cursor, deliveries):
+    """Mark (box_id, center_id) boxes as delivered and count them for their NGO and
+    the center; boxes delivered before are left alone."""
+    first = {}
+    for box_id, center_id in deliveries:
+        first.setdefault(box_id, center_id)
+    if not first:
+        return
+    cursor.execute(
+        "SELECT box_id, ngo_id FROM box_ngo_info WHERE delivered_at IS NULL AND box_id IN (%s) FOR UPDATE"
+        % ','.join(['%s'] * len(first)),
+        list(first)
+    )
+    ngo_of = dict(cursor.fetchall())
+    if not ngo_of:
+        return
+    now = datetime.now()
+    cursor.execute(
+        "UPDATE box_ngo_info SET delivered_at = %%s, delivered_center_id = CASE box_id %s END WHERE box_id IN (%s)"
+        % (" ".join(["WHEN %s THEN %s"] * len(ngo_of)), ','.join(['%s'] * len(ngo_of))),
+        [now] + [value for box_id in ngo_of for value in (box_id, first[box_id])] + list(ngo_of)
+    )
+    ngos, centers, pairs = {}, {}, set()
+    for box_id, ngo_id in ngo_of.items():
+        _add(centers, first[box_id], 'boxes_received', 1)
+        if ngo_id is not None:
+            _add(ngos, ngo_id, 'boxes_delivered', 1)
+            pairs.add((ngo_id, first[box_id]))
+    for ngo_id, center_id in sorted(pairs):
+        cursor.execute("INSERT IGNORE INTO ngo_centers_served (ngo_id, center_id) VALUES (%s, %s)",
+                       (ngo_id, center_id))
+        if cursor.rowcount == 1:
+            _add(ngos, ngo_id, 'centers_served', 1)
+    bump_summary(cursor, "ngo_summary", "ngo_id", ngos)
+    bump_summary(cursor, "center_summary", "center_id", centers)
+    cursor.execute(
+        "SELECT item_id, quantity FROM box_contents WHERE box_id IN (%s)" % ','.join(['%s'] * len(ngo_of)),
+        list(ngo_of)
+    )
+    record_supply_history(cursor, [(item_id, 'delivered', quantity) for item_id, quantity in cursor.fetchall()])
+
+
+def record_supply_history(cursor, events):
+    """Append (item_id, event, quantity) movements to supply_history and fold them
+    into the hourly and daily rollups. Run after item_summary has been updated in
+    the same transaction: the level recorded is the stock it holds now."""
+    totals = {}
+    for item_id, event, quantity in events:
+        if quantity:
+            _add(totals, item_id, event, quantity)
+    if not totals:
+        return
+    cursor.execute(
+        "SELECT item_id, inventory_quantity FROM item_summary WHERE item_id IN (%s)"
+        % ','.join(['%s'] * len(totals)),
+        list(totals)
+    )
+    level = dict(cursor.fetchall())
+    now = datetime.now()
+    cursor.executemany(
+        "INSERT INTO supply_history (recorded_at, item_id, event, quantity, level) VALUES (%s, %s, %s, %s, %s)",
+        [(now, item_id, event, quantity, level.get(item_id, 0))
+         for item_id, changes in totals.items() for event, quantity in changes.items()]
+    )
+    updates = ', '.join(f"{event} = {event} + VALUES({event})" for event in HISTORY_EVENTS)
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    for table, period in (("supply_history_hourly", hour), ("supply_history_daily", hour.replace(hour=0))):
+        cursor.executemany(
+            f"INSERT INTO {table} (period, item_id, {', '.join(HISTORY_EVENTS)}, level) "
+            f"VALUES (%s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE {updates}, level = VALUES(level)",
+            [(period, item_id) + tuple(changes.get(event, 0) for event in HISTORY_EVENTS) + (level.get(item_id, 0),)
+             for item_id, changes in totals.items()]
+        )
+
+
+def history_resolution(span):
+    """(table, time column) of the coarsest history table suited to a time range."""
+    for longest, table, column in HISTORY_RESOLUTIONS:
+        if longest is None or span <= longest:
+            return table, column
+
+
+def history_end(table, now=None):
+    """End of the period of `table` that `now` falls in, so open-ended history
+    reads within one period share a cache key and still include `now`."""
+    now = now or datetime.now()
+    step = HISTORY_STEPS[table]
+    return datetime.min + ((now - datetime.min) // step + 1) * step
+
+
+# Supply columns of flood_centres; they are interpolated into aggregate queries,
+# so only these names are accepted
+SUPPLY_TYPES = ('clothes', 'food', 'medicine_kit', 'mineral_water')
+
+# SQL expression for the start of the day/week/month a DATETIME column falls in
+TREND_BUCKETS = {
+    'day': "DATE({0})",
+    'week': "DATE_SUB(DATE({0}), INTERVAL WEEKDAY({0}) DAY)",
+    'month': "DATE_SUB(DATE({0}), INTERVAL DAYOFMONTH({0}) - 1 DAY)",
+}
+
+
+def _supply_columns(supply_types):
+    unknown = [name for name in supply_types if name not in SUPPLY_TYPES]
+    if unknown:
+        raise Exception(f"Unknown supply types: {unknown}")
+    return list(supply_types)
+
+
+class PendingDemandView:
+    """Client-side copy of the pending demand list kept current by applying
+    Database.get_demands_since deltas, so steady-state polling only moves the
+    rows that changed.
+
+    updated_at is set when a statement runs, not when its transaction commits,
+    so a long transaction can commit rows older than ones already seen. Each
+    refresh therefore starts `overlap` seconds before the cursor; rows seen
+    again merge without effect.
+    """
+
+    columns = ['demand_id', 'center_name', 'item_name', 'quantity', 'outstanding_quantity', 'priority', 'request_date']
+
+    def __init__(self, batch_size=1000, overlap=DEMAND_POLL_OVERLAP):
+        self.batch_size = batch_size
+        self.overlap = overlap
+        self.cursor = None
+        self._rows = {}
+        self._frame = None
+
+    def refresh(self, db):
+        """Pull and apply every change since the last refresh; returns the number of rows changed."""
+        changed = 0
+        cursor = self.cursor
+        if cursor is not None:
+            cursor = (cursor[0] - timedelta(seconds=self.overlap), 0)
+        while True:
+            snapshot = cursor is None
+            rows, cursor = db.get_demands_since(cursor, self.batch_size, as_frame=False)
+            changed += self.apply(rows.dicts())
+            # The overlap must not move the cursor back for the next refresh
+            self.cursor = cursor if self.cursor is None else max(self.cursor, cursor)
+            if not snapshot and len(rows) < self.batch_size:
+                return changed
+
+    def apply(self, records):
+        """Merge demand rows into the view; returns how many actually changed it."""
+        changed = 0
+        for record in records:
+            if record['status'] == 'Pending':
+                row = {column: record[column] for column in self.columns}
+                if self._rows.get(record['demand_id']) != row:
+                    self._rows[record['demand_id']] = row
+                    changed += 1
+            elif self._rows.pop(record['demand_id'], None) is not None:
+                changed += 1
+        if changed:
+            self._frame = None
+        return changed
+
+    def to_frame(self):
+        """Pending demands ordered like get_pending_demands (priority, then oldest first)."""
+        if self._frame is None:
+            ordered = sorted(self._rows.values(),
+                             key=lambda row: (PRIORITY_RANK.get(row['priority'], 5), row['request_date']))
+            self._frame = RowSet(self.columns, [tuple(row[c] for c in self.columns) for row in ordered]).to_frame()
+        return self._frame
+
+
+class Database:
+    def __init__(self):
+        # Connections are borrowed from the shared pool per call, so creating a
+        # Database is cheap; make sure the pool itself can be reached
+        try:
+            get_pool()
         except Exception as e:
             raise Exception(f"Database connection error: {e}")
+        self._conn = None
+        self._conn_checkout = None
+        self._cursor = None
+
+    @property
+    def conn(self):
+        # Dedicated pooled connection for callers that run raw SQL, released in
+        # close(); checked out like any other, with the wait timeout and health check
+        if self._conn is None:
+            self._conn_checkout = get_connection()
+            self._conn = self._conn_checkout.__enter__()
+        return self._conn
+
+    @property
+    def cursor(self):
+        if self._cursor is None:
+            self._cursor = self.conn.cursor()
+        return self._cursor
+
+    def _fetch(self, query, params=None, tables=(), ttl=None, as_frame=True):
+        # Reads return a DataFrame by default, or the lighter RowSet with as_frame=False
+        if tables:
+            rows = cached_read_rows(query, params, tables, ttl)
+        else:
+            rows = read_rows(query, params)
+        return rows.to_frame() if as_frame else rows
+
+    def _execute(self, query, params=None, invalidates=()):
+        return execute_write(query, params, invalidates)
 
     def initialize_database(self):
-        # Execute SQL scripts to create tables if they don't exist
-        with open('schema.sql', 'r') as f:
-            self.cursor.execute(f.read(), multi=True)
-            self.conn.commit()
-    def insert_ngoinventory(self, ngo_id,item_id,quantity, expiry_date, batch_id, source, notes):
+        # Create tables and indexes by applying any pending schema migrations
+        return run_migrations()
+    def insert_ngoinventory(self, ngo_id,item_id,quantity, expiry_date, batch_id, source, notes, name=None):
         query = """
-        INSERT INTO ngo_inventory (ngo_id, item_id, quantity, expiry_date, batch_id, last_updated, source, notes)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO ngo_inventory (ngo_id, item_id, name, quantity, expiry_date, batch_id, last_updated, source, notes)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
-        values = (ngo_id, item_id, quantity, expiry_date, batch_id, datetime.now(), source, notes)
-        self.cursor.execute(query, values)
-        self.conn.commit()
-        return self.cursor.lastrowid
+        values = (ngo_id, item_id, name, quantity, expiry_date, batch_id, datetime.now(), source, notes)
+        with transaction(invalidates=("ngo_inventory", "ngo_summary", "item_summary") + HISTORY_TABLES) as cursor:
+            cursor.execute(query, values)
+            inventory_id = cursor.lastrowid
+            bump_summary(cursor, "ngo_summary", "ngo_id", {ngo_id: {"total_items": quantity}})
+            bump_summary(cursor, "item_summary", "item_id", {item_id: {"inventory_quantity": quantity}})
+            record_supply_history(cursor, [(item_id, 'stocked', quantity)])
+        return inventory_id
     # Flood Center Functions
-    def get_all_centers(self):
+    def get_all_centers(self, as_frame=True):
         query = "SELECT * FROM flood_centers2"
-        self.cursor.execute(query)
-        df = pd.DataFrame(self.cursor.fetchall(), columns=[desc[0] for desc in self.cursor.description])
-        return df
+        return self._fetch(query, tables=("flood_centers2",), as_frame=as_frame)
+
+    def get_supply_items(self, as_frame=True):
+        query = "SELECT * FROM supply_items"
+        return self._fetch(query, tables=("supply_items",), as_frame=as_frame)
 
-    def get_center_demands(self, center_id):
+    def get_center_demands(self, center_id, as_frame=True):
         query = """
-        SELECT sd.demand_id, si.name, sd.quantity, sd.priority, sd.status, sd.request_date
+        SELECT sd.demand_id, si.name, sd.quantity, sd.outstanding_quantity, sd.priority, sd.status, sd.request_date
         FROM supply_demands sd
         JOIN supply_items si ON sd.item_id = si.item_id
         WHERE sd.center_id = %s
         ORDER BY sd.request_date DESC
         """
-        self.cursor.execute(query, (center_id,))
-        df = pd.DataFrame(self.cursor.fetchall(), columns=[desc[0] for desc in self.cursor.description])
-        return df
+        return self._fetch(query, (center_id,), tables=("supply_demands", "supply_items"), ttl=DEMAND_CACHE_TTL,
+                           as_frame=as_frame)
 
     # Supply Demand Functions
-    def create_demand(self, center_id, item_id, quantity, priority):
+    def create_demand(self, center_id, item_id, quantity, priority, ngo=None, notify=True):
         query = """
-        INSERT INTO supply_demands (center_id, item_id, quantity, priority, request_date, status)
-        VALUES (%s, %s, %s, %s, %s, 'Pending')
+        INSERT INTO supply_demands (center_id, item_id, quantity, outstanding_quantity, priority, request_date, status)
+        VALUES (%s, %s, %s, %s, %s, %s, 'Pending')
         """
-        self.cursor.execute(query, (center_id, item_id, quantity, priority, datetime.now()))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        with transaction(invalidates=("supply_demands", "center_summary", "item_summary")) as cursor:
+            cursor.execute(query, (center_id, item_id, quantity, quantity, priority, datetime.now()))
+            demand_id = cursor.lastrowid
+            track_demand_changes(cursor, [(center_id, item_id, quantity, None, 'Pending')])
+        if notify:
+            self.notify_new_demand(demand_id, center_id, item_id, quantity, priority, ngo)
+        return demand_id
 
-    def update_demand_status(self, demand_id, status):
-        self.cursor.execute(
-            "UPDATE supply_demands SET status = %s WHERE demand_id = %s", 
-            (status, demand_id)
+    def notify_new_demand(self, demand_id, center_id, item_id, quantity, priority, ngo=None):
+        """Queue the new-demand alert for the subscribers whose filters match; returns how many."""
+        emails = self.get_subscription_index().match(center_id, priority)
+        if not emails:
+            return 0
+        queue_demand_alert(
+            sorted(emails), demand_id,
+            self.get_center_names().get(center_id, "Unknown Center"),
+            self.get_item_names().get(item_id, "Unknown Item"),
+            item_id, quantity, priority, ngo
         )
-        self.conn.commit()
+        return len(emails)
+
+    def update_demand_status(self, demand_id, status):
+        with transaction(invalidates=("supply_demands", "center_summary", "item_summary")) as cursor:
+            cursor.execute(
+                "SELECT center_id, item_id, quantity, outstanding_quantity, status FROM supply_demands "
+                "WHERE demand_id = %s FOR UPDATE",
+                (demand_id,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return
+            center_id, item_id, quantity, outstanding, old_status = row
+            # Fulfilled by hand leaves nothing outstanding; reopening restores the full quantity
+            if status == 'Fulfilled':
+                new_outstanding = 0
+            elif status == 'Pending' and old_status != 'Pending':
+                new_outstanding = quantity
+            else:
+                new_outstanding = outstanding
+            cursor.execute(
+                "UPDATE supply_demands SET status = %s, outstanding_quantity = %s WHERE demand_id = %s",
+                (status, new_outstanding, demand_id)
+            )
+            moving = outstanding if old_status == 'Pending' else new_outstanding
+            track_demand_changes(cursor, [(center_id, item_id, moving, old_status, status)])
+
+    # Alert Subscription Functions
+    def save_subscription(self, email, center_ids, priorities):
+        """Store (or replace) a subscriber's filters; no centers means every center."""
+        rows = [(email, center_id, priority, datetime.now())
+                for center_id in (list(center_ids) or [None]) for priority in priorities]
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("DELETE FROM alert_subscriptions WHERE email = %s", (email,))
+                if rows:
+                    cursor.executemany(
+                        "INSERT INTO alert_subscriptions (email, center_id, priority, created_at) "
+                        "VALUES (%s, %s, %s, %s)",
+                        rows
+                    )
+                cursor.execute(
+                    "INSERT INTO email_list_for_alerts (email, created_at) VALUES (%s, %s)",
+                    (email, datetime.now())
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        invalidate_tables("alert_subscriptions", "email_list_for_alerts")
+
+    def get_subscription_index(self):
+        """Subscribers indexed by (center_id, priority), cached until subscriptions change."""
+        def load():
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT email, center_id, priority FROM alert_subscriptions")
+                index = SubscriptionIndex(cursor.fetchall())
+                cursor.close()
+            return index
+        return _cache.get_or_load(("subscription_index",), ("alert_subscriptions",), load)
+
+    # Lookup Indexes
+    def get_center_names(self):
+        return cached_lookup("SELECT center_id, name FROM flood_centers2", "center_id", "name",
+                             tables=("flood_centers2",))
+
+    def get_item_names(self):
+        return cached_lookup("SELECT item_id, name FROM supply_items", "item_id", "name",
+                             tables=("supply_items",))
+
+    def get_ngo_names(self):
+        return cached_lookup("SELECT ngo_id, name FROM ngos2 WHERE verification_status = 'Verified'",
+                             "ngo_id", "name", tables=("ngos2",))
+
+    def get_inventory_index(self, ngo_id):
+        """{inventory_id: row} of an NGO's inventory rows that have a name and source."""
+        query = """
+        SELECT inventory_id, name, source FROM ngo_inventory
+        WHERE ngo_id = %s AND name IS NOT NULL AND source IS NOT NULL
+        """
+        return cached_lookup(query, "inventory_id", params=(ngo_id,), tables=("ngo_inventory",))
 
     # NGO and Donation Functions
-    def get_all_ngos(self):
+    def get_all_ngos(self, as_frame=True):
         query = "SELECT * FROM ngos2 WHERE verification_status = 'Verified'"
-        self.cursor.execute(query)
-        df = pd.DataFrame(self.cursor.fetchall(), columns=[desc[0] for desc in self.cursor.description])
-        return df
+        return self._fetch(query, tables=("ngos2",), as_frame=as_frame)
 
     def create_donation(self, ngo_id, donor_name, donor_email, amount, payment_method):
             query = """
             INSERT INTO donations (ngo_id, donor_name, donor_email, amount, donation_date, payment_method)
             VALUES (%s, %s, %s, %s, %s, %s)
             """
-            values = (ngo_id, donor_name, donor_email, amount, datetime.now(), payment_method)
-            self.cursor.execute(query, values)
-            self.conn.commit()
-            return self.cursor.lastrowid
+            now = datetime.now()
+            values = (ngo_id, donor_name, donor_email, amount, now, payment_method)
+            with transaction(invalidates=DONATION_TABLES) as cursor:
+                cursor.execute(query, values)
+                donation_id = cursor.lastrowid
+                cursor.execute(
+                    """INSERT INTO donation_tracking (donation_id, donor_email, ngo_id, ngo_name, amount,
+                                                      donation_date, allocations)
+                       SELECT %s, %s, ngo_id, name, %s, %s, JSON_ARRAY() FROM ngos2 WHERE ngo_id = %s""",
+                    (donation_id, donor_email, amount, now, ngo_id)
+                )
+                if donor_email is not None:
+                    cursor.execute(
+                        """INSERT INTO donor_summary (donor_email, ngo_id, donations, total_amount)
+                           VALUES (%s, %s, 1, %s)
+                           ON DUPLICATE KEY UPDATE donations = donations + 1,
+                                                   total_amount = total_amount + VALUES(total_amount)""",
+                        (donor_email, ngo_id, amount)
+                    )
+            return donation_id
 
-    def track_donation(self, donor_email):
+    def allocate_donation(self, donation_id, purpose, amount):
+        """Record that `amount` of a donation went to `purpose`; returns the allocation id."""
+        # Whole seconds, as stored in the DATETIME column, so the JSON line
+        # matches what rebuild_donation_tracking reads back
+        now = datetime.now().replace(microsecond=0)
+        with transaction(invalidates=DONATION_TABLES) as cursor:
+            cursor.execute(
+                "INSERT INTO donation_allocations (donation_id, purpose, amount, allocation_date) "
+                "VALUES (%s, %s, %s, %s)",
+                (donation_id, purpose, amount, now)
+            )
+            allocation_id = cursor.lastrowid
+            cursor.execute(
+                """UPDATE donation_tracking
+                   SET allocated_amount = allocated_amount + %s,
+                       allocations = JSON_ARRAY_APPEND(allocations, '$', JSON_OBJECT(
+                           'allocation_id', %s, 'purpose', %s, 'amount', CAST(%s AS DECIMAL(12, 2)),
+                           'allocation_date', %s))
+                   WHERE donation_id = %s""",
+                (amount, allocation_id, purpose, amount, now, donation_id)
+            )
+            cursor.execute(
+                """UPDATE donor_summary s
+                   JOIN donation_tracking t ON s.donor_email = t.donor_email AND s.ngo_id = t.ngo_id
+                   SET s.allocated_amount = s.allocated_amount + %s
+                   WHERE t.donation_id = %s""",
+                (amount, donation_id)
+            )
+        return allocation_id
+
+    def track_donation(self, donor_email, as_frame=True):
         query = """
         SELECT d.donation_id, n.name as ngo_name, d.amount, d.donation_date, 
                da.purpose, da.amount as allocated_amount, da.allocation_date
@@ -100,95 +1647,432 @@ class Database:
         WHERE d.donor_email = %s
         ORDER BY d.donation_date DESC
         """
-        self.cursor.execute(query, (donor_email,))
-        df = pd.DataFrame(self.cursor.fetchall(), columns=[desc[0] for desc in self.cursor.description])
-        return df
+        return self._fetch(query, (donor_email,), as_frame=as_frame)
+
+    def get_donor_tracking(self, donor_email, before=None, page_size=DONATION_PAGE_SIZE):
+        """One page of a donor's donations, newest first, from the tracking read model.
+
+        Returns {"totals", "by_ngo", "donations", "next"}: totals and by_ngo
+        cover every donation of the donor; donations holds up to `page_size`
+        dicts with their allocation lines; pass `next` back as `before` for the
+        following page (None on the last one). Donations without a date come
+        last, as MySQL sorts NULL below every date.
+        """
+        by_ngo = self._fetch(
+            """SELECT n.name AS ngo_name, s.donations, s.total_amount AS amount, s.allocated_amount
+               FROM donor_summary s JOIN ngos2 n ON s.ngo_id = n.ngo_id
+               WHERE s.donor_email = %s ORDER BY s.total_amount DESC""",
+            (donor_email,), tables=("donor_summary", "ngos2"), as_frame=False
+        )
+        query = """
+        SELECT donation_id, ngo_name, amount, donation_date, allocated_amount, allocations
+        FROM donation_tracking
+        WHERE donor_email = %s
+        """
+        params = (donor_email,)
+        if before is not None and before[0] is None:
+            # Already among the undated donations
+            query += " AND donation_date IS NULL AND donation_id < %s"
+            params += (before[1],)
+        elif before is not None:
+            # A row comparison with NULL is never true, so the undated ones are added back
+            query += " AND ((donation_date, donation_id) < (%s, %s) OR donation_date IS NULL)"
+            params += tuple(before)
+        # One extra row tells whether another page follows
+        query += " ORDER BY donation_date DESC, donation_id DESC LIMIT %s"
+        rows = self._fetch(query, params + (page_size + 1,), tables=("donation_tracking",), as_frame=False)
+
+        donations = []
+        for row in rows.dicts()[:page_size]:
+            allocations = json.loads(row["allocations"])
+            for line in allocations:
+                # allocation_date is nullable; undated lines sort last
+                if line["allocation_date"] is not None:
+                    line["allocation_date"] = datetime.fromisoformat(line["allocation_date"])
+            # JSON_ARRAYAGG keeps no order, so both write paths are read back
+            # in (allocation_date, allocation_id) order
+            allocations.sort(key=lambda line: (line["allocation_date"] is None,
+                                               line["allocation_date"] or datetime.max, line["allocation_id"]))
+            row["allocations"] = allocations
+            row["allocated_percent"] = (float(row["allocated_amount"] / row["amount"] * 100)
+                                        if row["amount"] else 0.0)
+            donations.append(row)
+        amount = sum(row.amount for row in by_ngo)
+        allocated = sum(row.allocated_amount for row in by_ngo)
+        totals = {
+            "donations": sum(row.donations for row in by_ngo),
+            "amount": amount,
+            "allocated_amount": allocated,
+            "allocated_percent": float(allocated / amount * 100) if amount else 0.0,
+        }
+        following = None
+        if len(rows) > page_size:
+            last = donations[-1]
+            following = (last["donation_date"], last["donation_id"])
+        return {"totals": totals, "by_ngo": by_ngo, "donations": donations, "next": following}
 
    # QR Code Functions
     def generate_qr_code(self):
+        return self.generate_qr_codes(1)[0]
+
+    def generate_qr_codes(self, count):
+        """Register `count` empty boxes in one transaction (for pre-printed labels).
+
+        Returns [(qr_code, box_id), ...]."""
         import uuid
-        qr_code = str(uuid.uuid4())
-        self.cursor.execute(
-            "INSERT INTO supply_boxes (qr_code, created_date) VALUES (?, ?)",
-            (qr_code, datetime.now())
-        )
-        self.conn.commit()
-        return qr_code, self.cursor.lastrowid
-    def get_next_box_id(self):
-        query = "SELECT MAX(box_id) FROM supply_boxes"
-        self.cursor.execute(query)
-        result = self.cursor.fetchone()
-        return result[0] + 1 if result[0] else 1
-    def get_next_content_id(self):
-        query = "SELECT MAX(content_id) FROM box_contents"
-        self.cursor.execute(query)
-        result = self.cursor.fetchone()
-        return result[0] + 1 if result[0] else 1
-    
-    def add_item_to_box(self, content_id, box_id, item_id, quantity):
-        query = """INSERT INTO box_contents (content_id, box_id, item_id, quantity)
-                VALUES (%s, %s, %s, %s)"""
-        self.cursor.execute(query, (content_id, box_id, item_id, quantity))
-        self.conn.commit()
+        if count <= 0:
+            return []
+        qr_codes = [str(uuid.uuid4()) for _ in range(count)]
+        now = datetime.now()
+        box_ids = {}
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(
+                    "INSERT INTO supply_boxes (qr_code, created_date) VALUES (%s, %s)",
+                    [(qr_code, now) for qr_code in qr_codes]
+                )
+                # Auto-increment ids need not be consecutive, so read them back
+                for start in range(0, count, 1000):
+                    chunk = qr_codes[start:start + 1000]
+                    cursor.execute(
+                        "SELECT qr_code, box_id FROM supply_boxes WHERE qr_code IN (%s)"
+                        % ','.join(['%s'] * len(chunk)),
+                        chunk
+                    )
+                    box_ids.update(cursor.fetchall())
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return [(qr_code, box_ids[qr_code]) for qr_code in qr_codes]
+
+    def add_item_to_box(self, box_id, item_id, quantity):
+        query = """INSERT INTO box_contents (box_id, item_id, quantity)
+                VALUES (%s, %s, %s)"""
+        self._execute(query, (box_id, item_id, quantity))
+
+    def create_box(self, items, destination, priority):
+        """Pack one box from (inventory_id, quantity) pairs; returns (box_id, qr_code)."""
+        return self.create_boxes([(items, destination, priority)])[0]
+
+    def create_boxes(self, boxes):
+        """Pack several boxes, each given as (items, destination, priority) or
+        (items, destination, priority, {demand_id: units}), in one transaction.
+
+        Box and content ids come from auto-increment keys, all contents are
+        inserted with one executemany and the NGO inventory is decremented with
+        a single versioned UPDATE (see take_stock): asking for more than a lot
+        holds raises InsufficientStock, and a lot changed by another session
+        meanwhile makes the whole transaction retry. The demand units a box is
+        packed for go to box_demands. Returns [(box_id, qr_code), ...] in input order.
+        """
+        import uuid
+        if not boxes:
+            return []
+        boxes = [(str(uuid.uuid4()), [(inv_id, qty) for inv_id, qty in box[0] if qty > 0], box[1], box[2],
+                  box[3] if len(box) > 3 else {})
+                 for box in boxes]
+        taken = {}
+        for _, items, _, _, _ in boxes:
+            for inv_id, qty in items:
+                taken[inv_id] = taken.get(inv_id, 0) + qty
+
+        def pack():
+            now = datetime.now()
+            with transaction(invalidates=("ngo_inventory", "ngo_summary", "item_summary") + HISTORY_TABLES) as cursor:
+                # Stock first, so a shortage fails before anything is written;
+                # the lots also give the item ids and owners used below
+                lots = take_stock(cursor, taken, now)
+
+                cursor.executemany(
+                    "INSERT INTO supply_boxes (qr_code, created_date) VALUES (%s, %s)",
+                    [(qr_code, now) for qr_code, _, _, _, _ in boxes]
+                )
+                cursor.execute(
+                    "SELECT qr_code, box_id FROM supply_boxes WHERE qr_code IN (%s)"
+                    % ','.join(['%s'] * len(boxes)),
+                    [qr_code for qr_code, _, _, _, _ in boxes]
+                )
+                box_ids = dict(cursor.fetchall())
+
+                contents = [(box_ids[qr_code], lots[inv_id][0], qty)
+                            for qr_code, items, _, _, _ in boxes for inv_id, qty in items]
+                if contents:
+                    cursor.executemany(
+                        "INSERT INTO box_contents (box_id, item_id, quantity) VALUES (%s, %s, %s)",
+                        contents
+                    )
+                # A box belongs to the NGO owning its first lot
+                cursor.executemany(
+                    "INSERT INTO box_ngo_info (box_id, destination_center_id, priority, ngo_id) VALUES (%s, %s, %s, %s)",
+                    [(box_ids[qr_code], destination, priority, lots[items[0][0]][1] if items else None)
+                     for qr_code, items, destination, priority, _ in boxes]
+                )
+                packed_for = [(box_ids[qr_code], demand_id, units)
+                              for qr_code, _, _, _, demands in boxes for demand_id, units in demands.items()]
+                if packed_for:
+                    cursor.executemany(
+                        "INSERT INTO box_demands (box_id, demand_id, quantity) VALUES (%s, %s, %s)",
+                        packed_for
+                    )
+                ngos, items_taken = {}, {}
+                for qr_code, items, _, _, _ in boxes:
+                    if items:
+                        _add(ngos, lots[items[0][0]][1], 'boxes_sent', 1)
+                for inv_id, qty in taken.items():
+                    item_id, ngo_id = lots[inv_id][:2]
+                    _add(ngos, ngo_id, 'total_items', -qty)
+                    _add(items_taken, item_id, 'inventory_quantity', -qty)
+                bump_summary(cursor, "ngo_summary", "ngo_id", ngos)
+                bump_summary(cursor, "item_summary", "item_id", items_taken)
+                record_supply_history(cursor, [(item_id, 'packed', -changes['inventory_quantity'])
+                                               for item_id, changes in items_taken.items()])
+            return [(box_ids[qr_code], qr_code) for qr_code, _, _, _, _ in boxes]
+
+        return retry_on_conflict(pack)
+
+    def take_stock(self, takes):
+        """Decrement NGO inventory lots by {inventory_id: quantity} in one
+        transaction, all or nothing; raises InsufficientStock if a lot holds
+        less, retries if another session changes a lot meanwhile."""
+        def work():
+            with transaction(invalidates=("ngo_inventory", "ngo_summary", "item_summary") + HISTORY_TABLES) as cursor:
+                lots = take_stock(cursor, takes, datetime.now())
+                ngos, items = {}, {}
+                for inv_id, qty in takes.items():
+                    _add(ngos, lots[inv_id][1], 'total_items', -qty)
+                    _add(items, lots[inv_id][0], 'inventory_quantity', -qty)
+                bump_summary(cursor, "ngo_summary", "ngo_id", ngos)
+                bump_summary(cursor, "item_summary", "item_id", items)
+                record_supply_history(cursor, [(item_id, 'packed', -changes['inventory_quantity'])
+                                               for item_id, changes in items.items()])
+        if takes:
+            retry_on_conflict(work)
+
+    # Allocation Functions
+    def plan_allocation(self, ngo_id=None, usable_from=None, allow_partial=True):
+        """Match every pending demand against the NGO inventory (one NGO's when
+        `ngo_id` is given) with allocation.allocate; returns an AllocationPlan.
+
+        NGOs that have delivered to a center before are tried first for its
+        demands, and units already packed for a demand in boxes that have not
+        been delivered yet are not planned again. Reads bypass the query cache
+        so the plan starts from current stock.
+        """
+        demands = read_rows(
+            """SELECT d.demand_id, d.center_id, d.item_id, d.outstanding_quantity - COALESCE(p.units, 0),
+                      d.priority, d.request_date
+               FROM supply_demands d
+               LEFT JOIN (
+                   SELECT bd.demand_id, SUM(bd.quantity) AS units
+                   FROM box_demands bd
+                   JOIN box_ngo_info bi ON bi.box_id = bd.box_id
+                   WHERE bi.delivered_at IS NULL
+                     AND NOT EXISTS (SELECT 1 FROM supply_deliveries sd WHERE sd.box_id = bd.box_id)
+                   GROUP BY bd.demand_id
+               ) p ON p.demand_id = d.demand_id
+               WHERE d.status = 'Pending' AND d.outstanding_quantity - COALESCE(p.units, 0) > 0"""
+        )
+        query = """SELECT inventory_id, ngo_id, item_id, quantity, expiry_date FROM ngo_inventory
+                   WHERE quantity > 0 AND expired_at IS NULL"""
+        params = None
+        if ngo_id is not None:
+            query += " AND ngo_id = %s"
+            params = (ngo_id,)
+        lots = read_rows(query, params)
+        nearby = {}
+        for center_id, served_by in read_rows("SELECT center_id, ngo_id FROM ngo_centers_served ORDER BY ngo_id"):
+            nearby.setdefault(center_id, []).append(served_by)
+        return allocate([Demand(*row) for row in demands], [Lot(*row) for row in lots], nearby,
+                        usable_from, allow_partial)
+
+    def apply_allocation(self, plan):
+        """Pack the boxes of an allocation plan in one transaction; returns
+        [(box_id, qr_code, demand_ids), ...]. The demands are fulfilled when the
+        boxes are scanned at their centers."""
+        boxes = plan.boxes()
+        created = self.create_boxes(boxes)
+        return [(box_id, qr_code, list(demands)) for (box_id, qr_code), (_, _, _, demands) in zip(created, boxes)]
+
+    # Inventory Expiry Functions
+    def pick_fefo(self, ngo_id, item_id, quantity, as_of=None):
+        """Lots to draw `quantity` of an item from, first expiry first (lots without
+        an expiry date last), in one query over the FEFO index.
+
+        Expired lots and lots past `as_of` (default today) are skipped. Returns
+        [(inventory_id, take, expiry_date, batch_id), ...]; the takes add up to
+        less than `quantity` only when the NGO does not hold enough.
+        """
+        rows = read_rows(
+            """
+            SELECT inventory_id, quantity, expiry_date, batch_id, running FROM (
+                SELECT inventory_id, quantity, expiry_date, batch_id,
+                       SUM(quantity) OVER (ORDER BY expiry_date IS NULL, expiry_date, inventory_id) AS running
+                FROM ngo_inventory
+                WHERE ngo_id = %s AND item_id = %s AND quantity > 0 AND expired_at IS NULL
+                  AND (expiry_date IS NULL OR expiry_date >= %s)
+            ) lots
+            WHERE running - quantity < %s
+            ORDER BY running
+            """,
+            (ngo_id, item_id, as_of or datetime.now().date(), quantity)
+        )
+        picks = []
+        for inventory_id, stock, expiry_date, batch_id, running in rows:
+            # Only the last lot is drawn from in part
+            take = min(stock, quantity - (int(running) - stock))
+            picks.append((inventory_id, take, expiry_date, batch_id))
+        return picks
+
+    def get_ngo_stock(self, ngo_id):
+        """{item_id: units} an NGO can still pack (unexpired lots)."""
+        return cached_lookup(
+            """SELECT item_id, SUM(quantity) AS units FROM ngo_inventory
+               WHERE ngo_id = %s AND quantity > 0 AND expired_at IS NULL
+                 AND (expiry_date IS NULL OR expiry_date >= CURDATE())
+               GROUP BY item_id""",
+            'item_id', 'units', params=(ngo_id,), tables=("ngo_inventory",), ttl=DEMAND_CACHE_TTL
+        )
+
+    def get_expiring_stock(self, days=30, ngo_id=None, as_frame=True):
+        """Unexpired lots whose expiry date falls within the next `days` days, soonest first."""
+        today = datetime.now().date()
+        query = """
+        SELECT ni.inventory_id, ni.ngo_id, si.name AS item_name, ni.batch_id, ni.quantity, ni.expiry_date
+        FROM ngo_inventory ni
+        JOIN supply_items si ON ni.item_id = si.item_id
+        WHERE ni.expiry_date >= %s AND ni.expiry_date < %s AND ni.quantity > 0 AND ni.expired_at IS NULL
+        """
+        params = [today, today + timedelta(days=days)]
+        if ngo_id is not None:
+            query += " AND ni.ngo_id = %s"
+            params.append(ngo_id)
+        query += " ORDER BY ni.expiry_date, ni.inventory_id"
+        return self._fetch(query, tuple(params), tables=("ngo_inventory", "supply_items"), ttl=DEMAND_CACHE_TTL,
+                           as_frame=as_frame)
+
     def insert_box_ngo_info(self, box_id, destination_center_id, priority):
         query = """
         INSERT INTO box_ngo_info (box_id, destination_center_id, priority)
         VALUES (%s, %s, %s)
         """
-        self.cursor.execute(query, (box_id, destination_center_id, priority))
-        self.conn.commit()
+        self._execute(query, (box_id, destination_center_id, priority))
     def scan_qr_code(self, qr_code, center_id, received_by):
-        # Get box details
-        box_query = "SELECT box_id FROM supply_boxes WHERE qr_code = ?"
-        self.cursor.execute(box_query, (qr_code,))
-        box_result = self.cursor.fetchone()
-        
-        if not box_result:
+        # All matching demands are fulfilled in one transaction: either the whole
+        # box is recorded or nothing is
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                box_id, contents, deliveries = fulfil_box(cursor, qr_code, center_id, received_by)
+                if box_id is not None and deliveries is not None:
+                    record_demand_deliveries(cursor, deliveries)
+                    record_deliveries(cursor, [(box_id, center_id)])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        if box_id is None:
             return False, "Invalid QR code"
-        
-        box_id = box_result[0]
-        
-        # Get box contents
-        contents_query = """
-        SELECT bc.item_id, si.name, bc.quantity
-        FROM box_contents bc
-        JOIN supply_items si ON bc.item_id = si.item_id
-        WHERE bc.box_id = ?
-        """
-        self.cursor.execute(contents_query, (box_id,))
-        contents = self.cursor.fetchall()
-        
-        # Update demands that match the contents
-        for item_id, _, quantity in contents:
-            # Find matching demand
-            demand_query = """
-            SELECT demand_id FROM supply_demands 
-            WHERE center_id = ? AND item_id = ? AND status = 'Pending'
-            ORDER BY request_date ASC LIMIT 1
-            """
-            self.cursor.execute(demand_query, (center_id, item_id))
-            demand_result = self.cursor.fetchone()
-            
-            if demand_result:
-                demand_id = demand_result[0]
-                # Record delivery
-                self.cursor.execute(
-                    """INSERT INTO supply_deliveries 
-                       (box_id, demand_id, center_id, delivery_date, received_by)
-                       VALUES (?, ?, ?, ?, ?)""",
-                    (box_id, demand_id, center_id, datetime.now(), received_by)
-                )
-                # Update demand status
-                self.update_demand_status(demand_id, 'Fulfilled')
-        
-        self.conn.commit()
+        if deliveries is None:
+            return False, "Box already received"
+        invalidate_tables("supply_demands", *SUMMARY_TABLES, *HISTORY_TABLES)
         return True, contents
 
+    def receive_boxes(self, scans, center_id, received_by, notify=True):
+        """Record a batch of scanned box labels in one transaction.
+
+        `scans` is a list of (qr_type, qr_data). Every scan is logged in qr_codes,
+        and each box's contents are counted against the demands named on its label,
+        then the oldest open demands at the center (see receive_scans).
+        Subscribers get a single digest of all fulfilled demands.
+        Returns {"boxes", "fulfilled", "partial", "unknown"}.
+        """
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                summary = receive_scans(cursor, scans, center_id, received_by)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        invalidate_tables("supply_demands", *SUMMARY_TABLES, *HISTORY_TABLES)
+        if notify and summary["fulfilled"]:
+            queue_fulfilment_digest(self.get_alert_emails(), summary["fulfilled"])
+        return summary
+
+    def apply_scan_journal(self, entries, notify=True):
+        """Replay scan journal entries (see scan_journal.py) in one transaction.
+
+        Entries whose scan_id was applied before are skipped, so a batch that is
+        replayed after a lost commit acknowledgement changes nothing twice.
+        """
+        summary = {"boxes": 0, "fulfilled": [], "partial": [], "unknown": [], "already_received": [], "skipped": 0}
+        if not entries:
+            return summary
+        if any(is_box_payload(entry["qr_data"]) for entry in entries):
+            # Without the key every payload label would fail; raise
+            # PayloadKeyMissing before opening a transaction
+            payload_key()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                scan_ids = [entry["scan_id"] for entry in entries]
+                cursor.execute(
+                    "SELECT scan_id FROM applied_scans WHERE scan_id IN (%s) FOR UPDATE"
+                    % ','.join(['%s'] * len(scan_ids)),
+                    scan_ids
+                )
+                done = {row[0] for row in cursor.fetchall()}
+                fresh = [entry for entry in entries if entry["scan_id"] not in done]
+                summary["skipped"] = len(entries) - len(fresh)
+                groups = {}
+                for entry in fresh:
+                    groups.setdefault((entry["center_id"], entry["received_by"]), []).append(
+                        (entry["qr_type"], entry["qr_data"])
+                    )
+                for (center_id, received_by), scans in groups.items():
+                    result = receive_scans(cursor, scans, center_id, received_by)
+                    summary["boxes"] += result["boxes"]
+                    summary["fulfilled"].extend(result["fulfilled"])
+                    summary["partial"].extend(result["partial"])
+                    summary["unknown"].extend(result["unknown"])
+                    summary["already_received"].extend(result["already_received"])
+                if fresh:
+                    now = datetime.now()
+                    cursor.executemany(
+                        "INSERT INTO applied_scans (scan_id, recorded_at, applied_at) VALUES (%s, %s, %s)",
+                        [(entry["scan_id"], datetime.fromtimestamp(entry["recorded_at"]), now) for entry in fresh]
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        invalidate_tables("supply_demands", *SUMMARY_TABLES, *HISTORY_TABLES)
+        if notify and summary["fulfilled"]:
+            queue_fulfilment_digest(self.get_alert_emails(), summary["fulfilled"])
+        return summary
+
+    def get_alert_emails(self):
+        return self._fetch("SELECT DISTINCT email FROM email_list_for_alerts",
+                           tables=("email_list_for_alerts",), as_frame=False).column('email')
+
     # Alert System Functions
-    def get_pending_demands(self):
+    def get_pending_demands(self, as_frame=True):
         query = """
         SELECT sd.demand_id, fc.name as center_name, si.name as item_name, 
-               sd.quantity, sd.priority, sd.request_date
+               sd.quantity, sd.outstanding_quantity, sd.priority, sd.request_date
         FROM supply_demands sd
         JOIN flood_centers2 fc ON sd.center_id = fc.center_id
         JOIN supply_items si ON sd.item_id = si.item_id
@@ -203,21 +2087,57 @@ class Database:
             END,
             sd.request_date ASC
         """
-        self.cursor.execute(query)
-        df = pd.DataFrame(self.cursor.fetchall(), columns=[desc[0] for desc in self.cursor.description])
-        return df
+        return self._fetch(query, tables=("supply_demands", "flood_centers2", "supply_items"),
+                           ttl=DEMAND_CACHE_TTL, as_frame=as_frame)
 
-    def get_supplies_for_center(self, center_id):
+    def get_demands_since(self, cursor=None, limit=1000, as_frame=True):
+        """Incremental demand feed for polling pages.
+
+        With no cursor, returns every pending demand; afterwards, only demands
+        created or changed (any status) after the cursor, oldest change first,
+        using the (updated_at, demand_id) index. Returns (rows, next_cursor).
+        """
+        columns = """
+        SELECT sd.demand_id, fc.name as center_name, si.name as item_name,
+               sd.quantity, sd.outstanding_quantity, sd.priority, sd.request_date, sd.status, sd.updated_at
+        FROM supply_demands sd
+        JOIN flood_centers2 fc ON sd.center_id = fc.center_id
+        JOIN supply_items si ON sd.item_id = si.item_id
+        """
+        if cursor is None:
+            # Take the cursor before the snapshot: changes made in between are
+            # delivered again on the next poll, which merging tolerates
+            with get_connection() as conn:
+                c = conn.cursor()
+                c.execute("SELECT MAX(updated_at) FROM supply_demands")
+                latest = c.fetchone()[0]
+                c.close()
+            rows = read_rows(columns + "WHERE sd.status = 'Pending'")
+            cursor = (latest or datetime(1970, 1, 1), 0)
+            return (rows.to_frame() if as_frame else rows), cursor
+
+        rows = read_rows(
+            columns + """
+            WHERE (sd.updated_at, sd.demand_id) > (%s, %s)
+            ORDER BY sd.updated_at, sd.demand_id
+            LIMIT %s
+            """,
+            (cursor[0], cursor[1], limit)
+        )
+        if not rows.empty:
+            last = rows.rows[-1]
+            cursor = (last[rows.columns.index('updated_at')], last[rows.columns.index('demand_id')])
+        return (rows.to_frame() if as_frame else rows), cursor
+
+    def get_supplies_for_center(self, center_id, as_frame=True):
         query = """
         SELECT si.name as supply_type, sc.quantity, sc.date
         FROM supply_centers sc
         JOIN supply_items si ON sc.item_id = si.item_id
         WHERE sc.center_id = %s
         """
-        self.cursor.execute(query, (center_id,))
-        df = pd.DataFrame(self.cursor.fetchall(), columns=[desc[0] for desc in self.cursor.description])
-        return df
-    def get_new_demands(self, selected_centers, selected_priorities):
+        return self._fetch(query, (center_id,), as_frame=as_frame)
+    def get_new_demands(self, selected_centers, selected_priorities, as_frame=True):
         query = """
         SELECT sd.demand_id, fc.name as center_name, si.name as item_name, 
                sd.quantity, sd.priority, sd.request_date
@@ -227,9 +2147,192 @@ class Database:
         WHERE sd.status = 'Pending' AND sd.center_id IN (%s) AND sd.priority IN (%s)
         ORDER BY sd.request_date DESC
         """ % (','.join(['%s'] * len(selected_centers)), ','.join(['%s'] * len(selected_priorities)))
-        self.cursor.execute(query, selected_centers + selected_priorities)
-        df = pd.DataFrame(self.cursor.fetchall(), columns=[desc[0] for desc in self.cursor.description])
-        return df
+        return self._fetch(query, selected_centers + selected_priorities, as_frame=as_frame)
+
+    # Dashboard Aggregates
+    # GROUP BY runs in MySQL and only the numbers the charts plot come back;
+    # every filter combination is cached until the underlying table changes
+    def get_states(self):
+        query = "SELECT DISTINCT state FROM flood_centres WHERE state IS NOT NULL ORDER BY state"
+        return self._fetch(query, tables=("flood_centres",), as_frame=False).column('state')
+
+    def get_supply_totals(self, state=None, supply_types=SUPPLY_TYPES):
+        """{'centres': n, <supply type>: total, ...} over all centres or one state."""
+        columns = _supply_columns(supply_types)
+        query = "SELECT COUNT(*) AS centres%s FROM flood_centres" % "".join(
+            f", COALESCE(SUM({name}), 0) AS {name}" for name in columns
+        )
+        params = ()
+        if state is not None:
+            query += " WHERE state = %s"
+            params = (state,)
+        rows = self._fetch(query, params, tables=("flood_centres",), as_frame=False)
+        return {name: int(value) for name, value in zip(rows.columns, rows.rows[0])}
+
+    def get_supply_totals_by_state(self, supply_types=SUPPLY_TYPES, as_frame=True):
+        columns = _supply_columns(supply_types)
+        query = "SELECT state, COUNT(*) AS centres%s FROM flood_centres GROUP BY state ORDER BY state" % "".join(
+            f", COALESCE(SUM({name}), 0) AS {name}" for name in columns
+        )
+        return self._fetch(query, tables=("flood_centres",), as_frame=as_frame)
+
+    def get_centre_supply_summary(self, state=None, supply_types=SUPPLY_TYPES, limit=None, as_frame=True):
+        """Per-centre quantities of the selected supplies, largest total first."""
+        columns = _supply_columns(supply_types)
+        total = " + ".join(f"COALESCE({name}, 0)" for name in columns) or "0"
+        query = "SELECT centre_name, state%s, %s AS total FROM flood_centres" % (
+            "".join(f", {name}" for name in columns), total
+        )
+        params = []
+        if state is not None:
+            query += " WHERE state = %s"
+            params.append(state)
+        query += " ORDER BY total DESC"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(int(limit))
+        return self._fetch(query, params, tables=("flood_centres",), as_frame=as_frame)
+
+    def get_demand_counts(self, by='priority', status='Pending', as_frame=True):
+        """Number and quantity of demands per priority or per center."""
+        if by == 'priority':
+            query = """
+            SELECT priority, COUNT(*) AS demands, SUM(quantity) AS quantity, SUM(outstanding_quantity) AS outstanding
+            FROM supply_demands WHERE status = %s GROUP BY priority
+            """
+        elif by == 'center':
+            query = """
+            SELECT fc.name AS center_name, COUNT(*) AS demands, SUM(sd.quantity) AS quantity,
+                   SUM(sd.outstanding_quantity) AS outstanding
+            FROM supply_demands sd
+            JOIN flood_centers2 fc ON sd.center_id = fc.center_id
+            WHERE sd.status = %s
+            GROUP BY fc.center_id, fc.name
+            ORDER BY demands DESC
+            """
+        else:
+            raise Exception(f"Cannot group demands by {by}")
+        return self._fetch(query, (status,), tables=("supply_demands", "flood_centers2"),
+                           ttl=DEMAND_CACHE_TTL, as_frame=as_frame)
+
+    def get_center_need(self, limit=None, as_frame=True):
+        """Pending demands and units still needed per center, read from the
+        running totals in center_summary."""
+        query = """
+        SELECT fc.name AS center_name, cs.pending_demands AS demands, cs.pending_quantity AS outstanding
+        FROM center_summary cs
+        JOIN flood_centers2 fc ON cs.center_id = fc.center_id
+        WHERE cs.pending_demands > 0
+        ORDER BY cs.pending_quantity DESC
+        """
+        params = None
+        if limit is not None:
+            query += " LIMIT %s"
+            params = (limit,)
+        return self._fetch(query, params, tables=("center_summary", "flood_centers2"), ttl=DEMAND_CACHE_TTL,
+                           as_frame=as_frame)
+
+    def get_demand_trend(self, bucket='day', center_id=None, as_frame=True):
+        """Demands requested per day/week/month and priority."""
+        if bucket not in TREND_BUCKETS:
+            raise Exception(f"Unknown trend bucket: {bucket}")
+        period = TREND_BUCKETS[bucket].format("request_date")
+        query = f"""
+        SELECT {period} AS period, priority, COUNT(*) AS demands, SUM(quantity) AS quantity
+        FROM supply_demands
+        """
+        params = ()
+        if center_id is not None:
+            query += " WHERE center_id = %s"
+            params = (center_id,)
+        query += " GROUP BY period, priority ORDER BY period"
+        return self._fetch(query, params, tables=("supply_demands",), ttl=DEMAND_CACHE_TTL, as_frame=as_frame)
+
+    # Supply History Functions
+    def get_supply_history(self, start, end=None, item_ids=None, as_frame=True):
+        """Stock movements and levels per item between `start` and `end` (default
+        the end of the current period, see history_end).
+
+        Short ranges come from the raw history, longer ones from the hourly or
+        daily rollups, so a chart over months reads one row per item and day.
+        Columns: period, item_id, item, stocked, packed, delivered, level.
+        """
+        table, column = history_resolution((end or datetime.now()) - start)
+        end = end or history_end(table)
+        if table == "supply_history":
+            # Raw events: one column per event type, like the rollups
+            movements = ", ".join(f"CASE WHEN h.event = '{event}' THEN h.quantity ELSE 0 END AS {event}"
+                                  for event in HISTORY_EVENTS)
+        else:
+            movements = ", ".join(f"h.{event}" for event in HISTORY_EVENTS)
+        query = f"""
+        SELECT h.{column} AS period, h.item_id, si.name AS item, {movements}, h.level
+        FROM {table} h
+        JOIN supply_items si ON si.item_id = h.item_id
+        WHERE h.{column} >= %s AND h.{column} < %s"""
+        params = [start, end]
+        if item_ids:
+            query += " AND h.item_id IN (%s)" % ','.join(['%s'] * len(item_ids))
+            params.extend(item_ids)
+        query += f" ORDER BY h.{column}, h.item_id"
+        return self._fetch(query, tuple(params), tables=(table, "supply_items"), ttl=DEMAND_CACHE_TTL,
+                           as_frame=as_frame)
+
+    # Summary Functions
+    def get_ngo_metrics(self, ngo_id=None):
+        """Headline numbers for one NGO (all NGOs when None), read from the summary tables."""
+        where, params = ("WHERE ngo_id = %s", (ngo_id,)) if ngo_id is not None else ("", None)
+        rows = self._fetch(
+            f"""SELECT COALESCE(SUM(total_items), 0) AS total_items,
+                       COALESCE(SUM(boxes_sent), 0) AS boxes_sent,
+                       COALESCE(SUM(boxes_delivered), 0) AS boxes_delivered
+                FROM ngo_summary {where}""",
+            params, tables=("ngo_summary",), ttl=DEMAND_CACHE_TTL, as_frame=False
+        )
+        served = self._fetch(
+            f"SELECT COUNT(DISTINCT center_id) AS centers FROM ngo_centers_served {where}",
+            params, tables=("ngo_centers_served",), ttl=DEMAND_CACHE_TTL, as_frame=False
+        )
+        metrics = {name: int(value) for name, value in rows.dicts()[0].items()}
+        metrics["pending_deliveries"] = metrics["boxes_sent"] - metrics["boxes_delivered"]
+        metrics["centers_served"] = int(served.column("centers")[0])
+        metrics["success_rate"] = (metrics["boxes_delivered"] / metrics["boxes_sent"]
+                                   if metrics["boxes_sent"] else None)
+        return metrics
 
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        # Hand the dedicated connection (if one was checked out) back to the pool
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        if self._conn is not None:
+            checkout, self._conn, self._conn_checkout = self._conn_checkout, None, None
+            checkout.__exit__(None, None, None)
+
+
+if __name__ == "__main__":
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        print(f"Applied migrations: {run_migrations() or 'none pending'}")
+    elif command == "check-plans":
+        problems = check_query_plans()
+        for name, row in problems:
+            print(f"Full table scan in '{name}': {row}")
+        sys.exit(1 if problems else 0)
+    elif command == "sweep-expired":
+        print(f"Flagged {sweep_expired_stock()} expired lot(s)")
+    elif command == "rebuild-donations":
+        rebuild_donation_tracking()
+        print("Donation tracking rebuilt")
+    elif command == "rebuild-summaries":
+        rebuild_summaries()
+        print("Summary tables rebuilt")
+    elif command == "check-summaries":
+        problems = check_summaries()
+        for table, key, column, stored, actual in problems:
+            print(f"{table} {key}: {column} is {stored}, expected {actual}")
+        sys.exit(1 if problems else 0)
+    else:
+        sys.exit(f"Unknown command {command!r}; use 'migrate', 'check-plans', "
+                 f"'rebuild-summaries', 'check-summaries', 'rebuild-donations' or 'sweep-expired'")
@@ -0,0 +1,169 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import qrcode
+from PIL import Image, ImageDraw
+
+LABEL_CACHE_SIZE = int(os.getenv("LABEL_CACHE_SIZE", "4096"))  # rendered PNGs kept in memory
+LABEL_WORKERS = int(os.getenv("LABEL_WORKERS", "0")) or os.cpu_count() or 1
+POOL_THRESHOLD = 64  # smaller batches render inline; starting worker processes costs more
+
+# Print sheet: A4 at 300 dpi
+SHEET_SIZE = (2480, 3508)
+SHEET_MARGIN = 120
+
+
+def render_qr_png(payload, box_size=10, border=4):
+    """Render a QR code for `payload` as PNG bytes."""
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buffered = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _render_args(args):
+    return render_qr_png(*args)
+
+
+class LabelCache:
+    """LRU of rendered label PNGs keyed by a hash of the payload and render settings."""
+
+    def __init__(self, max_size=LABEL_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(payload, box_size, border):
+        return hashlib.sha256(f"{box_size}:{border}:{payload}".encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_cache = LabelCache()
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """Process-wide render pool, started on first use and kept for later batches.
+
+    Workers are spawned rather than forked: the app process runs background
+    threads (alert dispatcher, journal sync), and a forked child could inherit
+    a lock one of them holds."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _drop_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def render_labels(payloads, box_size=10, border=4, workers=LABEL_WORKERS, cache=_cache):
+    """PNG bytes for every payload, in order.
+
+    Cached renders are reused; the rest are rendered in the shared process
+    pool when there are enough of them to pay for it."""
+    keys = [cache.key(payload, box_size, border) for payload in payloads]
+    pngs = {}
+    missing = {}
+    for key, payload in zip(keys, payloads):
+        if key in pngs or key in missing:
+            continue
+        png = cache.get(key)
+        if png is None:
+            missing[key] = payload
+        else:
+            pngs[key] = png
+
+    jobs = [(payload, box_size, border) for payload in missing.values()]
+    rendered = None
+    if len(jobs) >= POOL_THRESHOLD and workers > 1:
+        pool = _get_pool(workers)
+        try:
+            rendered = list(pool.map(_render_args, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool next time and finish this batch here
+            _drop_pool(pool)
+    if rendered is None:
+        rendered = [_render_args(job) for job in jobs]
+    for key, png in zip(missing, rendered):
+        cache.put(key, png)
+        pngs[key] = png
+    return [pngs[key] for key in keys]
+
+
+def label_sheet(labels, columns=3, rows=7):
+    """Print-ready PDF (A4, 300 dpi) of (png_bytes, caption) labels laid out in a grid."""
+    width, height = SHEET_SIZE
+    cell_w = (width - 2 * SHEET_MARGIN) // columns
+    cell_h = (height - 2 * SHEET_MARGIN) // rows
+    caption_h = 40
+    side = min(cell_w, cell_h - caption_h) - 20
+
+    pages = []
+    per_page = columns * rows
+    for start in range(0, max(len(labels), 1), per_page):
+        page = Image.new("RGB", SHEET_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+        for n, (png, caption) in enumerate(labels[start:start + per_page]):
+            row, column = divmod(n, columns)
+            left = SHEET_MARGIN + column * cell_w
+            top = SHEET_MARGIN + row * cell_h
+            code = Image.open(BytesIO(png)).convert("RGB").resize((side, side), Image.NEAREST)
+            page.paste(code, (left + (cell_w - side) // 2, top))
+            draw.text((left + (cell_w - side) // 2, top + side + 5), caption, fill="black")
+        pages.append(page)
+
+    buffered = BytesIO()
+    pages[0].save(buffered, format="PDF", resolution=300, save_all=True, append_images=pages[1:])
+    return buffered.getvalue()
+
+
+def get_label_cache_stats():
+    return {"hits": _cache.hits, "misses": _cache.misses, "entries": len(_cache)}
@@ -0,0 +1,307 @@
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+
+# SMTP settings (override through environment variables, e.g. a local aiosmtpd
+# with EMAIL_HOST=localhost EMAIL_PORT=8025 EMAIL_USE_SSL=0)
+SMTP_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("EMAIL_PORT", "465"))
+SMTP_USE_SSL = os.getenv("EMAIL_USE_SSL", "1") != "0"
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "4"))
+RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "2"))  # seconds, doubled on every retry
+IDLE_TIMEOUT = float(os.getenv("EMAIL_IDLE_TIMEOUT", "30"))  # close the SMTP session after this idle time
+DIGEST_WINDOW = float(os.getenv("ALERT_DIGEST_WINDOW", "300"))  # seconds
+DIGEST_THRESHOLD = int(os.getenv("ALERT_DIGEST_THRESHOLD", "3"))  # alerts per window before batching
+
+
+def default_smtp_factory():
+    """Open an authenticated SMTP session with the configured server."""
+    if SMTP_USE_SSL:
+        smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=ssl.create_default_context(), timeout=30)
+    else:
+        smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    email_sender = os.getenv('EMAIL_USER')
+    email_password = os.getenv('EMAIL_PASSWORD')
+    if email_sender and email_password:
+        smtp.login(email_sender, email_password)
+    return smtp
+
+
+class NotificationDispatcher:
+    """Background email sender.
+
+    Pages enqueue jobs and return immediately; worker threads send them over a
+    persistent SMTP session that is reused across jobs, reconnecting and
+    retrying with exponential backoff on failure.
+    """
+
+    def __init__(self, smtp_factory=default_smtp_factory, sender=None, workers=1,
+                 max_attempts=MAX_ATTEMPTS, backoff=RETRY_BACKOFF, idle_timeout=IDLE_TIMEOUT):
+        self.smtp_factory = smtp_factory
+        self.sender = sender or os.getenv('EMAIL_USER') or "alerts@bantuannow.local"
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "sent": 0, "failed": 0, "retries": 0, "connections": 0}
+
+    def start(self):
+        if self._threads:
+            return self
+        self._stopping.clear()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"notification-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the workers once the jobs already queued have been handled."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, to, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = to
+        message['Subject'] = subject
+        message.set_content(body)
+        self._queue.put(message)
+        self._count("queued")
+
+    def join(self):
+        """Block until every queued job has been sent or given up on."""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backlog"] = self._queue.qsize()
+        return stats
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        # smtplib sessions are not thread-safe, so every worker owns one
+        smtp = None
+        last_used = time.monotonic()
+        while True:
+            try:
+                message = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if smtp is not None and time.monotonic() - last_used > self.idle_timeout:
+                    smtp = self._close(smtp)
+                if self._stopping.is_set():
+                    self._close(smtp)
+                    return
+                continue
+            try:
+                smtp = self._send(smtp, message)
+                last_used = time.monotonic()
+            finally:
+                self._queue.task_done()
+
+    def _send(self, smtp, message):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if smtp is None:
+                    smtp = self.smtp_factory()
+                    self._count("connections")
+                smtp.send_message(message)
+                self._count("sent")
+                return smtp
+            except Exception:
+                # Drop the session; the next attempt starts a fresh one
+                smtp = self._close(smtp)
+                if attempt == self.max_attempts:
+                    self._count("failed")
+                    return None
+                self._count("retries")
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        return smtp
+
+    @staticmethod
+    def _close(smtp):
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+        return None
+
+
+class SubscriptionIndex:
+    """Subscribers indexed by (center_id, priority); center_id None means every center."""
+
+    def __init__(self, rows=()):
+        self._index = {}
+        for email, center_id, priority in rows:
+            self._index.setdefault((center_id, priority), set()).add(email)
+
+    def match(self, center_id, priority):
+        """Return the emails subscribed to demands of this priority at this center."""
+        return self._index.get((center_id, priority), set()) | self._index.get((None, priority), set())
+
+    def __len__(self):
+        return len({email for emails in self._index.values() for email in emails})
+
+
+class AlertDigest:
+    """Caps alerts per subscriber: beyond `threshold` alerts inside `window`
+    seconds, further alerts are collected and sent as one digest at the end of
+    the window."""
+
+    def __init__(self, dispatcher, window=DIGEST_WINDOW, threshold=DIGEST_THRESHOLD, clock=time.monotonic):
+        self.dispatcher = dispatcher
+        self.window = window
+        self.threshold = threshold
+        self.clock = clock
+        self._recent = {}
+        self._pending = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def submit(self, email, subject, body, summary):
+        now = self.clock()
+        with self._lock:
+            recent = [t for t in self._recent.get(email, []) if now - t < self.window]
+            if len(recent) < self.threshold and email not in self._pending:
+                recent.append(now)
+                self._recent[email] = recent
+                send_now = True
+            else:
+                self._pending.setdefault(email, []).append(summary)
+                send_now = False
+                if email not in self._timers:
+                    timer = threading.Timer(self.window, self.flush, args=(email,))
+                    timer.daemon = True
+                    self._timers[email] = timer
+                    timer.start()
+        if send_now:
+            self.dispatcher.enqueue(email, subject, body)
+
+    def flush(self, email=None):
+        """Send the collected digest for one subscriber (or everyone)."""
+        with self._lock:
+            emails = [email] if email is not None else list(self._pending)
+            batches = []
+            for address in emails:
+                timer = self._timers.pop(address, None)
+                if timer is not None:
+                    timer.cancel()
+                lines = self._pending.pop(address, [])
+                if lines:
+                    batches.append((address, lines))
+                    self._recent[address] = [self.clock()]
+        for address, lines in batches:
+            body = "Dear Subscriber,\n\nThe following supply demands matched your subscription:\n\n"
+            body += "\n".join(f"- {line}" for line in lines)
+            body += "\n\nBest regards,\nFlood Monitoring Team\n"
+            self.dispatcher.enqueue(address, f"Supply Alert Digest ({len(lines)} new demands)", body)
+
+
+_dispatcher = None
+_digest = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Return the process-wide dispatcher, starting it on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = NotificationDispatcher().start()
+    return _dispatcher
+
+
+def get_digest():
+    """Return the process-wide digest batcher in front of the dispatcher."""
+    global _digest
+    if _digest is None:
+        dispatcher = get_dispatcher()
+        with _dispatcher_lock:
+            if _digest is None:
+                _digest = AlertDigest(dispatcher)
+    return _digest
+
+
+def queue_demand_alert(emails, demand_id, center_name, item_name, item_id, quantity, priority, ngo):
+    """Queue the 'new supply demand' alert for the given (already matched) subscribers."""
+    body = f"""
+        Dear Subscriber,
+
+        There are new supply demands that match your subscription criteria:
+
+        Flood Center: {center_name}
+        Item: {item_name}
+        Demand ID: {demand_id}
+        Item ID: {item_id}
+        Quantity: {quantity}
+        Priority: {priority}
+        NGO: {ngo}
+
+        Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+        Best regards,
+        Flood Monitoring Team
+        """
+    summary = f"#{demand_id} {priority}: {quantity} x {item_name} for {center_name}"
+    digest = get_digest()
+    for email in emails:
+        digest.submit(email, "New Supply Alert Notification", body, summary)
+
+
+def queue_fulfilment_alert(emails, demand_id):
+    """Queue the 'demand fulfilled' alert for every subscriber."""
+    body = f"""
+        Dear Subscriber,
+
+        Demand for the following item has been fulfilled:
+
+        Demand ID: {demand_id}
+        Status: Fulfilled
+
+        Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+        Best regards,
+        Flood Monitoring Team
+        """
+    dispatcher = get_dispatcher()
+    for email in emails:
+        dispatcher.enqueue(email, "Supply Demand Fulfilled Notification", body)
+
+
+def queue_fulfilment_digest(emails, demand_ids):
+    """Queue one 'demands fulfilled' message per subscriber for a whole received batch."""
+    if len(demand_ids) == 1:
+        return queue_fulfilment_alert(emails, demand_ids[0])
+    lines = "\n".join(f"        - Demand ID: {demand_id}" for demand_id in demand_ids)
+    body = f"""
+        Dear Subscriber,
+
+        The following {len(demand_ids)} demands have been fulfilled:
+
+{lines}
+
+        Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+        Best regards,
+        Flood Monitoring Team
+        """
+    dispatcher = get_dispatcher()
+    for email in emails:
+        dispatcher.enqueue(email, f"Supply Demands Fulfilled ({len(demand_ids)})", body)
@@ -0,0 +1,79 @@
+import streamlit as st
+import pandas as pd
+import os
+
+def show(db):
+    st.title("🏢 NGO Adding System")
+    
+    # Authentication section
+    if 'ngo_id' not in st.session_state:
+        st.session_state.ngo_id = None
+        st.session_state.ngo_name = None
+    
+    # Get NGOs from the database
+    ngos = db.get_all_ngos()
+    ngo_names = db.get_ngo_names()
+    
+    if ngos.empty:
+        st.warning("⚠️ No NGOs found in the database.")
+        return
+    
+    # Select NGO
+    st.header("Login")
+    selected_ngo = st.selectbox(
+        "Select your NGO",
+        options=ngos['ngo_id'].tolist(),
+        format_func=ngo_names.get,
+        key="addintoinventory_ngo_selectbox"
+    )
+    password = st.text_input("Password", type="password", key="addintoinventory_password_input")
+    
+    # Login button
+    if st.button("Login", key="addintoinventory_login_button"):
+        if password:  # Simplified authentication
+            st.session_state.ngo_id = selected_ngo
+            st.session_state.ngo_name = ngo_names[selected_ngo]
+            st.success(f"✅ Logged in as {st.session_state.ngo_name}")
+        else:
+            st.error("❌ Please enter a password")
+    
+    # Only show the inventory management interface if authenticated
+    if st.session_state.ngo_id:
+        st.markdown(f"### Welcome, {st.session_state.ngo_name}")
+        st.markdown("---")
+        st.subheader("Add New Items")
+        
+        with st.form("add_supplies_form"):
+            try:
+                items = db.get_supply_items()
+                item_names = db.get_item_names()
+            except Exception as e:
+                st.error(f"Database connection error: {e}")
+                items = pd.DataFrame(columns=['item_id', 'name'])
+                item_names = {}
+
+            item_id = st.selectbox(
+                "Item Type",
+                options=items['item_id'].tolist(),
+                format_func=item_names.get,
+                key="item_selectbox"
+            )
+            quantity = st.number_input("Quantity", min_value=1, value=10, key="quantity_input")
+            batch_id = st.text_input("Batch ID", key="batch_id_input")
+            expiry_date = st.date_input("Expiry Date", key="expiry_date_input")
+            source = st.text_input("Source/Supplier", key="source_input")
+            notes = st.text_area("Notes", key="notes_input")
+            submitted = st.form_submit_button("Add to Inventory")
+            
+            if submitted:
+                if all([item_id, quantity, expiry_date]):
+                    try:
+                        # Goes through the Database so the summary tables stay in step
+                        db.insert_ngoinventory(st.session_state.ngo_id, item_id, quantity, expiry_date,
+                                               batch_id, source, notes, name=item_names[item_id])
+
+                        st.success("✅ Items added successfully!")
+                    except Exception as e:
+                        st.error(f"❌ Error: {str(e)}")
+                else:
+                    st.error("Please fill in all required fields")
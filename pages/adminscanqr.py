@@ -0,0 +1,272 @@
+import cv2
+import pandas as pd
+import streamlit as st
+import os
+import time
+from datetime import datetime   
+from database import is_data_error
+from qr_payload import PayloadKeyMissing, is_box_payload, payload_key
+from scan_journal import get_journal_sync, get_scan_journal
+from scan_pipeline import ScanDeduper, ScanPipeline
+
+BATCH_SCAN_DURATION = 600  # seconds a batch scanning run lasts at most
+
+def sync_journal(sync):
+    """Push journalled scans to MySQL now; returns the combined summary, or None while offline."""
+    try:
+        results = sync.sync_now()
+    except PayloadKeyMissing as e:
+        st.error(f"❌ Box labels cannot be verified: {e}. The scan is saved on this device "
+                 "and will be synced once the key is set.")
+        return None
+    except Exception as e:
+        st.warning(f"⚠️ Database unreachable ({e}). The scan is saved on this device "
+                   "and will be synced automatically.")
+        return None
+    summary = {"boxes": 0, "fulfilled": [], "partial": [], "unknown": [], "already_received": []}
+    for result in results:
+        summary["boxes"] += result["boxes"]
+        summary["fulfilled"].extend(result["fulfilled"])
+        summary["partial"].extend(result["partial"])
+        summary["unknown"].extend(result["unknown"])
+        summary["already_received"].extend(result["already_received"])
+    return summary
+
+def show_sync_status(sync):
+    stats = sync.stats()
+    if stats["backlog"]:
+        st.caption(f"{stats['backlog']} scan(s) waiting to sync, oldest {stats['lag']:.0f}s ago")
+    if stats["rejected"]:
+        st.warning(f"{stats['rejected']} scan(s) were rejected by the database and set aside")
+
+def list_cameras():
+    """List available cameras."""
+    index = 0
+    arr = []
+    while True:
+        cap = cv2.VideoCapture(index)
+        if not cap.read()[0]:
+            break
+        else:
+            arr.append(index)
+        cap.release()
+        index += 1
+    return arr
+
+def stop_running_pipeline():
+    """Stop a scan pipeline left running by an interrupted rerun and free its camera."""
+    pipeline = st.session_state.pop('scan_pipeline', None)
+    if pipeline is not None:
+        pipeline.stop(timeout=1)
+        pipeline.source.release()
+
+def show_batch_receive(db, cam, journal, sync):
+    """Scan a pallet of boxes continuously and commit them together."""
+    if 'batch_scans' not in st.session_state:
+        st.session_state.batch_scans = {}  # qr_data -> qr_type, in scan order
+    batch = st.session_state.batch_scans
+    
+    center_names = db.get_center_names()
+    center_id = st.selectbox(
+        "Receiving Center",
+        options=list(center_names),
+        format_func=center_names.get,
+        key="batch_center_selectbox"
+    )
+    received_by = st.text_input("Received by", key="batch_received_by_input")
+    
+    col1, col2, col3 = st.columns(3)
+    start_scanning = col1.button("Start Batch Scanning")
+    finish = col2.button("Finish and Commit")
+    if col3.button("Clear Batch"):
+        batch.clear()
+    
+    if finish:
+        if not batch:
+            st.warning("No boxes scanned yet.")
+        elif not received_by:
+            st.error("Please enter who received the boxes.")
+        else:
+            # Journalled locally first; the sync applies the whole batch in one
+            # transaction and sends one digest to subscribers
+            journal.record_batch([(qr_type, qr_data) for qr_data, qr_type in batch.items()],
+                                 center_id, received_by)
+            batch.clear()
+            summary = sync_journal(sync)
+            if summary is not None:
+                st.success(f"✅ {summary['boxes']} box(es) received, "
+                           f"{len(summary['fulfilled'])} demand(s) fulfilled, "
+                           f"{len(summary['partial'])} partly served")
+                if summary['unknown']:
+                    st.warning(f"{len(summary['unknown'])} scanned code(s) matched no box or demand")
+                if summary['already_received']:
+                    st.warning(f"{len(summary['already_received'])} box(es) had been received before "
+                               "and were not counted again")
+    
+    tally = st.empty()
+    table = st.empty()
+    
+    def show_tally():
+        tally.metric("Boxes in batch", len(batch))
+        if batch:
+            table.dataframe(pd.DataFrame({"Data": list(batch), "Type": list(batch.values())}))
+    
+    show_tally()
+    if start_scanning:
+        placeholder = st.empty()
+        # Keeps scanning until the operator presses Finish (which reruns the
+        # page) or BATCH_SCAN_DURATION runs out; the batch holds each code once
+        pipeline = ScanPipeline(cam, dedup=ScanDeduper(ttl=float('inf'))).start()
+        st.session_state.scan_pipeline = pipeline
+        scan_start_time = time.time()
+        while time.time() - scan_start_time < BATCH_SCAN_DURATION:
+            result = pipeline.next_result(timeout=0.05)
+            if pipeline.latest_frame is not None:
+                placeholder.image(pipeline.latest_frame, channels="BGR")
+            if result is None:
+                if not pipeline.running:
+                    st.error("Camera error. Please try again.")
+                    break
+                continue
+            if result.data not in batch:
+                batch[result.data] = result.type
+                show_tally()
+        stop_running_pipeline()
+
+def show(db):
+    """Main function to display the QR code scanner."""
+    st.title("QR Code Scanner")
+    
+    # A pipeline from a rerun that was interrupted still holds the camera
+    stop_running_pipeline()
+
+    # Box labels are verified with the signing key; without it no scan can sync
+    try:
+        payload_key()
+    except PayloadKeyMissing as e:
+        st.error(f"❌ Box labels cannot be verified: {e}.")
+        return
+    
+    # Camera selection
+    available_cameras = list_cameras()
+    if not available_cameras:
+        st.error("No cameras detected on this device.")
+        return
+        
+    selected_camera = st.selectbox("Select Camera", available_cameras)
+    
+    # Initialize camera
+    cam = cv2.VideoCapture(selected_camera)
+    cam.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cam.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    
+    # Scans go to a local journal first and are synced to MySQL in bulk, so a
+    # dropped connection does not lose them
+    journal = get_scan_journal()
+    sync = get_journal_sync(db.apply_scan_journal, is_data_error)
+    show_sync_status(sync)
+    
+    mode = st.radio("Mode", ["Single box", "Batch receive"], horizontal=True)
+    if mode == "Batch receive":
+        show_batch_receive(db, cam, journal, sync)
+        cam.release()
+        return
+    
+    # Boxes are counted against the demands of the center that receives them
+    center_names = db.get_center_names()
+    center_id = st.selectbox(
+        "Receiving Center",
+        options=list(center_names),
+        format_func=center_names.get,
+        key="single_center_selectbox"
+    )
+    received_by = st.text_input("Received by", key="single_received_by_input")
+    
+    # Scanning control
+    start_scanning = st.button("Start Scanning")
+    
+    if start_scanning and not received_by:
+        st.error("Please enter who received the box.")
+    elif start_scanning:
+        placeholder = st.empty()  # Placeholder for camera feed
+        scanned_data = []  # Store scanned QR codes
+        
+        scanning = True
+        scan_start_time = time.time()
+        scan_duration = 60  # Scan for 60 seconds max
+        
+        # Frames are captured and decoded on background threads; this loop
+        # only shows the preview and handles decoded codes. A box is reported
+        # once per dedup window across scanning runs, so its demand is updated
+        # and subscribers are notified only once
+        if 'scan_dedup' not in st.session_state:
+            st.session_state.scan_dedup = ScanDeduper()
+        pipeline = ScanPipeline(cam, dedup=st.session_state.scan_dedup).start()
+        st.session_state.scan_pipeline = pipeline
+        
+        # Main scanning loop
+        while scanning:
+            result = pipeline.next_result(timeout=0.05)
+            
+            # Display camera feed
+            if pipeline.latest_frame is not None:
+                placeholder.image(pipeline.latest_frame, channels="BGR")
+            
+            if result is None and not pipeline.running:
+                st.error("Camera error. Please try again.")
+                break
+            
+            # Process QR codes
+            if result is not None:
+                qr_data, qr_type = result.data, result.type
+                
+                # Display QR code info
+                st.write(f"QR Code Type: {qr_type}")
+                st.write(f"QR Code Data: {qr_data}")
+                
+                # Save the scan locally, then sync it (and any backlog) to the
+                # database; the sync counts the box against the center's demands
+                # and queues the subscriber notification
+                journal.record(qr_type, qr_data, center_id, received_by)
+                summary = sync_journal(sync)
+                if summary is not None:
+                    st.success("QR Code saved to database")
+                    for demand_id in summary["fulfilled"]:
+                        st.success(f"✅ Demand status for ID {demand_id} updated to 'Fulfilled'")
+                    for demand_id in summary["partial"]:
+                        st.info(f"Demand ID {demand_id} partly served; the rest is still pending")
+                    if summary["already_received"]:
+                        st.warning("This box was received before and was not counted again")
+                    if qr_data in summary["unknown"] and (is_box_payload(qr_data) or "Demand ID:" in qr_data):
+                        st.error("❌ Label matches no box; its demands were left pending")
+                
+                # Add to scanned data list
+                scanned_data.append({"Type": qr_type, "Data": qr_data})
+                
+                # Handle URL in QR code
+                if qr_data.startswith('http://') or qr_data.startswith('https://'):
+                    st.markdown(f"[Open Link]({qr_data})")
+                
+                # Stop scanning after successful scan
+                scanning = False
+                continue
+            
+            # Check for timeout
+            if time.time() - scan_start_time > scan_duration:
+                st.write("Scanning stopped due to timeout.")
+                scanning = False
+        
+        stop_running_pipeline()
+        stats = pipeline.stats()
+        st.caption(f"Frames captured: {stats['captured']}, dropped: {stats['dropped']}, "
+                   f"duplicates ignored: {stats['duplicates']}, "
+                   f"average decode time: {stats['decode_time_avg'] * 1000:.1f} ms")
+        
+        # Show results table
+        if scanned_data:
+            st.subheader("Scanned QR Codes")
+            df = pd.DataFrame(scanned_data)
+            st.dataframe(df)
+    
+    # Release camera when done
+    cam.release()
\ No newline at end of file
@@ -0,0 +1,113 @@
+# pages/alerts.py
+import streamlit as st
+import pandas as pd
+import time
+import smtplib
+import ssl
+from datetime import datetime   
+import os
+from email.message import EmailMessage
+import os
+from database import PendingDemandView
+
+def show(db):
+    st.title("Supply Alert System")
+    
+    # Keep a per-session copy of the pending demands and only pull what changed
+    # since the last rerun
+    if 'pending_demand_view' not in st.session_state:
+        st.session_state.pending_demand_view = PendingDemandView()
+    st.session_state.pending_demand_view.refresh(db)
+    pending_demands = st.session_state.pending_demand_view.to_frame()
+    
+    # Critical demands section
+    st.subheader("Critical Demands")
+    critical_demands = pending_demands[pending_demands['priority'] == 'Critical']
+    
+    if not critical_demands.empty:
+        for _, demand in critical_demands.iterrows():
+            with st.container(border=True):
+                col1, col2 = st.columns([3, 1])
+                
+                with col1:
+                    st.error(f"⚠️ URGENT: {demand['center_name']} still needs {demand['outstanding_quantity']} "
+                             f"of {demand['quantity']} {demand['item_name']}")
+                    st.write(f"Requested on: {demand['request_date']}")
+                
+    else:
+        st.success("No critical demands at this time.")
+    
+    # All demands table
+    st.subheader("All Pending Demands")
+    
+    if not pending_demands.empty:
+        # Add color to priority
+        def highlight_priority(val):
+            colors = {
+                'Critical': 'background-color: #54081e',
+                'High': 'background-color: #E03C32',
+                'Medium': 'background-color: #FFF215',
+                'Low': 'background-color: #639754'
+            }
+            return colors.get(val, '')
+        
+        # Display styled table
+        st.dataframe(
+            pending_demands.style.applymap(
+                highlight_priority, 
+                subset=['priority']
+            ),
+            column_config={
+                "demand_id": st.column_config.NumberColumn("ID"),
+                "center_name": "Center",
+                "item_name": "Item",
+                "quantity": "Quantity",
+                "outstanding_quantity": "Still Needed",
+                "priority": "Priority",
+                "request_date": "Requested On"
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.success("No pending demands at this time.")
+    
+    # Subscription section
+    st.subheader("Alert Subscriptions")
+    
+    with st.form("alert_subscription"):
+        email = st.text_input("Your Email")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write("Select Priority Levels:")
+            critical = st.checkbox("Critical", value=True)
+            high = st.checkbox("High", value=True)
+            medium = st.checkbox("Medium")
+            low = st.checkbox("Low")
+        
+        with col2:
+            st.write("Select Centers:")
+            center_names = db.get_center_names()
+            selected_centers = st.multiselect(
+                "Centers to monitor",
+                options=list(center_names),
+                format_func=center_names.get
+            )
+        
+        subscribe = st.form_submit_button("Subscribe to Alerts")
+        
+        if subscribe and email:
+            priorities = [level for level, checked in
+                          (("Critical", critical), ("High", high), ("Medium", medium), ("Low", low)) if checked]
+            if not priorities:
+                st.error("Please select at least one priority level.")
+                return
+            try:
+                # Store the filters so new demands only reach matching subscribers
+                db.save_subscription(email, selected_centers, priorities)
+                st.success("You've been subscribed to alerts!")
+                st.info("You will receive email notifications for new demands matching your criteria.")
+            except Exception as e:
+                st.error(f"Failed to subscribe to alerts: {e}")
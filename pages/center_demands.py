@@ -0,0 +1,81 @@
+import streamlit as st
+from datetime import datetime
+from database import Database  # Ensure you have the Database class implemented
+import pandas as pd
+import os
+from database import read_sql
+
+def show(db):
+    st.title("Center Demands and Supplies")
+    tab1, tab2 = st.tabs([
+        "Inventory Management", "Request supply"
+    ])
+    with tab1:
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.subheader("Current Inventory")
+            query = f"""
+            SELECT 
+                n.name as NGO,
+                si.name as Item,
+                ni.quantity as Quantity,
+                ni.expiry_date as 'Expiry Date',
+                ni.source as Source,
+                ni.notes as Notes,
+                ni.last_updated as 'Last Updated'
+            FROM ngo_inventory ni
+            JOIN ngos2 n ON ni.ngo_id = n.ngo_id
+            JOIN supply_items si ON ni.item_id = si.item_id
+            """
+            items = read_sql(query)
+            
+            st.dataframe(
+                items,
+                hide_index=True,
+                use_container_width=True
+            )
+    # Get flood centers and supply items from the database
+    with tab2:
+        centers = db.get_all_centers()
+        supply_items = db.get_supply_items()
+        ngos = db.get_all_ngos()
+        center_names = db.get_center_names()
+        item_names = db.get_item_names()
+
+        if centers.empty:
+            st.warning("No flood centers found in the database.")
+            return
+
+        if supply_items.empty:
+            st.warning("No supply items found in the database.")
+            return
+
+        # Select flood center
+        center_id = st.selectbox(
+            "Select Flood Center",
+            options=centers['center_id'].tolist(),
+            format_func=center_names.get,
+            key="center_selectbox"
+        )
+        
+        # Form to enter demands
+        st.subheader("Enter Demands")
+        demand_ngo = st.selectbox(
+            "Select NGO",
+            options=ngos['name'].tolist(),
+            key="demand_ngos_selectbox"
+        )
+        demand_item_id = st.selectbox(
+            "Select Item",
+            options=supply_items['item_id'].tolist(),
+            format_func=item_names.get,
+            key="demand_item_selectbox"
+        )
+        demand_quantity = st.number_input("Quantity", min_value=1, key="demand_quantity_input")
+        demand_priority = st.selectbox("Priority", ["Low", "Medium", "High", "Critical"], key="demand_priority_selectbox")
+        if st.button("Submit Demand"):
+            # Create demand and get the newly created demand_id; alerts are queued
+            # for the subscribers whose center/priority filters match
+            demand_id = db.create_demand(center_id, demand_item_id, demand_quantity, demand_priority, ngo=demand_ngo)
+            st.success(f"Demand submitted successfully! Demand ID: {demand_id}")
\ No newline at end of file
@@ -0,0 +1,73 @@
+# pages/tracking.py
+import streamlit as st
+import plotly.express as px
+
+def show(db):
+    st.title("Donation Tracking Dashboard")
+
+    # Input email to track donations
+    donor_email = st.text_input("Enter your email to track your donations:")
+
+    if st.button("Track Donations") and donor_email:
+        st.session_state.tracked_donor = donor_email
+        # Cursors of the pages shown so far; None is the newest page
+        st.session_state.donation_pages = [None]
+
+    donor_email = st.session_state.get('tracked_donor')
+    if not donor_email:
+        return
+    pages = st.session_state.donation_pages
+
+    # Get donation data
+    tracking = db.get_donor_tracking(donor_email, before=pages[-1])
+    totals = tracking["totals"]
+
+    if not totals["donations"]:
+        st.warning("No donations found for this email address.")
+        return
+
+    # Display donation summary
+    st.subheader("Your Donations")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Donations", totals["donations"])
+    col2.metric("Total Donated", f"${totals['amount']:.2f}")
+    col3.metric("Allocated", f"{totals['allocated_percent']:.0f}%")
+
+    # Create a pie chart of the totals per NGO
+    fig = px.pie(
+        tracking["by_ngo"].to_frame(),
+        values='amount',
+        names='ngo_name',
+        title='Your Donations by Organization'
+    )
+    st.plotly_chart(fig)
+
+    # Display detailed donation records
+    st.subheader("Donation Details")
+
+    for donation in tracking["donations"]:
+        amount = donation["amount"]
+        given = donation["donation_date"]
+        with st.expander(f"Donation #{donation['donation_id']}: ${amount:.2f} to {donation['ngo_name']}"
+                         + (f" on {given.strftime('%Y-%m-%d')}" if given is not None else "")):
+            # Progress bar for allocation
+            allocation_percent = int(donation["allocated_percent"])
+            st.write(f"Allocation Progress: {allocation_percent}%")
+            st.progress(min(allocation_percent, 100) / 100)
+
+            # Display allocations
+            if donation["allocations"]:
+                st.write("**Allocation Breakdown:**")
+                for line in donation["allocations"]:
+                    when = line['allocation_date']
+                    st.write(f"- ${line['amount'] or 0:.2f} for {line['purpose']}"
+                             + (f" on {when.strftime('%Y-%m-%d')}" if when is not None else ""))
+            else:
+                st.info("Your donation is still being allocated.")
+
+    # Page through older donations; the callbacks run before the next rerun
+    col1, col2 = st.columns(2)
+    if len(pages) > 1:
+        col1.button("Newer Donations", on_click=pages.pop)
+    if tracking["next"] is not None:
+        col2.button("Older Donations", on_click=pages.append, args=(tracking["next"],))
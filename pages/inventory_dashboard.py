@@ -0,0 +1,60 @@
+import streamlit as st
+import pandas as pd
+import qrcode
+from io import BytesIO
+from database import read_sql
+import time
+import os
+from datetime import datetime
+
+def show(db):
+    st.title("🏢 NGO Supply Management")
+    
+    # Authentication section
+    
+    # Get NGOs from database
+    ngos = db.get_all_ngos()
+    
+    
+    if ngos.empty:
+        st.warning("⚠️ No NGOs found in the database.")
+        return
+    
+
+    # Only show management interface if authenticated
+    st.markdown(f"### Welcome, {ngos['name'].iloc[0]}")
+    st.markdown("---")
+    
+    # Quick metrics in columns
+    col1, col2, col3, col4 = st.columns(4)
+    metrics = db.get_ngo_metrics()
+    rate = metrics["success_rate"]
+    col1.metric("Total Items", f"{metrics['total_items']:,}")
+    col2.metric("Pending Deliveries", f"{metrics['pending_deliveries']:,}")
+    col3.metric("Centers Served", f"{metrics['centers_served']:,}")
+    col4.metric("Success Rate", f"{rate:.0%}" if rate is not None else "—")
+    
+    st.markdown("---")
+    
+    # Main tabs
+    tab1, = st.tabs([
+        "📦 Inventory Management",
+    ])
+    
+    with tab1:
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.subheader("Current Inventory")
+            query = f"""
+            SELECT * FROM ngo_inventory
+            """
+            items = read_sql(query)
+            
+            st.dataframe(
+                items,
+                hide_index=True,
+                use_container_width=True
+            )
+
+
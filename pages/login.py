@@ -0,0 +1,44 @@
+import streamlit as st
+from database import get_connection, cached_read_sql
+import os
+import pandas as pd
+
+def login():
+    st.title("NGO Login")
+    
+    # Get NGOs from database
+    try:
+        ngos = cached_read_sql("SELECT * FROM ngos2", tables=("ngos2",))
+    except Exception as e:
+        st.error(f"Database connection error: {e}")
+        return None
+    ngo_names = dict(zip(ngos['ngo_id'], ngos['name']))
+    
+    selected_ngo = st.selectbox(
+        "Select your NGO",
+        options=ngos['ngo_id'].tolist(),
+        format_func=ngo_names.get
+    )
+    password = st.text_input("Password", type="password")
+    
+    if st.button("Login"):
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                query = "SELECT * FROM ngos2 WHERE ngo_id = %s"
+                cursor.execute(query, (selected_ngo,))
+                result = cursor.fetchone()
+                cursor.close()
+            
+            if result and result['password_hash'] == password:  # Simplified password check
+                st.success(f"✅ Logged in as {ngo_names[selected_ngo]}")
+                st.session_state.ngo_id = selected_ngo
+                st.experimental_set_query_params(rerun="true")
+                return selected_ngo
+            else:
+                st.error("❌ Invalid credentials")
+                return None
+        except Exception as e:
+            st.error(f"Database connection error: {e}")
+            return None
+    return None
\ No newline at end of file
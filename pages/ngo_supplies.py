@@ -0,0 +1,125 @@
+import streamlit as st
+import pandas as pd
+import qrcode
+from io import BytesIO
+from database import read_sql
+import time
+import os
+
+def show(db):
+    st.title("🏢 NGO Supply Management")
+    if 'ngo_id' not in st.session_state:
+        st.session_state.ngo_id = None
+        st.session_state.ngo_name = None
+    
+    # Authentication section
+    ngo_id = None
+    
+    # Get NGOs from database
+    ngos = db.get_all_ngos()
+    ngo_names = db.get_ngo_names()
+    
+    if ngos.empty:
+        st.warning("⚠️ No NGOs found in the database.")
+        return
+    
+    # Select NGO
+    st.header("Login")
+    selected_ngo = st.selectbox(
+        "Select your NGO",
+        options=ngos['ngo_id'].tolist(),
+        format_func=ngo_names.get,
+        key="addintoinventory_ngo_selectbox"
+    )
+    password = st.text_input("Password", type="password", key="addintoinventory_password_input")
+    
+    # Login button
+    if st.button("Login", key="addintoinventory_login_button"):
+        if password:  # Simplified authentication
+            st.session_state.ngo_id = selected_ngo
+            st.session_state.ngo_name = ngo_names[selected_ngo]
+            st.success(f"✅ Logged in as {st.session_state.ngo_name}")
+        else:
+            st.error("❌ Please enter a password")
+
+    # Only show management interface if authenticated
+    if st.session_state.ngo_id:
+        st.markdown(f"### Welcome, {st.session_state.ngo_name}")
+        st.markdown("---")
+        
+        # Quick metrics in columns
+        col1, col2, col3, col4 = st.columns(4)
+        metrics = db.get_ngo_metrics(st.session_state.ngo_id)
+        rate = metrics["success_rate"]
+        col1.metric("Total Items", f"{metrics['total_items']:,}")
+        col2.metric("Pending Deliveries", f"{metrics['pending_deliveries']:,}")
+        col3.metric("Centers Served", f"{metrics['centers_served']:,}")
+        col4.metric("Success Rate", f"{rate:.0%}" if rate is not None else "—")
+        
+        st.markdown("---")
+        
+        # Main tabs
+        tab1, tab4 = st.tabs([
+            "📦 Inventory Management",
+            "📊 Analytics"
+        ])
+        
+        with tab1:
+            col1, col2 = st.columns([2, 1])
+            
+            with col1:
+                st.subheader("Current Inventory")
+                query = f"""
+                SELECT ni.*, si.category 
+                FROM ngo_inventory ni
+                JOIN supply_items si ON ni.item_id = si.item_id
+                WHERE ni.ngo_id = {st.session_state.ngo_id}
+                """
+                items = read_sql(query)
+                
+                st.dataframe(
+                    items,
+                    hide_index=True,
+                    use_container_width=True
+                )
+
+            with col2:
+                st.subheader("Expiring Soon")
+                days = st.slider("Within days", min_value=7, max_value=90, value=30, step=7, key="expiring_days")
+                expiring = db.get_expiring_stock(days, ngo_id=st.session_state.ngo_id)
+                if expiring.empty:
+                    st.success(f"No stock expires in the next {days} days.")
+                else:
+                    st.dataframe(
+                        expiring[['item_name', 'batch_id', 'quantity', 'expiry_date']],
+                        column_config={
+                            "item_name": "Item",
+                            "batch_id": "Batch",
+                            "quantity": "Quantity",
+                            "expiry_date": "Expires"
+                        },
+                        hide_index=True,
+                        use_container_width=True
+                    )
+
+        with tab4:
+            st.subheader("Supply Analytics")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader("Pending Demands by Priority")
+                counts = db.get_demand_counts(by='priority')
+                priority_data = pd.DataFrame({
+                    'Priority': ['Critical', 'High', 'Medium', 'Low'],
+                }).merge(counts[['priority', 'demands']], how='left', left_on='Priority', right_on='priority')
+                priority_data['Count'] = priority_data['demands'].fillna(0).astype(int)
+                st.bar_chart(priority_data.set_index('Priority')[['Count']])
+            
+            with col2:
+                st.subheader("Delivery Status")
+                status_data = pd.DataFrame({
+                    'Status': ['In Transit', 'Delivered'],
+                    'Count': [metrics['pending_deliveries'], metrics['boxes_delivered']]
+                })
+                st.bar_chart(status_data.set_index('Status'))
+
@@ -0,0 +1,200 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+import base64
+from database import InsufficientStock, StockConflict, read_sql
+from qr_payload import PayloadKeyMissing, encode_box_payload, payload_key
+from labels import label_sheet, render_labels
+
+def show(db):
+    # Every box label is signed; check the key before anything is packed
+    try:
+        payload_key()
+    except PayloadKeyMissing as e:
+        st.error(f"❌ Box labels cannot be signed: {e}.")
+        return
+
+    if 'ngo_id' not in st.session_state:
+        st.session_state.ngo_id = None
+        st.session_state.ngo_name = None
+    
+    ngos = db.get_all_ngos()
+    ngo_names = db.get_ngo_names()
+    
+    if ngos.empty:
+        st.warning("⚠️ No NGOs found in the database.")
+        return
+    
+    st.header("Login")
+    selected_ngo = st.selectbox(
+        "Select your NGO",
+        options=ngos['ngo_id'].tolist(),
+        format_func=ngo_names.get,
+        key="addintoinventory_ngo_selectbox"
+    )
+    password = st.text_input("Password", type="password", key="addintoinventory_password_input")
+    
+    if st.button("Login", key="addintoinventory_login_button"):
+        if password:
+            st.session_state.ngo_id = selected_ngo
+            st.session_state.ngo_name = ngo_names[selected_ngo]
+            st.success(f"✅ Logged in as {st.session_state.ngo_name}")
+        else:
+            st.error("❌ Please enter a password")
+    
+    if st.session_state.ngo_id is None:
+        return
+    
+    ngo_id = st.session_state.ngo_id
+    st.title("QR Code Management")
+    st.subheader("Create Supply Box QR Code")
+    
+    inventory_items = read_sql("SELECT * FROM ngo_inventory WHERE ngo_id = %s", (ngo_id,))
+    centers = db.get_all_centers()
+    center_names = db.get_center_names()
+    item_names = db.get_item_names()
+    stock = db.get_ngo_stock(ngo_id)
+    
+    if inventory_items.empty:
+        st.warning("No supply items available in the NGO inventory. Please add items first.")
+        return
+    
+    if centers.empty:
+        st.warning("No centers available. Please add centers first.")
+        return
+    
+    st.write("Add items to the supply box:")
+    box_id = st.text_input("Box ID: ")
+    demand_id = st.text_input("Demand ID(s): ")  # comma separated when the box serves several demands
+    
+    # Lines are chosen by item; the lots are picked first-expiry-first when the box is created
+    box_lines = []
+    for i in range(5):
+        col1, col2 = st.columns(2)
+        with col1:
+            item_id = st.selectbox(
+                f"Item {i+1}",
+                options=list(stock),
+                format_func=lambda x: f"{item_names.get(x)} ({stock[x]} available)",
+                key=f"item_{i}"
+            )
+        
+        with col2:
+            quantity = st.number_input(
+                f"Quantity {i+1}", 
+                min_value=0, 
+                value=0,
+                key=f"qty_{i}"
+            )
+        
+        if item_id and quantity:
+            box_lines.append((item_id, quantity))
+    
+    destination = st.selectbox(
+        "Select Destination Center",
+        options=centers['center_id'].tolist(),
+        format_func=center_names.get,
+        key="destination_selectbox"
+    )
+    priority = st.selectbox("Priority", ["Low", "Medium", "High", "Critical"])
+    
+    if st.button("Create Box"):
+        try:
+            demand_ids = [int(part) for part in demand_id.replace(",", " ").split()]
+        except ValueError:
+            st.error("Demand IDs must be numbers.")
+            return
+        box_items, picked = [], []
+        for item_id, quantity in box_lines:
+            picks = db.pick_fefo(ngo_id, item_id, quantity)
+            if sum(take for _, take, _, _ in picks) < quantity:
+                st.error(f"Not enough unexpired {item_names.get(item_id)} in stock for {quantity} units.")
+                return
+            box_items.extend((inventory_id, take) for inventory_id, take, _, _ in picks)
+            picked.extend((item_id, take, expiry_date, batch_id) for _, take, expiry_date, batch_id in picks)
+        if box_items and demand_ids:
+            try:
+                box_id, qr_code = db.create_box(box_items, destination, priority)
+            except (InsufficientStock, StockConflict) as e:
+                # Another operator packed from the same lots first
+                st.error(f"❌ {e}. Please try again.")
+                return
+            
+            # The code only carries the compact signed box/demand ids; the
+            # human-readable details are printed next to it
+            qr_data = encode_box_payload(box_id, demand_ids)
+            label = f"Box ID: {box_id}\nDemand ID: {', '.join(map(str, demand_ids))}\nDestination: {center_names[destination]}\nPriority: {priority}\nItems:\n"
+            for item_id, take, expiry_date, batch_id in picked:
+                label += f"- {item_names.get(item_id)}: {take} (batch {batch_id or '-'}, expires {expiry_date or '-'})\n"
+
+            png = render_labels([qr_data])[0]
+            img_str = base64.b64encode(png).decode()
+
+            st.success(f"Box ID: {box_id} created successfully! Inventory updated.")
+            st.markdown(f'<img src="data:image/png;base64,{img_str}" width="300">', unsafe_allow_html=True)
+            st.text(label)
+            
+            st.download_button(
+                label="Download QR Code",
+                data=png,
+                file_name=f"box_{box_id}_qr.png",
+                mime="image/png"
+            )
+
+    # Automatic allocation: match pending demands against this NGO's stock,
+    # most urgent first and earliest expiry first, and pack the boxes in one go
+    st.subheader("Automatic Allocation")
+    whole_only = st.checkbox("Only serve demands that can be covered in full", key="allocation_whole_only")
+    if st.button("Plan Allocation"):
+        st.session_state.allocation_plan = db.plan_allocation(
+            ngo_id, usable_from=datetime.now().date(), allow_partial=not whole_only
+        )
+    plan = st.session_state.get("allocation_plan")
+    if plan is not None:
+        stats = plan.stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Pending Demands", f"{stats['demands']:,}")
+        col2.metric("Covered", f"{stats['fulfilled']:,}")
+        col3.metric("Partly Covered", f"{stats['partial']:,}")
+        col4.metric("Units Allocated", f"{stats['units']:,}")
+        boxes = plan.boxes()
+        st.dataframe(pd.DataFrame(
+            [(center_names.get(destination), priority, len(items), sum(qty for _, qty in items), len(demand_ids))
+             for items, destination, priority, demand_ids in boxes],
+            columns=["Destination", "Priority", "Lots", "Units", "Demands"]
+        ), hide_index=True, use_container_width=True)
+        if boxes and st.button("Create Boxes and Labels"):
+            with st.spinner("Packing boxes..."):
+                try:
+                    created = db.apply_allocation(plan)
+                except (InsufficientStock, StockConflict) as e:
+                    st.session_state.allocation_plan = None
+                    st.error(f"❌ {e}. Stock changed since the plan was made; please plan again.")
+                    return
+                pngs = render_labels([encode_box_payload(box_id, demand_ids) for box_id, _, demand_ids in created])
+                sheet = label_sheet([(png, f"Box ID: {box_id}") for png, (box_id, _, _) in zip(pngs, created)])
+            st.session_state.allocation_plan = None
+            st.success(f"{len(created)} boxes packed. Inventory updated.")
+            st.download_button(
+                label="Download Label Sheet (PDF)",
+                data=sheet,
+                file_name=f"allocation_labels_{created[0][0]}_{created[-1][0]}.pdf",
+                mime="application/pdf"
+            )
+
+    # Bulk labels for pre-packing events: boxes are registered in one
+    # transaction and their labels rendered in parallel onto A4 sheets
+    st.subheader("Print Box Labels in Bulk")
+    label_count = st.number_input("Number of labels", min_value=1, max_value=5000, value=21, key="label_count_input")
+    if st.button("Generate Label Sheet"):
+        with st.spinner("Rendering labels..."):
+            boxes = db.generate_qr_codes(int(label_count))
+            pngs = render_labels([encode_box_payload(box_id) for _, box_id in boxes])
+            sheet = label_sheet([(png, f"Box ID: {box_id}") for png, (_, box_id) in zip(pngs, boxes)])
+        st.success(f"{len(boxes)} boxes registered (Box ID {boxes[0][1]} to {boxes[-1][1]}).")
+        st.download_button(
+            label="Download Label Sheet (PDF)",
+            data=sheet,
+            file_name=f"box_labels_{boxes[0][1]}_{boxes[-1][1]}.pdf",
+            mime="application/pdf"
+        )
@@ -0,0 +1,128 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+def show(db):
+    st.title("Flood Center Supply Dashboard")
+    
+    # Get all centers
+    centers = db.get_all_centers()
+    center_names = db.get_center_names()
+    
+    #st.dataframe(centers)
+    # Layout with columns
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        st.subheader("Flood Centers")
+        # Display full centers table
+        
+        
+        # Add filter for center_id without default selection
+        center_filter = st.multiselect(
+            "Filter by center:",
+            options=centers['center_id'].tolist(),
+            format_func=center_names.get
+        )
+        
+        # If filters are selected, show filtered view
+        if center_filter:
+            centers = centers[centers['center_id'].isin(center_filter)]
+        st.dataframe(centers)
+        
+        # Display center info
+        
+    
+    with col2:
+        st.subheader("Supply Demands")
+        selected_center = st.selectbox(
+            "Select a center to view details:",
+            options=centers['center_id'].tolist(),
+            format_func=center_names.get
+        )
+        
+        # Get demands for selected center
+        demands = db.get_center_demands(selected_center)
+        
+        if not demands.empty:
+            # Create a status filter
+            status_filter = st.multiselect(
+                "Filter by status:",
+                options=demands['status'].unique(),
+                default=demands['status'].unique()
+            )
+            
+            filtered_demands = demands[demands['status'].isin(status_filter)]
+            
+            # Display demands as a styled table
+            st.dataframe(
+                filtered_demands,
+                column_config={
+                    "demand_id": "ID",
+                    "name": "Item",
+                    "quantity": "Quantity",
+                    "outstanding_quantity": "Still Needed",
+                    "priority": st.column_config.SelectboxColumn(
+                        "Priority",
+                        help="Supply priority",
+                        width="medium",
+                        options=["Critical", "High", "Medium", "Low"]
+                    ),
+                    "status": st.column_config.SelectboxColumn(
+                        "Status",
+                        width="medium",
+                        options=["Pending", "In Progress", "Fulfilled", "Cancelled"]
+                    ),
+                    "request_date": "Requested On"
+                },
+                use_container_width=True,
+                hide_index=True,
+                height=400
+            )
+        else:
+            st.info("No demands found for this center.")
+    
+    # Analytics section
+    st.subheader("Supply Analytics")
+    
+    # Pending demands counted per priority and per center in SQL
+    priority_counts = db.get_demand_counts(by='priority')
+    
+    if not priority_counts.empty:
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Demands by priority
+            priority_counts = priority_counts[['priority', 'demands']]
+            priority_counts.columns = ['Priority', 'Count']
+            
+            fig = px.pie(
+                priority_counts, 
+                values='Count', 
+                names='Priority',
+                title='Demands by Priority',
+                color='Priority',
+                color_discrete_map={
+                    'Critical': 'red',
+                    'High': 'orange',
+                    'Medium': 'yellow',
+                    'Low': 'green'
+                }
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            # Units still needed per center, from the running totals
+            center_need = db.get_center_need()[['center_name', 'outstanding']]
+            center_need.columns = ['Center', 'Still Needed']
+            
+            fig = px.bar(
+                center_need,
+                x='Center',
+                y='Still Needed',
+                title='Outstanding Need by Center',
+                color='Still Needed',
+                color_continuous_scale='Blues'
+            )
+            st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import hashlib
+import hmac
+import os
+import warnings
+from collections import namedtuple
+
+# Box labels carry a compact signed payload instead of free text:
+#
+#     "BN:" + base45(version | varint box_id | varint count | varint demand_id... | mac)
+#
+# base45 only uses characters from the QR alphanumeric set, so the code is
+# encoded in alphanumeric mode and stays at a low QR version.
+PAYLOAD_PREFIX = "BN:"
+PAYLOAD_VERSION = 1
+MAC_SIZE = 4  # bytes of HMAC-SHA256 kept; enough to reject mistyped or forged labels
+# Public key for local development only, used when QR_PAYLOAD_DEV=1 and no
+# QR_PAYLOAD_KEY is set; anyone can sign labels with it
+DEV_PAYLOAD_KEY = b"bantuannow-dev-key"
+
+BASE45_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+_BASE45_VALUES = {char: value for value, char in enumerate(BASE45_CHARSET)}
+
+BoxPayload = namedtuple("BoxPayload", ["version", "box_id", "demand_ids"])
+
+
+class PayloadKeyMissing(RuntimeError):
+    """No QR_PAYLOAD_KEY is configured, so labels can be neither signed nor verified."""
+
+
+def payload_key():
+    """The label signing key from QR_PAYLOAD_KEY; raises PayloadKeyMissing when it
+    is not set, unless QR_PAYLOAD_DEV=1 allows the public development key."""
+    key = os.getenv("QR_PAYLOAD_KEY")
+    if key:
+        return key.encode()
+    if os.getenv("QR_PAYLOAD_DEV") == "1":
+        warnings.warn("QR_PAYLOAD_KEY is not set; box labels are signed with the public development key",
+                      RuntimeWarning)
+        return DEV_PAYLOAD_KEY
+    raise PayloadKeyMissing("Set QR_PAYLOAD_KEY to sign and verify box labels "
+                            "(or QR_PAYLOAD_DEV=1 to use the development key)")
+
+
+# Base45 (RFC 9285)
+def b45encode(data):
+    chars = []
+    for n in range(0, len(data) - 1, 2):
+        value = data[n] * 256 + data[n + 1]
+        value, c = divmod(value, 45)
+        e, d = divmod(value, 45)
+        chars += (BASE45_CHARSET[c], BASE45_CHARSET[d], BASE45_CHARSET[e])
+    if len(data) % 2:
+        d, c = divmod(data[-1], 45)
+        chars += (BASE45_CHARSET[c], BASE45_CHARSET[d])
+    return "".join(chars)
+
+
+def b45decode(text):
+    try:
+        values = [_BASE45_VALUES[char] for char in text]
+    except KeyError:
+        raise ValueError("Invalid base45 character")
+    if len(values) % 3 == 1:
+        raise ValueError("Invalid base45 length")
+    out = bytearray()
+    for n in range(0, len(values), 3):
+        chunk = values[n:n + 3]
+        if len(chunk) == 3:
+            value = chunk[0] + chunk[1] * 45 + chunk[2] * 45 * 45
+            if value > 0xFFFF:
+                raise ValueError("Invalid base45 chunk")
+            out += bytes(divmod(value, 256))
+        else:
+            value = chunk[0] + chunk[1] * 45
+            if value > 0xFF:
+                raise ValueError("Invalid base45 chunk")
+            out.append(value)
+    return bytes(out)
+
+
+# Unsigned LEB128 varints
+def _put_varint(out, value):
+    if value < 0:
+        raise ValueError("Payload ids must not be negative")
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated payload")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _mac(body, key):
+    return hmac.new(key, body, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def encode_box_payload(box_id, demand_ids=(), key=None):
+    """QR text for a box label: box id plus the demand ids it was packed for."""
+    key = key or payload_key()
+    body = bytearray([PAYLOAD_VERSION])
+    _put_varint(body, box_id)
+    _put_varint(body, len(demand_ids))
+    for demand_id in demand_ids:
+        _put_varint(body, demand_id)
+    return PAYLOAD_PREFIX + b45encode(bytes(body) + _mac(bytes(body), key))
+
+
+def is_box_payload(text):
+    return text.startswith(PAYLOAD_PREFIX)
+
+
+def decode_box_payload(text, key=None):
+    """Parse and verify a label made by encode_box_payload; raises ValueError if it is
+    not one, was made with another key, or was damaged."""
+    if not is_box_payload(text):
+        raise ValueError("Not a box payload")
+    key = key or payload_key()
+    data = b45decode(text[len(PAYLOAD_PREFIX):])
+    body, mac = data[:-MAC_SIZE], data[-MAC_SIZE:]
+    if len(body) < 1 or not hmac.compare_digest(mac, _mac(body, key)):
+        raise ValueError("Box payload checksum mismatch")
+    if body[0] != PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported box payload version {body[0]}")
+    box_id, pos = _get_varint(body, 1)
+    count, pos = _get_varint(body, pos)
+    demand_ids = []
+    for _ in range(count):
+        demand_id, pos = _get_varint(body, pos)
+        demand_ids.append(demand_id)
+    if pos != len(body):
+        raise ValueError("Trailing bytes in box payload")
+    return BoxPayload(body[0], box_id, tuple(demand_ids))
@@ -0,0 +1,259 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOURNAL_PATH = os.getenv("SCAN_JOURNAL_PATH", "scan_journal.sqlite3")
+SYNC_INTERVAL = float(os.getenv("SCAN_SYNC_INTERVAL", "5"))  # seconds between sync attempts
+SYNC_BATCH = int(os.getenv("SCAN_SYNC_BATCH", "500"))  # entries replayed per transaction
+SYNC_MAX_BACKOFF = float(os.getenv("SCAN_SYNC_MAX_BACKOFF", "60"))  # seconds between attempts while MySQL is down
+
+
+class ScanJournal:
+    """Local append-only journal of scans, kept in SQLite so a scan is never lost
+    when MySQL is unreachable.
+
+    Every entry gets a scan_id (uuid) that the MySQL side records when it
+    applies the entry, so replaying an entry twice has no effect. Entries that
+    MySQL rejects are marked failed and kept for inspection instead of being
+    replayed forever.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            # WAL keeps appends cheap while the sync worker reads
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS scan_journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id TEXT NOT NULL UNIQUE,
+                entry TEXT NOT NULL,
+                recorded_at REAL NOT NULL,
+                synced_at REAL,
+                failed_at REAL,
+                error TEXT
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scan_journal)")}
+        for column, kind in (("failed_at", "REAL"), ("error", "TEXT")):
+            if column not in columns:
+                # Journals written before failed entries were set aside
+                self._conn.execute(f"ALTER TABLE scan_journal ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_unsynced ON scan_journal (synced_at, seq)")
+
+    def record(self, qr_type, qr_data, center_id=None, received_by=None):
+        """Append one scan and return its scan_id."""
+        return self.record_batch([(qr_type, qr_data)], center_id, received_by)[0]
+
+    def record_batch(self, scans, center_id=None, received_by=None):
+        """Append (qr_type, qr_data) scans received together; returns their scan_ids."""
+        now = self.clock()
+        rows = []
+        for qr_type, qr_data in scans:
+            entry = {"scan_id": str(uuid.uuid4()), "qr_type": qr_type, "qr_data": qr_data,
+                     "center_id": center_id, "received_by": received_by, "recorded_at": now}
+            rows.append((entry["scan_id"], json.dumps(entry), now))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO scan_journal (scan_id, entry, recorded_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+        return [row[0] for row in rows]
+
+    def pending(self, limit=SYNC_BATCH):
+        """Oldest entries neither synced nor failed, as dicts."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry FROM scan_journal WHERE synced_at IS NULL AND failed_at IS NULL ORDER BY seq LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def mark_synced(self, scan_ids):
+        if not scan_ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE scan_journal SET synced_at = ? WHERE scan_id = ?",
+                [(self.clock(), scan_id) for scan_id in scan_ids]
+            )
+            self._conn.execute("COMMIT")
+
+    def mark_failed(self, scan_id, error):
+        """Set an entry aside so it no longer holds up the entries after it."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE scan_journal SET failed_at = ?, error = ? WHERE scan_id = ?", (self.clock(), error, scan_id)
+            )
+
+    def failed(self):
+        """Entries set aside by mark_failed, as (entry, error), oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry, error FROM scan_journal WHERE failed_at IS NOT NULL ORDER BY seq"
+            ).fetchall()
+        return [(json.loads(entry), error) for entry, error in rows]
+
+    def backlog(self):
+        """(number of entries waiting to sync, recorded_at of the oldest one or None)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*), MIN(recorded_at) FROM scan_journal WHERE synced_at IS NULL AND failed_at IS NULL"
+            ).fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def is_entry_error(e):
+    """True for errors caused by an entry itself, which no retry can fix."""
+    return isinstance(e, (KeyError, TypeError, ValueError))
+
+
+class JournalSync:
+    """Replays the journal to MySQL in bulk.
+
+    `apply(entries)` must write a batch of entries in one transaction, skipping
+    scan_ids it has applied before, and raise if MySQL is unreachable. A
+    background thread retries with backoff until the backlog is empty;
+    sync_now() drains it on demand.
+
+    Errors for which `is_data_error(e)` is true (a rejected entry rather than
+    an outage) are not retried: the batch is replayed one entry at a time and
+    the entries that still fail are marked failed in the journal.
+    """
+
+    def __init__(self, journal, apply, interval=SYNC_INTERVAL, batch_size=SYNC_BATCH,
+                 max_backoff=SYNC_MAX_BACKOFF, clock=time.time, is_data_error=is_entry_error):
+        self.journal = journal
+        self.apply = apply
+        self.is_data_error = is_data_error
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._thread = None
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self._sync_lock = threading.Lock()
+        self._stats = {"synced": 0, "batches": 0, "failures": 0, "rejected": 0, "last_sync": None,
+                       "last_error": None}
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="scan-journal-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sync_now(self):
+        """Replay every unsynced entry; returns the results of `apply` per batch.
+
+        Raises the error of a batch that failed for any reason but bad data
+        (entries stay in the journal)."""
+        results = []
+        with self._sync_lock:
+            while True:
+                entries = self.journal.pending(self.batch_size)
+                if not entries:
+                    return results
+                try:
+                    results.append(self._apply(entries))
+                except Exception as e:
+                    if not self.is_data_error(e):
+                        raise
+                    if len(entries) == 1:
+                        continue
+                    # Find the bad entries so the good ones still get through
+                    for entry in entries:
+                        try:
+                            results.append(self._apply([entry]))
+                        except Exception as e:
+                            if not self.is_data_error(e):
+                                raise
+
+    def _apply(self, entries):
+        try:
+            result = self.apply(entries)
+        except Exception as e:
+            self._stats["last_error"] = str(e)
+            if not self.is_data_error(e):
+                self._stats["failures"] += 1
+            elif len(entries) == 1:
+                self.journal.mark_failed(entries[0]["scan_id"], str(e))
+                self._stats["rejected"] += 1
+            raise
+        self.journal.mark_synced([entry["scan_id"] for entry in entries])
+        self._stats["synced"] += len(entries)
+        self._stats["batches"] += 1
+        self._stats["last_sync"] = self.clock()
+        self._stats["last_error"] = None
+        return result
+
+    def notify(self):
+        """Wake the worker, e.g. right after recording a scan."""
+        self._wake.set()
+
+    def stats(self):
+        stats = dict(self._stats)
+        backlog, oldest = self.journal.backlog()
+        stats["backlog"] = backlog
+        stats["lag"] = self.clock() - oldest if oldest is not None else 0.0
+        return stats
+
+    def _run(self):
+        delay = self.interval
+        while not self._stopping.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stopping.is_set():
+                return
+            try:
+                self.sync_now()
+                delay = self.interval
+            except Exception:
+                # MySQL still down; back off until it returns
+                delay = min(max(delay, self.interval) * 2, self.max_backoff)
+
+
+_journal = None
+_sync = None
+_journal_lock = threading.Lock()
+
+
+def get_scan_journal():
+    """Return the process-wide scan journal."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = ScanJournal()
+    return _journal
+
+
+def get_journal_sync(apply, is_data_error=is_entry_error):
+    """Return the process-wide sync worker, starting it on first use."""
+    global _sync
+    if _sync is None:
+        journal = get_scan_journal()
+        with _journal_lock:
+            if _sync is None:
+                _sync = JournalSync(journal, apply, is_data_error=is_data_error).start()
+    return _sync
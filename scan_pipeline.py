@@ -0,0 +1,369 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+
+FRAME_BUFFER_SIZE = int(os.getenv("SCAN_FRAME_BUFFER", "4"))  # frames waiting for a decoder
+DECODE_WORKERS = int(os.getenv("SCAN_DECODE_WORKERS", "2"))
+SMART_DECODE = os.getenv("SCAN_SMART_DECODE", "1") != "0"
+QR_ONLY = os.getenv("SCAN_QR_ONLY", "1") != "0"  # skip the 1D barcode decoders
+DIFF_THRESHOLD = float(os.getenv("SCAN_DIFF_THRESHOLD", "2.0"))  # mean grey-level change that counts as a new frame
+MAX_SKIP = int(os.getenv("SCAN_MAX_SKIP", "5"))  # decode anyway after this many skipped frames
+MAX_WIDTH = int(os.getenv("SCAN_MAX_WIDTH", "640"))  # wider frames are downscaled before a full-frame decode
+DEDUP_TTL = float(os.getenv("SCAN_DEDUP_TTL", "30"))  # seconds a code is ignored after it was reported
+DEDUP_SIZE = int(os.getenv("SCAN_DEDUP_SIZE", "1024"))  # codes remembered at most
+
+ScanResult = namedtuple("ScanResult", ["data", "type", "frame_id", "captured_at", "latency"])
+
+
+def pyzbar_decoder(frame):
+    """Decode every QR/barcode in a frame into (data, type) pairs."""
+    from pyzbar.pyzbar import decode
+    return [(code.data.decode('utf-8'), code.type) for code in decode(frame)]
+
+
+def pyzbar_locate(gray, qr_only=QR_ONLY):
+    """Decode a greyscale image into (data, type, (left, top, width, height)) tuples."""
+    from pyzbar.pyzbar import ZBarSymbol, decode
+    symbols = [ZBarSymbol.QRCODE] if qr_only else None
+    return [(code.data.decode('utf-8'), code.type, tuple(code.rect)) for code in decode(gray, symbols=symbols)]
+
+
+def to_gray(frame):
+    """BGR (or already greyscale) uint8 frame -> greyscale uint8 array."""
+    frame = np.asarray(frame)
+    if frame.ndim == 2:
+        return frame
+    # ITU-R BT.601 luma weights in 8-bit fixed point, BGR channel order
+    b, g, r = (frame[..., n].astype(np.uint16) for n in range(3))
+    return ((b * 29 + g * 150 + r * 77) >> 8).astype(np.uint8)
+
+
+class SmartDecoder:
+    """Decode stage that avoids full-frame decodes where it can.
+
+    Each frame is converted to greyscale once. Frames whose thumbnail barely
+    differs from the last decoded frame are skipped (but never more than
+    `max_skip` in a row). The region where a code was last found is decoded
+    first; only when that misses is the whole frame decoded, downscaled so it
+    is at most `max_width` wide, or further when the last code seen was large.
+    """
+
+    def __init__(self, locate=pyzbar_locate, diff_threshold=DIFF_THRESHOLD, max_skip=MAX_SKIP,
+                 max_width=MAX_WIDTH, roi_margin=0.5, min_code_px=80):
+        self.locate = locate
+        self.diff_threshold = diff_threshold
+        self.max_skip = max_skip
+        self.max_width = max_width
+        self.roi_margin = roi_margin
+        self.min_code_px = min_code_px
+        self._thumb = None
+        self._skipped = 0
+        self._roi = None
+        self._code_px = None
+        self._lock = threading.Lock()
+        self._stats = {"frames": 0, "skipped": 0, "roi_decodes": 0, "roi_hits": 0,
+                       "full_decodes": 0, "hits": 0}
+
+    def __call__(self, frame):
+        gray = to_gray(frame)
+        thumb = gray[::16, ::16].astype(np.int16)
+        with self._lock:
+            self._stats["frames"] += 1
+            if (self._thumb is not None and self._thumb.shape == thumb.shape and self._skipped < self.max_skip
+                    and np.abs(thumb - self._thumb).mean() < self.diff_threshold):
+                self._skipped += 1
+                self._stats["skipped"] += 1
+                return []
+            self._thumb = thumb
+            self._skipped = 0
+            roi = self._roi
+            step = self._full_frame_step(gray.shape[1])
+
+        found = []
+        if roi is not None:
+            left, top, right, bottom = roi
+            found = self._locate(gray[top:bottom, left:right], left, top, 1)
+            self._count("roi_decodes")
+            if found:
+                self._count("roi_hits")
+        if not found:
+            found = self._locate(gray[::step, ::step], 0, 0, step)
+            self._count("full_decodes")
+
+        with self._lock:
+            if found:
+                self._stats["hits"] += 1
+                self._roi = self._region(found, gray.shape)
+                self._code_px = min(rect[2] for _, _, rect in found)
+            else:
+                self._roi = None
+                self._code_px = None
+        return [(data, code_type) for data, code_type, _ in found]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        decoded = stats["frames"] - stats["skipped"]
+        stats["hit_rate"] = stats["hits"] / decoded if decoded else 0.0
+        return stats
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _full_frame_step(self, width):
+        step = max(1, -(-width // self.max_width))
+        if self._code_px:
+            # A big code survives more downscaling
+            step = max(step, self._code_px // self.min_code_px)
+        return step
+
+    def _locate(self, image, left, top, step):
+        # Map rectangles found in a crop/downscaled image back to frame coordinates
+        return [(data, code_type, (left + x * step, top + y * step, w * step, h * step))
+                for data, code_type, (x, y, w, h) in self.locate(image)]
+
+    def _region(self, found, shape):
+        height, width = shape[:2]
+        left = min(rect[0] for _, _, rect in found)
+        top = min(rect[1] for _, _, rect in found)
+        right = max(rect[0] + rect[2] for _, _, rect in found)
+        bottom = max(rect[1] + rect[3] for _, _, rect in found)
+        margin_x = int((right - left) * self.roi_margin)
+        margin_y = int((bottom - top) * self.roi_margin)
+        return (max(0, left - margin_x), max(0, top - margin_y),
+                min(width, right + margin_x), min(height, bottom + margin_y))
+
+
+class ScanDeduper:
+    """Remembers recently reported codes so a box held in front of the camera
+    is reported once, not once per frame.
+
+    A code seen again within `ttl` seconds is a duplicate; the window is not
+    extended by duplicates. At most `max_size` codes are kept (oldest first out).
+    """
+
+    def __init__(self, ttl=DEDUP_TTL, max_size=DEDUP_SIZE, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.suppressed = 0
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_new(self, data):
+        """True the first time `data` is seen within the window, False for duplicates."""
+        now = self.clock()
+        with self._lock:
+            seen_at = self._seen.get(data)
+            if seen_at is not None and now - seen_at < self.ttl:
+                self.suppressed += 1
+                return False
+            self._seen.pop(data, None)
+            self._seen[data] = now
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+            return True
+
+    def forget(self, data):
+        """Allow `data` to be reported again straight away, e.g. after a failed write."""
+        with self._lock:
+            self._seen.pop(data, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._seen)
+
+
+class FrameBuffer:
+    """Bounded ring buffer between the capture thread and the decoders.
+
+    When it is full the oldest frame is dropped, so decoders always work on
+    the most recent frames instead of falling further behind the camera.
+    """
+
+    def __init__(self, size=FRAME_BUFFER_SIZE):
+        self.size = size
+        self.dropped = 0
+        self._frames = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._frames) >= self.size:
+                self._frames.popleft()
+                self.dropped += 1
+            self._frames.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest buffered frame, or None if nothing arrived within `timeout`."""
+        with self._cond:
+            if not self._frames:
+                self._cond.wait(timeout)
+            return self._frames.popleft() if self._frames else None
+
+    def __len__(self):
+        with self._cond:
+            return len(self._frames)
+
+
+class SyntheticSource:
+    """cv2.VideoCapture stand-in that plays back a list of frames.
+
+    `fps` paces read() like a real camera; the source reports a failed read
+    once the frames run out (unless `loop` is set).
+    """
+
+    def __init__(self, frames, fps=None, loop=False):
+        self.frames = list(frames)
+        self.fps = fps
+        self.loop = loop
+        self._position = 0
+        self._last_read = None
+
+    def read(self):
+        if self.fps:
+            now = time.monotonic()
+            if self._last_read is not None:
+                delay = 1.0 / self.fps - (now - self._last_read)
+                if delay > 0:
+                    time.sleep(delay)
+            self._last_read = time.monotonic()
+        if self._position >= len(self.frames):
+            if not self.loop or not self.frames:
+                return False, None
+            self._position = 0
+        frame = self.frames[self._position]
+        self._position += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class ScanPipeline:
+    """Camera -> decoder pool -> result queue, off the Streamlit thread.
+
+    A capture thread reads frames from `source` (anything with the
+    cv2.VideoCapture read()/release() API) into a FrameBuffer, `workers`
+    decoder threads run `decoder` on them, and the UI consumes ScanResults
+    with next_result() while showing `latest_frame` as the preview. The
+    default decoder is a SmartDecoder (plain pyzbar with SCAN_SMART_DECODE=0).
+    Repeated detections of a code are dropped by `dedup`; pass a ScanDeduper
+    kept in the session to carry the window across scanning runs.
+    """
+
+    def __init__(self, source, decoder=None, workers=DECODE_WORKERS,
+                 buffer_size=FRAME_BUFFER_SIZE, dedup=None, clock=time.monotonic):
+        self.source = source
+        if decoder is None:
+            decoder = SmartDecoder() if SMART_DECODE else pyzbar_decoder
+        self.decoder = decoder
+        self.dedup = dedup if dedup is not None else ScanDeduper(clock=clock)
+        self.workers = workers
+        self.clock = clock
+        self.buffer = FrameBuffer(buffer_size)
+        self.results = queue.Queue()
+        self.latest_frame = None
+        self._threads = []
+        self._stopping = threading.Event()
+        self._captured_all = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"captured": 0, "decoded": 0, "results": 0, "read_errors": 0, "decode_errors": 0,
+                       "decode_time_total": 0.0, "decode_time_max": 0.0, "latency_max": 0.0}
+
+    def start(self):
+        if self._threads:
+            return self
+        self._stopping.clear()
+        self._captured_all.clear()
+        threads = [threading.Thread(target=self._capture, name="scan-capture", daemon=True)]
+        threads += [threading.Thread(target=self._decode, name=f"scan-decoder-{n}", daemon=True)
+                    for n in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self._threads = threads
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    @property
+    def running(self):
+        """True while frames are still being captured or decoded."""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def next_result(self, timeout=None):
+        """Next decoded code, or None if none arrived within `timeout`."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["dropped"] = self.buffer.dropped
+        stats["duplicates"] = self.dedup.suppressed
+        stats["buffered"] = len(self.buffer)
+        stats["decode_time_avg"] = (
+            stats["decode_time_total"] / stats["decoded"] if stats["decoded"] else 0.0
+        )
+        if hasattr(self.decoder, "stats"):
+            stats["decoder"] = self.decoder.stats()
+        return stats
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _capture(self):
+        frame_id = 0
+        try:
+            while not self._stopping.is_set():
+                success, frame = self.source.read()
+                if not success:
+                    # Camera unplugged or synthetic source exhausted
+                    self._count("read_errors")
+                    break
+                frame_id += 1
+                self.latest_frame = frame
+                self.buffer.put((frame_id, self.clock(), frame))
+                self._count("captured")
+        finally:
+            self._captured_all.set()
+
+    def _decode(self):
+        while True:
+            item = self.buffer.get(timeout=0.1)
+            if item is None:
+                if self._stopping.is_set() or self._captured_all.is_set():
+                    return
+                continue
+            frame_id, captured_at, frame = item
+            start = self.clock()
+            try:
+                codes = self.decoder(frame)
+            except Exception:
+                self._count("decode_errors")
+                continue
+            finished = self.clock()
+            with self._lock:
+                self._stats["decoded"] += 1
+                self._stats["decode_time_total"] += finished - start
+                self._stats["decode_time_max"] = max(self._stats["decode_time_max"], finished - start)
+                if codes:
+                    self._stats["results"] += len(codes)
+                    self._stats["latency_max"] = max(self._stats["latency_max"], finished - captured_at)
+            for data, code_type in codes:
+                if not self.dedup.is_new(data):
+                    continue
+                self.results.put(ScanResult(data, code_type, frame_id, captured_at, finished - captured_at))
@@ -1,56 +1,31 @@
-import mysql.connector
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from database import (SUPPLY_TYPES, Database, get_connection, cached_read_sql, cached_lookup, execute_write,
+                      invalidate_tables)
 
-# Get database credentials from environment variables
-mysql_user = os.getenv("MYSQL_USER")
-mysql_password = os.getenv("MYSQL_PASSWORD")
-
-# Database connection using mysql.connector
+# Database connection through the shared connection pool. The dashboard only
+# reads aggregates; the GROUP BY runs in MySQL and results are cached per filter
 try:
-    conn = mysql.connector.connect(
-        host="localhost",  # Change if different in DBeaver
-        user=mysql_user,
-        password=mysql_password,
-        database="bantuannow",
-        port="3306"  # MySQL default port
-    )
-    cursor = conn.cursor()
-    query = "SELECT * FROM flood_centres"
-    cursor.execute(query)
-    df = pd.DataFrame(cursor.fetchall(), columns=[desc[0] for desc in cursor.description])
-    cursor.close()
-    conn.close()
+    db = Database()
+    states = db.get_states()
 except Exception as e:
     st.error(f"Database connection error: {e}")
-
-# Standardize column names
-df.columns = df.columns.str.lower()
-
-# Basic data validation
-required_columns = ['centre_name', 'state', 'clothes', 'food', 'medicine_kit', 'mineral_water']
-missing_columns = [col for col in required_columns if col not in df.columns]
-
-if missing_columns:
-    st.warning(f"Missing columns: {missing_columns}")
+    st.stop()
 
 st.set_page_config(layout="wide")  # Make the dashboard full-width
 st.title("Flood Centres Supply Management Dashboard")
 
-if df is None:
-    st.error("Unable to load flood centres data.")
-
 # Sidebar for filters
 with st.sidebar:
     st.header("Dashboard Filters")
     
-    states = ["All States"] + sorted(list(df["state"].unique()))
+    states = ["All States"] + states
     selected_state = st.selectbox("Filter by State", states)
     
-    supply_types = ['clothes', 'food', 'medicine_kit', 'mineral_water']
+    supply_types = list(SUPPLY_TYPES)
     selected_supplies = st.multiselect(
         "Select Supply Types to Analyze", 
         supply_types, 
@@ -58,7 +33,9 @@ with st.sidebar:
     )
 
 # Apply state filter
-filtered_df = df if selected_state == "All States" else df[df["state"] == selected_state]
+state_filter = None if selected_state == "All States" else selected_state
+totals = db.get_supply_totals(state_filter, selected_supplies)
+total_supplies = sum(totals[name] for name in selected_supplies)
 
 # Quick insights at the top
 st.subheader("Quick Insights")
@@ -67,21 +44,21 @@ metrics_col1, metrics_col2, metrics_col3 = st.columns(3)
 with metrics_col1:
     st.metric(
         "Total Centres", 
-        filtered_df.shape[0], 
+        totals['centres'], 
         help="Number of flood centres in selected state/all states"
     )
 
 with metrics_col2:
     st.metric(
         "Total Supplies", 
-        filtered_df[selected_supplies].sum().sum(), 
+        total_supplies, 
         help="Total quantity of selected supply types"
     )
 
 with metrics_col3:
     st.metric(
         "Average Supplies per Centre",
-        round(filtered_df[selected_supplies].sum().sum() / filtered_df.shape[0], 2),
+        round(total_supplies / totals['centres'], 2) if totals['centres'] else 0,
         help="Average quantity of supplies per centre"
     )
 
@@ -94,10 +71,11 @@ with tab1:
     
     with col1:
         st.subheader("Flood Centres Supply Overview")
+        centre_summary = db.get_centre_supply_summary(state_filter, selected_supplies)
         # Style the dataframe
-        table_height = min(400, 35 + len(filtered_df) * 35)
+        table_height = min(400, 35 + len(centre_summary) * 35)
         st.dataframe(
-            filtered_df,
+            centre_summary,
             use_container_width=True,
             height=table_height,
             hide_index=True,
@@ -105,10 +83,9 @@ with tab1:
     
     with col2:
         st.subheader("Supply Distribution")
-        supply_totals = filtered_df[selected_supplies].sum()
         fig_pie = px.pie(
-            names=supply_totals.index,
-            values=supply_totals.values,
+            names=selected_supplies,
+            values=[totals[name] for name in selected_supplies],
             hole=0.4,  # Make it a donut chart
             color_discrete_sequence=px.colors.qualitative.Set3
         )
@@ -120,35 +97,64 @@ with tab1:
         st.plotly_chart(fig_pie, use_container_width=True)
     
     # Add line graph under the pie chart and table
-    st.subheader("Supply Trends Over Time")
-    # Assuming you have a 'date' column in your dataframe for the line graph
-    if 'date' in df.columns:
+    st.subheader("Demand Trends Over Time")
+    bucket = st.radio("Group by", ["day", "week", "month"], horizontal=True)
+    trend = db.get_demand_trend(bucket)
+    if not trend.empty:
         fig_line = px.line(
-            df,
-            x='date',
-            y=selected_supplies,
-            title='Supply Trends Over Time',
+            trend,
+            x='period',
+            y='quantity',
+            color='priority',
+            title='Requested Quantity Over Time',
             color_discrete_sequence=px.colors.qualitative.Set3
         )
         fig_line.update_layout(
             xaxis_title="Date",
             yaxis_title="Quantity",
-            legend_title="Supply Type",
+            legend_title="Priority",
             showlegend=True,
             legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
         )
         st.plotly_chart(fig_line, use_container_width=True)
     else:
-        st.warning("No 'date' column found in the data for the line graph.")
+        st.warning("No demand history available for the line graph.")
+
+    st.subheader("Supply Levels Over Time")
+    days = st.select_slider("Range (days)", options=[1, 7, 30, 90, 365], value=30)
+    # Start at midnight so reruns within the day hit the query cache
+    since = datetime.combine(datetime.now().date(), datetime.min.time()) - timedelta(days=days - 1)
+    history = db.get_supply_history(since)
+    if not history.empty:
+        fig_levels = px.line(
+            history,
+            x='period',
+            y='level',
+            color='item',
+            title='NGO Inventory Level by Item',
+            color_discrete_sequence=px.colors.qualitative.Set3
+        )
+        fig_levels.update_layout(
+            xaxis_title="Date",
+            yaxis_title="Quantity in Stock",
+            legend_title="Item",
+            showlegend=True,
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        st.plotly_chart(fig_levels, use_container_width=True)
+    else:
+        st.warning("No supply history recorded for this range yet.")
 
 with tab2:
     st.subheader("Detailed Supply Breakdown by Centre")
+    # Only the largest centres are charted; the full list is in the overview table
+    top_centres = db.get_centre_supply_summary(state_filter, selected_supplies, limit=50)
     # Create a more detailed bar chart
     fig_bar = px.bar(
-        filtered_df,
+        top_centres,
         x='centre_name',
         y=selected_supplies,
-        title='Supply Quantities by Flood Centre',
+        title='Supply Quantities by Flood Centre (top 50)',
         barmode='group',
         color_discrete_sequence=px.colors.qualitative.Set3,
         height=500
@@ -168,6 +174,15 @@ with tab2:
     fig_bar.update_xaxes(tickangle=45)
     
     st.plotly_chart(fig_bar, use_container_width=True)
+    
+    if state_filter is None:
+        st.subheader("Supplies by State")
+        by_state = db.get_supply_totals_by_state(selected_supplies)
+        st.plotly_chart(
+            px.bar(by_state, x='state', y=selected_supplies, barmode='stack',
+                   color_discrete_sequence=px.colors.qualitative.Set3),
+            use_container_width=True
+        )
 
 with tab3:
     st.subheader("Add New Flood Centre")
@@ -183,23 +198,12 @@ with tab3:
         
         if submit:
             try:
-                conn = mysql.connector.connect(
-                    host="localhost",  # Change if different in DBeaver
-                    user=mysql_user,
-                    password=mysql_password,
-                    database="bantuannow",
-                    port="3306"  # MySQL default port
-                )
-                cursor = conn.cursor()
                 query = """
                 INSERT INTO flood_centers2 (name, location, contact_person, phone, email)
                 VALUES (%s, %s, %s, %s, %s)
                 """
                 values = (centre_name, location, contact_person, phone, email)
-                cursor.execute(query, values)
-                conn.commit()
-                cursor.close()
-                conn.close()
+                execute_write(query, values, invalidates=("flood_centers2",))
                 st.success("New flood centre added successfully!")
             except Exception as e:
                 st.error(f"Failed to add new flood centre: {e}")
@@ -208,19 +212,8 @@ with tab4:
     st.subheader("Manage Flood Centres")
     st.write("Select a row to delete from the table below:")
     try:
-        conn = mysql.connector.connect(
-            host="localhost",  # Change if different in DBeaver
-            user=mysql_user,
-            password=mysql_password,
-            database="bantuannow",
-            port="3306"  # MySQL default port
-        )
-        cursor = conn.cursor()
         query = "SELECT * FROM flood_centers2"
-        cursor.execute(query)
-        df = pd.DataFrame(cursor.fetchall(), columns=[desc[0] for desc in cursor.description])
-        cursor.close()
-        conn.close()
+        df = cached_read_sql(query, tables=("flood_centers2",))
     except Exception as e:
         st.error(f"Database connection error: {e}")
         st.subheader("Manage Flood Centres")
@@ -232,21 +225,15 @@ with tab4:
         if selected_rows:
             if st.button("Delete Selected Rows"):
                 try:
-                    conn = mysql.connector.connect(
-                        host="localhost",  # Change if different in DBeaver
-                        user=mysql_user,
-                        password=mysql_password,
-                        database="bantuannow",
-                        port="3306"  # MySQL default port
-                    )
-                    cursor = conn.cursor()
-                    for row in selected_rows:
-                        centre_id = int(df.loc[row, 'center_id'])
-                        query = "DELETE FROM flood_centers2 WHERE center_id = %s"
-                        cursor.execute(query, (centre_id,))
-                    conn.commit()
-                    cursor.close()
-                    conn.close()
+                    with get_connection() as conn:
+                        cursor = conn.cursor()
+                        for row in selected_rows:
+                            centre_id = int(df.loc[row, 'center_id'])
+                            query = "DELETE FROM flood_centers2 WHERE center_id = %s"
+                            cursor.execute(query, (centre_id,))
+                        conn.commit()
+                        cursor.close()
+                    invalidate_tables("flood_centers2")
                     st.success("Selected rows deleted successfully!")
                 except Exception as e:
                     st.error(f"Failed to delete selected rows: {e}")
@@ -268,23 +255,12 @@ with tab5:
         
         if submit:
             try:
-                conn = mysql.connector.connect(
-                    host="localhost",  # Change if different in DBeaver
-                    user=mysql_user,
-                    password=mysql_password,
-                    database="bantuannow",
-                    port="3306"  # MySQL default port
-                )
-                cursor = conn.cursor()
                 query = """
                 INSERT INTO supply_items (name, category, unit)
                 VALUES (%s, %s, %s)
                 """
                 values = (item_name, category, unit)
-                cursor.execute(query, values)
-                conn.commit()
-                cursor.close()
-                conn.close()
+                execute_write(query, values, invalidates=("supply_items",))
                 st.success("New supply item added successfully!")
             except Exception as e:
                 st.error(f"Failed to add new supply item: {e}")
@@ -293,24 +269,17 @@ with tab6:
     st.subheader("Add New Items")
     with st.form("add_supplies_form"):
         try:
-            conn = mysql.connector.connect(
-                host="localhost",
-                user=mysql_user,
-                password=mysql_password,
-                database="bantuannow",
-                port="3306"
-            )
-            items = pd.read_sql_query("SELECT * FROM supply_items", conn)
-            conn.close()
+            item_names = cached_lookup("SELECT item_id, name FROM supply_items", "item_id", "name",
+                                       tables=("supply_items",))
         except Exception as e:
             st.error(f"Database connection error: {e}")
-            items = pd.DataFrame(columns=['item_id', 'name'])
+            item_names = {}
 
         ngo_id = st.number_input("NGO ID", min_value=1, value=1)
         item_id = st.selectbox(
             "Item Type",
-            options=items['item_id'].tolist(),
-            format_func=lambda x: items[items['item_id'] == x]['name'].iloc[0]
+            options=list(item_names),
+            format_func=item_names.get
         )
         quantity = st.number_input("Quantity", min_value=1, value=10)
         batch_id = st.text_input("Batch ID")
@@ -322,26 +291,8 @@ with tab6:
     if submitted:
         if all([item_id, quantity, expiry_date]):
             try:
-                conn = mysql.connector.connect(
-                    host="localhost",
-                    user=mysql_user,
-                    password=mysql_password,
-                    database="bantuannow",
-                    port="3306"
-                )
-                cursor = conn.cursor()
-
-                # Insert query
-                query = """
-                INSERT INTO ngo_inventory (ngo_id, item_id, quantity, expiry_date, batch_id, source, notes, last_updated)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                values = (ngo_id, item_id, quantity, expiry_date, batch_id, source, notes, datetime.now())
-                
-                cursor.execute(query, values)
-                conn.commit()
-                cursor.close()
-                conn.close()
+                # Through the Database so summaries and supply history are updated too
+                db.insert_ngoinventory(ngo_id, item_id, quantity, expiry_date, batch_id, source, notes)
 
                 st.success("✅ Items added successfully!")
             except Exception as e:
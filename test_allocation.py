@@ -0,0 +1,49 @@
+from datetime import date, datetime
+from allocation import Demand, Lot, allocate
+
+
+def demand(demand_id, item_id=1, quantity=10, priority="Low", center_id=1, day=1):
+    return Demand(demand_id, center_id, item_id, quantity, priority, datetime(2024, 1, day))
+
+
+def test_serves_priority_then_age():
+    demands = [demand(1, day=1), demand(2, priority="Critical", day=3), demand(3, priority="Critical", day=2)]
+    plan = allocate(demands, [Lot(100, 1, 1, 20, None)])
+    assert plan.fulfilled() == [2, 3]
+    assert plan.shortfall == {1: 10}
+
+
+def test_uses_earliest_expiry_and_skips_expired_lots():
+    lots = [Lot(100, 1, 1, 10, None), Lot(101, 1, 1, 10, date(2024, 3, 1)),
+            Lot(102, 1, 1, 10, date(2024, 2, 1)), Lot(103, 1, 1, 10, date(2023, 12, 1))]
+    plan = allocate([demand(1, quantity=15)], lots, usable_from=date(2024, 1, 15))
+    assert [(line.inventory_id, line.quantity) for line in plan.lines] == [(102, 10), (101, 5)]
+
+
+def test_prefers_nearby_ngos():
+    lots = [Lot(100, 1, 1, 10, date(2024, 2, 1)), Lot(200, 2, 1, 10, date(2024, 6, 1))]
+    plan = allocate([demand(1, center_id=7, quantity=12)], lots, nearby={7: [2]})
+    assert [(line.ngo_id, line.quantity) for line in plan.lines] == [(2, 10), (1, 2)]
+
+
+def test_partial_and_whole_only():
+    demands = [demand(1, quantity=30, priority="High"), demand(2, quantity=5)]
+    lots = [Lot(100, 1, 1, 20, None)]
+
+    plan = allocate(demands, lots)
+    assert plan.shortfall == {1: 10, 2: 5}
+    assert plan.stats()["partial"] == 1 and plan.stats()["unfilled"] == 1
+
+    plan = allocate(demands, lots, allow_partial=False)
+    assert plan.shortfall == {1: 30}
+    assert plan.fulfilled() == [2]
+
+
+def test_boxes_group_by_ngo_and_center():
+    demands = [demand(1, quantity=5, priority="Critical"), demand(2, quantity=5), demand(3, center_id=2, quantity=5)]
+    lots = [Lot(100, 1, 1, 8, None), Lot(200, 2, 1, 10, None)]
+    assert allocate(demands, lots).boxes() == [
+        ([(100, 8)], 1, "Critical", {1: 5, 2: 3}),
+        ([(200, 2)], 1, "Low", {2: 2}),
+        ([(200, 5)], 2, "Low", {3: 5}),
+    ]
@@ -1,11 +1,22 @@
 import os
-from database import Database
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from database import (HISTORY_TABLES, SUMMARY_TABLES, Database, InsufficientStock, PendingDemandView, QueryCache,
+                      RowSet, StockConflict, check_query_plans, check_summaries, execute_write, fulfil_box,
+                      get_cache_stats, get_stock_stats, history_end, history_resolution, invalidate_tables,
+                      parse_box_label, read_rows, rebuild_donation_tracking, retry_on_conflict, run_migrations,
+                      sweep_expired_stock, take_stock)
+from qr_payload import PayloadKeyMissing, encode_box_payload
 
 # Set environment variables for database credentials
 mysql_user = os.getenv("MYSQL_USER")
 mysql_password = os.getenv("MYSQL_PASSWORD")
 os.environ["MYSQL_HOST"] = "localhost"
 os.environ["MYSQL_DB"] = "bantuannow"
+os.environ.setdefault("QR_PAYLOAD_KEY", "test-key")
 
 def test_insert_and_show():
     # Initialize the database connection
@@ -45,5 +56,379 @@ def test_insert_and_show():
     # Close the database connection
     db.close()
 
+def test_reference_cache():
+    db = Database()
+
+    # The second read of a reference table is served from the cache
+    invalidate_tables("flood_centers2")
+    before = get_cache_stats()
+    db.get_all_centers()
+    db.get_all_centers()
+    after = get_cache_stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+    # A write to the table drops the cached result
+    center_id = execute_write("INSERT INTO flood_centers2 (name) VALUES (%s)", ("Cache Test Center",),
+                              invalidates=("flood_centers2",))
+    try:
+        db.get_all_centers()
+        assert get_cache_stats()["misses"] == after["misses"] + 1
+    finally:
+        execute_write("DELETE FROM flood_centers2 WHERE center_id = %s", (center_id,),
+                      invalidates=("flood_centers2",))
+
+    db.close()
+
+def test_dashboard_aggregates_match_rows():
+    db = Database()
+    run_migrations()
+    totals = db.get_supply_totals()
+    centres = db.get_centre_supply_summary(as_frame=False)
+    assert totals['centres'] == len(centres)
+    assert totals['food'] == sum(centres.column('food'))
+    assert sum(db.get_supply_totals_by_state(as_frame=False).column('food')) == totals['food']
+    db.close()
+
+def test_hot_queries_use_indexes():
+    run_migrations()
+    problems = check_query_plans()
+    assert problems == [], f"Hot queries regressed to full table scans: {problems}"
+
+def test_summary_tables_match_base_tables():
+    run_migrations()
+    problems = check_summaries()
+    assert problems == [], f"Summary tables drifted from the base tables: {problems}"
+
+def test_concurrent_takes_never_oversell():
+    db = Database()
+    run_migrations()
+    # Ids no real NGO or item uses, so cleanup cannot touch real rows
+    test_id = 999999
+    lot = db.insert_ngoinventory(test_id, test_id, 50, date(2099, 1, 1), "test-lot", "test", "concurrency test")
+    taken, refused, conflicts, errors = [], [], [], []
+
+    def pack():
+        for _ in range(10):
+            try:
+                db.take_stock({lot: 1})
+                taken.append(1)
+            except InsufficientStock:
+                refused.append(1)
+            except StockConflict:
+                # Still conflicting after every retry
+                conflicts.append(1)
+            except Exception as e:
+                errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=pack) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == [], errors
+        assert len(taken) + len(refused) + len(conflicts) == 80
+        assert len(taken) <= 50
+        if not conflicts:
+            assert len(taken) == 50 and len(refused) == 30
+        quantity = read_rows("SELECT quantity FROM ngo_inventory WHERE inventory_id = %s", (lot,)).column("quantity")
+        assert quantity == [50 - len(taken)]
+    finally:
+        execute_write("DELETE FROM ngo_inventory WHERE inventory_id = %s", (lot,))
+        execute_write("DELETE FROM ngo_summary WHERE ngo_id = %s", (test_id,))
+        for table in ("item_summary",) + HISTORY_TABLES:
+            execute_write(f"DELETE FROM {table} WHERE item_id = %s", (test_id,))
+        invalidate_tables("ngo_inventory", "ngo_summary", "item_summary", *HISTORY_TABLES)
+
+def test_retry_on_conflict():
+    attempts = []
+
+    def work():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise StockConflict("lot changed")
+        return "packed"
+
+    before = get_stock_stats()
+    assert retry_on_conflict(work, backoff=0) == "packed"
+    after = get_stock_stats()
+    assert after["conflicts"] == before["conflicts"] + 2
+    assert after["commits"] == before["commits"] + 1
+
+    try:
+        retry_on_conflict(work, retries=0)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    def always_conflicts():
+        raise StockConflict("lot changed")
+
+    try:
+        retry_on_conflict(always_conflicts, retries=2, backoff=0)
+        assert False, "expected StockConflict"
+    except StockConflict:
+        pass
+
+def test_take_stock_rejects_non_positive_quantities():
+    try:
+        take_stock(None, {1: 5, 2: -5}, None)
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert "lot 2: -5" in str(e)
+
+def test_history_resolution_follows_range():
+    assert history_resolution(timedelta(hours=6))[0] == "supply_history"
+    assert history_resolution(timedelta(days=30))[0] == "supply_history_hourly"
+    assert history_resolution(timedelta(days=365))[0] == "supply_history_daily"
+
+def test_history_end_is_stable_within_a_period():
+    assert history_end("supply_history_hourly", datetime(2024, 5, 1, 10, 0)) == datetime(2024, 5, 1, 11)
+    assert history_end("supply_history_hourly", datetime(2024, 5, 1, 10, 59, 59)) == datetime(2024, 5, 1, 11)
+    assert history_end("supply_history_daily", datetime(2024, 5, 1, 23, 30)) == datetime(2024, 5, 2)
+    assert history_end("supply_history", datetime(2024, 5, 1, 10, 0, 30)) == datetime(2024, 5, 1, 10, 1)
+
+def test_query_cache_is_bounded():
+    cache = QueryCache(ttl=60, max_entries=3)
+    for key in range(3):
+        cache.get_or_load(key, ("t",), lambda: key)
+    cache.get_or_load("short", ("t",), lambda: "short", ttl=0)
+    cache.get_or_load("next", ("t",), lambda: "next")
+    stats = cache.stats()
+    assert stats["entries"] <= 3 and stats["evictions"] >= 2
+    # The entry expiring soonest went first, the newest stays
+    assert cache.get_or_load("next", ("t",), lambda: "reloaded") == "next"
+
+def test_rowset_access_without_pandas():
+    rows = RowSet(["center_id", "name"], [(1, "Dewan A"), (2, "Dewan B")])
+    assert len(rows) == 2 and not rows.empty
+    assert [row.name for row in rows] == ["Dewan A", "Dewan B"]
+    assert rows.column("center_id") == [1, 2]
+    assert rows.mapping("center_id", "name") == {1: "Dewan A", 2: "Dewan B"}
+    assert rows.to_frame()["name"].tolist() == ["Dewan A", "Dewan B"]
+
+def test_parse_box_label():
+    label = "Box ID: 12\nDemand ID: 34\nDestination: Dewan A\nPriority: High\nItems:\n- Rice: 5\n"
+    assert parse_box_label(label) == (12, (34,))
+    assert parse_box_label(encode_box_payload(12, [34, 35])) == (12, (34, 35))
+    assert parse_box_label("https://example.com") == (None, ())
+    assert parse_box_label("Box ID: abc") == (None, ())
+
+def test_parse_box_label_without_a_key():
+    label = encode_box_payload(12, [34])
+    saved = os.environ.pop("QR_PAYLOAD_KEY", None), os.environ.pop("QR_PAYLOAD_DEV", None)
+    try:
+        # A good label must not pass for an unknown one just because the key is missing
+        try:
+            parse_box_label(label)
+            assert False, "read a payload label without QR_PAYLOAD_KEY"
+        except PayloadKeyMissing:
+            pass
+        assert parse_box_label("Box ID: 12\nDemand ID: 34") == (12, (34,))
+    finally:
+        for name, value in zip(("QR_PAYLOAD_KEY", "QR_PAYLOAD_DEV"), saved):
+            if value is not None:
+                os.environ[name] = value
+
+class FakeDemandFeed:
+    """Serves get_demands_since batches from a list instead of MySQL."""
+    def __init__(self, batches):
+        self.batches = batches
+        self.calls = 0
+        self.cursors = []
+
+    def get_demands_since(self, cursor, limit, as_frame=True):
+        self.calls += 1
+        self.cursors.append(cursor)
+        rows = self.batches.pop(0) if self.batches else []
+        columns = ["demand_id", "center_name", "item_name", "quantity", "outstanding_quantity", "priority",
+                   "request_date", "status", "updated_at"]
+        next_cursor = cursor if cursor is not None and not rows else (datetime(2024, 1, 1, 0, 0, self.calls), 0)
+        return RowSet(columns, [tuple(row[c] for c in columns) for row in rows]), next_cursor
+
+def demand(demand_id, priority, status="Pending"):
+    return {"demand_id": demand_id, "center_name": "C", "item_name": "I", "quantity": 1, "outstanding_quantity": 1,
+            "priority": priority, "request_date": demand_id, "status": status, "updated_at": demand_id}
+
+def test_pending_demand_view_applies_deltas():
+    view = PendingDemandView()
+    feed = FakeDemandFeed([[demand(1, "Low"), demand(2, "Critical")], [], [demand(3, "High"), demand(1, "Low", "Fulfilled")]])
+    view.refresh(feed)
+    assert view.to_frame()["demand_id"].tolist() == [2, 1]
+
+    view.refresh(feed)
+    assert view.to_frame()["demand_id"].tolist() == [2, 3]
+
+def test_pending_demand_view_repolls_an_overlap():
+    view = PendingDemandView(overlap=5)
+    feed = FakeDemandFeed([[demand(1, "Low")], [], [demand(1, "Low")]])
+    view.refresh(feed)
+    # The window before the cursor is read again; an unchanged row is not a change
+    assert view.refresh(feed) == 0
+    assert feed.cursors[2] == (datetime(2024, 1, 1, 0, 0, 1) - timedelta(seconds=5), 0)
+    # Re-reading the window never moves the cursor back
+    view.refresh(feed)
+    assert feed.cursors[3] == (datetime(2024, 1, 1, 0, 0, 3) - timedelta(seconds=5), 0)
+    assert view.cursor == (datetime(2024, 1, 1, 0, 0, 3), 0)
+
+class SqliteCursor:
+    """mysql.connector-style cursor over sqlite3, for the statement-level helpers
+    (SQLite has no row locks, so FOR UPDATE is dropped)."""
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace("%s", "?").replace(" FOR UPDATE", ""), tuple(params))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(query.replace("%s", "?"), rows)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+def test_fulfil_box_counts_quantities():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE supply_items (item_id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE supply_boxes (box_id INTEGER PRIMARY KEY, qr_code TEXT);
+        CREATE TABLE box_contents (box_id INTEGER, item_id INTEGER, quantity INTEGER);
+        CREATE TABLE supply_demands (demand_id INTEGER PRIMARY KEY, center_id INTEGER, item_id INTEGER,
+                                     quantity INTEGER, outstanding_quantity INTEGER, request_date TEXT, status TEXT);
+        CREATE TABLE supply_deliveries (box_id INTEGER, demand_id INTEGER, center_id INTEGER,
+                                        delivery_date TEXT, received_by TEXT, quantity INTEGER);
+        CREATE TABLE box_ngo_info (box_id INTEGER PRIMARY KEY, delivered_at TEXT);
+        INSERT INTO supply_items VALUES (1, 'Rice');
+        INSERT INTO supply_boxes VALUES (1, 'QR-1'), (2, 'QR-2');
+        INSERT INTO box_contents VALUES (1, 1, 8), (2, 1, 3);
+        INSERT INTO supply_demands VALUES (1, 1, 1, 5, 5, '2024-01-01', 'Pending'),
+                                          (2, 1, 1, 5, 5, '2024-01-02', 'Pending'),
+                                          (3, 1, 1, 4, 4, '2024-01-03', 'Pending'),
+                                          (4, 2, 1, 5, 5, '2023-12-01', 'Pending');
+    """)
+    cursor = SqliteCursor(conn)
+
+    # The demand on the label comes first, then the oldest; one line serves both.
+    # Demand 4 on the label belongs to another center and is left alone
+    _, _, deliveries = fulfil_box(cursor, "QR-1", 1, "tester", demand_ids=(3, 4))
+    assert deliveries == [(3, 1, 1, 4, 0), (1, 1, 1, 4, 1)]
+
+    # Scanning the same box again counts nothing
+    assert fulfil_box(cursor, "QR-1", 1, "tester") == (1, [], None)
+
+    # A second box finishes demand 1 and starts on demand 2
+    _, _, deliveries = fulfil_box(cursor, "QR-2", 1, "tester")
+    assert deliveries == [(1, 1, 1, 1, 0), (2, 1, 1, 2, 3)]
+    assert conn.execute("SELECT demand_id, outstanding_quantity, status FROM supply_demands").fetchall() == [
+        (1, 0, "Fulfilled"), (2, 3, "Pending"), (3, 0, "Fulfilled"), (4, 5, "Pending")]
+    assert conn.execute("SELECT SUM(quantity) FROM supply_deliveries").fetchone()[0] == 11
+
+def test_apply_scan_journal_is_idempotent():
+    db = Database()
+    run_migrations()
+    qr_data = f"https://example.com/replay-{time.time()}"
+    entry = {"scan_id": str(uuid.uuid4()), "qr_type": "QRCODE", "qr_data": qr_data,
+             "center_id": None, "received_by": None, "recorded_at": time.time()}
+    try:
+        assert db.apply_scan_journal([entry], notify=False)["skipped"] == 0
+        # A replay after a lost acknowledgement changes nothing
+        assert db.apply_scan_journal([entry], notify=False)["skipped"] == 1
+        assert read_rows("SELECT COUNT(*) AS n FROM qr_codes WHERE qr_data = %s", (qr_data,)).column("n") == [1]
+    finally:
+        execute_write("DELETE FROM qr_codes WHERE qr_data = %s", (qr_data,))
+        execute_write("DELETE FROM applied_scans WHERE scan_id = %s", (entry["scan_id"],))
+
+def test_donor_tracking_pages_and_matches_rebuild():
+    db = Database()
+    run_migrations()
+    ngo_id = read_rows("SELECT ngo_id FROM ngos2 LIMIT 1").column("ngo_id")[0]
+    email = f"tracking-{time.time()}@example.com"
+    donation_ids = [db.create_donation(ngo_id, "Test Donor", email, 100, "Card") for _ in range(5)]
+    try:
+        # Undated donations (legacy rows) must still show up on some page
+        for table in ("donations", "donation_tracking"):
+            execute_write(f"UPDATE {table} SET donation_date = NULL WHERE donation_id IN (%s, %s)",
+                          donation_ids[1:3], invalidates=("donations", "donation_tracking"))
+        db.allocate_donation(donation_ids[0], "Food", 30)
+        db.allocate_donation(donation_ids[0], "Water", 20)
+
+        def all_pages():
+            donations, before = [], None
+            while True:
+                page = db.get_donor_tracking(email, before=before, page_size=2)
+                donations += page["donations"]
+                before = page["next"]
+                if before is None:
+                    return page["totals"], donations
+
+        totals, donations = all_pages()
+        assert totals["donations"] == 5 and totals["amount"] == 500 and totals["allocated_amount"] == 50
+        assert sorted(donation["donation_id"] for donation in donations) == donation_ids
+        first = next(donation for donation in donations if donation["donation_id"] == donation_ids[0])
+        assert first["allocated_percent"] == 50
+        assert [line["purpose"] for line in first["allocations"]] == ["Food", "Water"]
+
+        rebuild_donation_tracking()
+        assert all_pages() == (totals, donations)
+    finally:
+        placeholders = ','.join(['%s'] * len(donation_ids))
+        execute_write(f"DELETE FROM donation_allocations WHERE donation_id IN ({placeholders})", donation_ids)
+        execute_write("DELETE FROM donations WHERE donor_email = %s", (email,))
+        execute_write("DELETE FROM donation_tracking WHERE donor_email = %s", (email,))
+        execute_write("DELETE FROM donor_summary WHERE donor_email = %s", (email,),
+                      invalidates=("donations", "donation_allocations", "donation_tracking", "donor_summary"))
+
+def test_plan_skips_units_packed_in_undelivered_boxes():
+    db = Database()
+    run_migrations()
+    # Ids no real NGO, center or item uses, so cleanup cannot touch real rows
+    test_id = 999998
+    lot = db.insert_ngoinventory(test_id, test_id, 20, date(2099, 1, 1), "test-lot", "test", "packed units test")
+    demand_id = db.create_demand(test_id, test_id, 10, "Critical", notify=False)
+    box_ids = []
+    try:
+        assert db.plan_allocation(ngo_id=test_id).demands[demand_id].quantity == 10
+        box_ids = [box_id for box_id, _ in db.create_boxes([([(lot, 4)], test_id, "Critical", {demand_id: 4})])]
+        assert db.plan_allocation(ngo_id=test_id).demands[demand_id].quantity == 6
+
+        # Once delivered the box no longer holds units back
+        execute_write("UPDATE box_ngo_info SET delivered_at = NOW() WHERE box_id = %s", box_ids)
+        assert db.plan_allocation(ngo_id=test_id).demands[demand_id].quantity == 10
+    finally:
+        for table in ("box_demands", "box_contents", "box_ngo_info", "supply_boxes"):
+            for box_id in box_ids:
+                execute_write(f"DELETE FROM {table} WHERE box_id = %s", (box_id,))
+        execute_write("DELETE FROM supply_demands WHERE demand_id = %s", (demand_id,))
+        execute_write("DELETE FROM ngo_inventory WHERE inventory_id = %s", (lot,))
+        execute_write("DELETE FROM ngo_summary WHERE ngo_id = %s", (test_id,))
+        execute_write("DELETE FROM center_summary WHERE center_id = %s", (test_id,))
+        for table in ("item_summary", "supply_history", "supply_history_hourly", "supply_history_daily"):
+            execute_write(f"DELETE FROM {table} WHERE item_id = %s", (test_id,))
+        invalidate_tables("box_demands", "box_ngo_info", "supply_boxes", "supply_demands", "ngo_inventory",
+                          *SUMMARY_TABLES + HISTORY_TABLES)
+
+def test_sweep_takes_expired_lots_out_of_the_totals():
+    db = Database()
+    run_migrations()
+    test_id = 999997
+    lots = [db.insert_ngoinventory(test_id, test_id, 7, date(2000, 1, 1), "old-lot", "test", "sweep test"),
+            db.insert_ngoinventory(test_id, test_id, 5, date(2099, 1, 1), "new-lot", "test", "sweep test")]
+    try:
+        assert sweep_expired_stock() >= 1
+        assert db.get_ngo_metrics(test_id)["total_items"] == 5
+        assert read_rows("SELECT inventory_quantity FROM item_summary WHERE item_id = %s",
+                         (test_id,)).column("inventory_quantity") == [5]
+        assert [problem for problem in check_summaries() if problem[1] == (test_id,)] == []
+    finally:
+        for lot in lots:
+            execute_write("DELETE FROM ngo_inventory WHERE inventory_id = %s", (lot,))
+        execute_write("DELETE FROM ngo_summary WHERE ngo_id = %s", (test_id,))
+        for table in ("item_summary",) + HISTORY_TABLES:
+            execute_write(f"DELETE FROM {table} WHERE item_id = %s", (test_id,))
+        invalidate_tables("ngo_inventory", "ngo_summary", "item_summary", *HISTORY_TABLES)
+
 if __name__ == "__main__":
-    test_insert_and_show()
\ No newline at end of file
+    test_insert_and_show()
@@ -0,0 +1,25 @@
+import os
+from labels import LabelCache, label_sheet, render_labels
+from qr_payload import encode_box_payload
+
+os.environ.setdefault("QR_PAYLOAD_KEY", "test-key")
+
+
+def test_render_labels_reuses_cached_pngs():
+    cache = LabelCache()
+    payloads = [encode_box_payload(n) for n in range(5)]
+    first = render_labels(payloads + payloads[:1], workers=1, cache=cache)
+    assert len(first) == 6 and first[0] == first[5]
+    assert all(png.startswith(b"\x89PNG") for png in first)
+    assert cache.misses == 5
+
+    again = render_labels(payloads, workers=1, cache=cache)
+    assert again == first[:5]
+    assert cache.hits == 5
+
+
+def test_label_sheet_paginates():
+    png = render_labels([encode_box_payload(1)], workers=1, cache=LabelCache())[0]
+    pdf = label_sheet([(png, f"Box ID: {n}") for n in range(25)], columns=3, rows=7)
+    assert pdf.startswith(b"%PDF")
+    assert pdf.count(b"/Type /Page") - pdf.count(b"/Type /Pages") == 2
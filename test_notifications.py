@@ -0,0 +1,96 @@
+import smtplib
+from notifications import AlertDigest, NotificationDispatcher, SubscriptionIndex
+
+
+class FakeSMTP:
+    """Stand-in SMTP session that records messages and can drop the first sends."""
+    sessions = []
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+        FakeSMTP.sessions.append(self)
+
+    def send_message(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise smtplib.SMTPServerDisconnected("connection dropped")
+        self.sent.append(message)
+
+    def quit(self):
+        pass
+
+
+def test_reuses_one_smtp_session():
+    FakeSMTP.sessions = []
+    dispatcher = NotificationDispatcher(smtp_factory=FakeSMTP, sender="test@example.com").start()
+    for n in range(20):
+        dispatcher.enqueue(f"user{n}@example.com", "Alert", "body")
+    dispatcher.join()
+    dispatcher.stop()
+
+    stats = dispatcher.stats()
+    assert stats["sent"] == 20
+    assert stats["connections"] == 1
+    assert len(FakeSMTP.sessions[0].sent) == 20
+
+
+def test_retries_with_a_fresh_session():
+    sessions = [FakeSMTP(failures=1), FakeSMTP()]
+    dispatcher = NotificationDispatcher(smtp_factory=lambda: sessions.pop(0), backoff=0).start()
+    dispatcher.enqueue("user@example.com", "Alert", "body")
+    dispatcher.join()
+    dispatcher.stop()
+
+    stats = dispatcher.stats()
+    assert stats["sent"] == 1
+    assert stats["retries"] == 1
+    assert stats["connections"] == 2
+
+
+def test_gives_up_after_max_attempts():
+    dispatcher = NotificationDispatcher(smtp_factory=lambda: FakeSMTP(failures=10), max_attempts=3, backoff=0).start()
+    dispatcher.enqueue("user@example.com", "Alert", "body")
+    dispatcher.join()
+    dispatcher.stop()
+
+    stats = dispatcher.stats()
+    assert stats["sent"] == 0
+    assert stats["failed"] == 1
+    assert stats["retries"] == 2
+
+
+def test_subscription_index_matches_center_and_priority():
+    index = SubscriptionIndex([
+        ("a@example.com", 1, "Critical"),
+        ("b@example.com", 2, "Critical"),
+        ("c@example.com", None, "Critical"),
+        ("d@example.com", 1, "Low"),
+    ])
+    assert index.match(1, "Critical") == {"a@example.com", "c@example.com"}
+    assert index.match(3, "Critical") == {"c@example.com"}
+    assert index.match(1, "High") == set()
+    assert len(index) == 4
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.sent = []
+
+    def enqueue(self, to, subject, body):
+        self.sent.append((to, subject, body))
+
+
+def test_digest_batches_alerts_beyond_threshold():
+    dispatcher = RecordingDispatcher()
+    now = [0.0]
+    digest = AlertDigest(dispatcher, window=60, threshold=2, clock=lambda: now[0])
+    for n in range(5):
+        digest.submit("a@example.com", "Alert", f"body {n}", f"demand {n}")
+    assert len(dispatcher.sent) == 2
+
+    digest.flush()
+    assert len(dispatcher.sent) == 3
+    to, subject, body = dispatcher.sent[-1]
+    assert "3 new demands" in subject
+    assert "demand 2" in body and "demand 4" in body
@@ -0,0 +1,71 @@
+import os
+import time
+import qrcode
+from qr_payload import PayloadKeyMissing, b45decode, b45encode, decode_box_payload, encode_box_payload
+
+os.environ.setdefault("QR_PAYLOAD_KEY", "test-key")
+
+
+def qr_version(data):
+    qr = qrcode.QRCode(version=None, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.version
+
+
+def test_base45_matches_rfc_examples():
+    assert b45encode(b"AB") == "BB8"
+    assert b45encode(b"Hello!!") == "%69 VD92EX0"
+    assert b45decode("QED8WEX0") == b"ietf!"
+
+
+def test_round_trip():
+    for box_id, demand_ids in [(1, ()), (127, (128,)), (2 ** 31, (1, 2, 3, 2 ** 40))]:
+        payload = decode_box_payload(encode_box_payload(box_id, demand_ids))
+        assert payload.version == 1
+        assert payload.box_id == box_id
+        assert payload.demand_ids == demand_ids
+
+
+def test_rejects_damaged_or_foreign_labels():
+    text = encode_box_payload(42, [7])
+    for bad in (text[:-1], text[:-2] + ("0" if text[-2] != "0" else "1") + text[-1], "Box ID: 42"):
+        try:
+            decode_box_payload(bad)
+            assert False, f"accepted {bad!r}"
+        except ValueError:
+            pass
+    try:
+        decode_box_payload(text, key=b"another shelter")
+        assert False, "accepted a label signed with another key"
+    except ValueError:
+        pass
+
+
+def test_payload_stays_at_a_low_qr_version():
+    legacy = ("Box ID: 123456\nDemand ID: 7890\nDestination: Dewan Serbaguna Kampung Baru\nPriority: High\nItems:\n"
+              + "".join(f"- Item {n}: 10\n" for n in range(5)))
+    assert qr_version(encode_box_payload(123456, [7890, 7891, 7892])) <= 2
+    assert qr_version(legacy) > 5
+
+
+def test_decode_is_fast():
+    text = encode_box_payload(123456, [7890, 7891, 7892])
+    start = time.perf_counter()
+    for _ in range(10000):
+        decode_box_payload(text)
+    assert (time.perf_counter() - start) / 10000 < 0.0005
+
+
+def test_refuses_to_sign_without_a_key():
+    saved = os.environ.pop("QR_PAYLOAD_KEY", None), os.environ.pop("QR_PAYLOAD_DEV", None)
+    try:
+        try:
+            encode_box_payload(1)
+            assert False, "signed a label without QR_PAYLOAD_KEY"
+        except PayloadKeyMissing:
+            pass
+    finally:
+        for name, value in zip(("QR_PAYLOAD_KEY", "QR_PAYLOAD_DEV"), saved):
+            if value is not None:
+                os.environ[name] = value
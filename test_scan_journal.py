@@ -0,0 +1,128 @@
+import time
+from mysql.connector import errors
+from database import is_data_error
+from scan_journal import JournalSync, ScanJournal
+
+
+class MySQLStandIn:
+    """Applies journal entries idempotently, like Database.apply_scan_journal,
+    and can be taken down mid-session."""
+
+    def __init__(self):
+        self.up = True
+        self.applied = {}
+        self.calls = 0
+        self.rejects = set()
+
+    def apply(self, entries):
+        self.calls += 1
+        if not self.up:
+            raise ConnectionError("MySQL server has gone away")
+        if any(entry["qr_data"] in self.rejects for entry in entries):
+            raise ValueError("Cannot add or update a child row")
+        fresh = [entry for entry in entries if entry["scan_id"] not in self.applied]
+        for entry in fresh:
+            self.applied[entry["scan_id"]] = entry["qr_data"]
+        return {"boxes": 0, "fulfilled": [], "unknown": [], "skipped": len(entries) - len(fresh)}
+
+
+def test_scans_survive_an_outage_and_sync_later():
+    now = [1000.0]
+    journal = ScanJournal(":memory:", clock=lambda: now[0])
+    mysql = MySQLStandIn()
+    sync = JournalSync(journal, mysql.apply, batch_size=2, clock=lambda: now[0])
+
+    journal.record("QRCODE", "Box ID: 1")
+    sync.sync_now()
+    assert list(mysql.applied.values()) == ["Box ID: 1"]
+
+    mysql.up = False
+    journal.record_batch([("QRCODE", "Box ID: 2"), ("QRCODE", "Box ID: 3"), ("QRCODE", "Box ID: 4")], 5, "ali")
+    try:
+        sync.sync_now()
+        assert False, "sync should fail while MySQL is down"
+    except ConnectionError:
+        pass
+    now[0] += 30
+    stats = sync.stats()
+    assert stats["backlog"] == 3
+    assert stats["lag"] == 30
+    assert stats["failures"] == 1
+
+    mysql.up = True
+    results = sync.sync_now()
+    assert len(results) == 2  # batches of two
+    assert sorted(mysql.applied.values()) == ["Box ID: 1", "Box ID: 2", "Box ID: 3", "Box ID: 4"]
+    assert sync.stats()["backlog"] == 0
+
+
+def test_replaying_entries_is_idempotent():
+    journal = ScanJournal(":memory:")
+    mysql = MySQLStandIn()
+    journal.record("QRCODE", "Box ID: 1")
+    entries = journal.pending()
+    mysql.apply(entries)
+    # Commit reached MySQL but the acknowledgement was lost: the entry is replayed
+    result = JournalSync(journal, mysql.apply).sync_now()
+    assert result[0]["skipped"] == 1
+    assert len(mysql.applied) == 1
+
+
+def test_rejected_entry_is_set_aside():
+    journal = ScanJournal(":memory:")
+    mysql = MySQLStandIn()
+    mysql.rejects.add("Box ID: 2")
+    journal.record_batch([("QRCODE", "Box ID: 1"), ("QRCODE", "Box ID: 2"), ("QRCODE", "Box ID: 3")])
+    sync = JournalSync(journal, mysql.apply)
+    sync.sync_now()
+
+    assert sorted(mysql.applied.values()) == ["Box ID: 1", "Box ID: 3"]
+    [(entry, error)] = journal.failed()
+    assert entry["qr_data"] == "Box ID: 2" and "child row" in error
+    stats = sync.stats()
+    assert stats["backlog"] == 0 and stats["rejected"] == 1 and stats["failures"] == 0
+
+
+def test_schema_and_permission_errors_keep_entries_pending():
+    journal = ScanJournal(":memory:")
+    journal.record_batch([("QRCODE", "Box ID: 1"), ("QRCODE", "Box ID: 2")])
+    failures = [errors.ProgrammingError(msg="Access denied for user", errno=1045),
+                errors.ProgrammingError(msg="Table 'bantuannow.applied_scans' doesn't exist", errno=1146)]
+
+    for error in failures:
+        def apply(entries):
+            raise error
+        sync = JournalSync(journal, apply, is_data_error=is_data_error)
+        try:
+            sync.sync_now()
+            assert False, "an outage must not be swallowed"
+        except errors.ProgrammingError:
+            pass
+        stats = sync.stats()
+        assert stats["backlog"] == 2 and stats["rejected"] == 0 and stats["failures"] == 1
+    assert journal.failed() == []
+
+    # A constraint violation is the entry's own fault and is set aside
+    def reject(entries):
+        raise errors.IntegrityError(msg="Cannot add or update a child row", errno=1452)
+    sync = JournalSync(journal, reject, is_data_error=is_data_error)
+    sync.sync_now()
+    assert sync.stats()["rejected"] == 2 and len(journal.failed()) == 2
+
+
+def test_worker_retries_until_mysql_returns():
+    journal = ScanJournal(":memory:")
+    mysql = MySQLStandIn()
+    mysql.up = False
+    sync = JournalSync(journal, mysql.apply, interval=0.01, max_backoff=0.02).start()
+    journal.record("QRCODE", "Box ID: 9")
+    sync.notify()
+    time.sleep(0.1)
+    assert sync.stats()["backlog"] == 1
+
+    mysql.up = True
+    deadline = time.monotonic() + 2
+    while sync.stats()["backlog"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sync.stop(timeout=1)
+    assert list(mysql.applied.values()) == ["Box ID: 9"]
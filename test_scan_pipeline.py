@@ -0,0 +1,139 @@
+import threading
+import time
+import numpy as np
+from scan_pipeline import FrameBuffer, ScanDeduper, ScanPipeline, SmartDecoder, SyntheticSource, to_gray
+
+
+def fake_decoder(frame):
+    # Synthetic frames are strings; "QR:<data>" frames contain a code
+    if frame.startswith("QR:"):
+        return [(frame[3:], "QRCODE")]
+    return []
+
+
+def test_decodes_codes_from_a_synthetic_source():
+    frames = ["blank"] * 20 + ["QR:Box ID: 7"] + ["blank"] * 20
+    pipeline = ScanPipeline(SyntheticSource(frames), decoder=fake_decoder, workers=2, buffer_size=64).start()
+    result = pipeline.next_result(timeout=2)
+    pipeline.stop(timeout=2)
+
+    assert result.data == "Box ID: 7"
+    assert result.type == "QRCODE"
+    assert result.frame_id == 21
+    stats = pipeline.stats()
+    assert stats["captured"] == 41
+    assert stats["read_errors"] == 1
+
+
+def test_stops_when_the_source_runs_out():
+    pipeline = ScanPipeline(SyntheticSource(["blank"] * 5), decoder=fake_decoder).start()
+    deadline = time.monotonic() + 2
+    while pipeline.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not pipeline.running
+    assert pipeline.next_result(timeout=0) is None
+
+
+def test_slow_decoder_drops_oldest_frames():
+    release = threading.Event()
+
+    def slow_decoder(frame):
+        release.wait(1)
+        return fake_decoder(frame)
+
+    frames = ["blank"] * 50 + ["QR:latest"]
+    pipeline = ScanPipeline(SyntheticSource(frames), decoder=slow_decoder, workers=1, buffer_size=4).start()
+    time.sleep(0.2)
+    release.set()
+    result = pipeline.next_result(timeout=2)
+    pipeline.stop(timeout=2)
+
+    # The most recent frame survives even though most were dropped
+    assert result.data == "latest"
+    assert pipeline.stats()["dropped"] > 40
+
+
+def test_frame_buffer_keeps_newest_frames():
+    buffer = FrameBuffer(size=2)
+    for n in range(5):
+        buffer.put(n)
+    assert buffer.dropped == 3
+    assert [buffer.get(timeout=0), buffer.get(timeout=0), buffer.get(timeout=0)] == [3, 4, None]
+
+
+class FakeLocator:
+    """Finds a code wherever the greyscale image has the value 255."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def __call__(self, gray):
+        self.shapes.append(gray.shape)
+        ys, xs = np.nonzero(gray == 255)
+        if not len(xs):
+            return []
+        return [("Box ID: 7", "QRCODE", (int(xs.min()), int(ys.min()),
+                                         int(xs.max() - xs.min() + 1), int(ys.max() - ys.min() + 1)))]
+
+
+def frame_with_code(left=300, top=200, size=40, noise=0):
+    frame = np.full((480, 640, 3), 100 + noise, dtype=np.uint8)
+    frame[top:top + size, left:left + size] = 255
+    return frame
+
+
+def test_smart_decoder_skips_unchanged_frames():
+    locator = FakeLocator()
+    decoder = SmartDecoder(locate=locator, max_skip=3)
+    blank = np.full((480, 640, 3), 100, dtype=np.uint8)
+    results = [decoder(blank) for _ in range(6)]
+
+    assert results == [[]] * 6
+    # First frame, then one forced decode after three skips
+    assert decoder.stats()["skipped"] == 4
+    assert len(locator.shapes) == 2
+
+
+def test_smart_decoder_tries_last_region_first():
+    locator = FakeLocator()
+    decoder = SmartDecoder(locate=locator, diff_threshold=0)
+    assert decoder(frame_with_code()) == [("Box ID: 7", "QRCODE")]
+    assert locator.shapes[-1] == (480, 640)
+
+    assert decoder(frame_with_code(left=305, noise=5)) == [("Box ID: 7", "QRCODE")]
+    # Only the crop around the previous hit was decoded
+    assert locator.shapes[-1] == (80, 80)
+    stats = decoder.stats()
+    assert stats["roi_hits"] == 1 and stats["full_decodes"] == 1
+
+
+def test_smart_decoder_downscales_wide_frames():
+    locator = FakeLocator()
+    decoder = SmartDecoder(locate=locator, max_width=640)
+    decoder(np.zeros((720, 1280, 3), dtype=np.uint8))
+    assert locator.shapes == [(360, 640)]
+    assert to_gray(np.zeros((4, 4, 3), dtype=np.uint8)).shape == (4, 4)
+
+
+def test_deduper_suppresses_repeats_within_ttl():
+    now = [0.0]
+    dedup = ScanDeduper(ttl=10, max_size=2, clock=lambda: now[0])
+    assert dedup.is_new("box-1")
+    assert not dedup.is_new("box-1")
+    now[0] = 11
+    assert dedup.is_new("box-1")
+    dedup.is_new("box-2")
+    dedup.is_new("box-3")
+    assert len(dedup) == 2 and dedup.suppressed == 1
+
+
+def test_pipeline_reports_a_held_box_once():
+    frames = ["QR:Box ID: 7"] * 30
+    pipeline = ScanPipeline(SyntheticSource(frames), decoder=fake_decoder, buffer_size=64).start()
+    while pipeline.running:
+        time.sleep(0.01)
+    pipeline.stop()
+
+    assert pipeline.next_result(timeout=0).data == "Box ID: 7"
+    assert pipeline.next_result(timeout=0) is None
+    assert pipeline.stats()["duplicates"] == 29